@@ -0,0 +1 @@
+"""Benchmark harness and synthetic case sheet corpus."""
@@ -0,0 +1,178 @@
+import argparse
+import io
+import json
+import os
+import random
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw, ImageFont
+
+# Same headings extract_sections looks for, so generated sheets exercise every branch
+HEADINGS = [
+    'History', 'Chief Complaint', 'Presenting Complaint',
+    'Diagnosis', 'Assessment', 'Problem Summary',
+    'Treatment Plan', 'Plan', 'Suggestion', 'Advice'
+]
+
+KINDS = ('text', 'scanned', 'mixed')
+
+BOILERPLATE = [
+    "City General Hospital - Department of Internal Medicine",
+    "Patient ID: 2024-118-{n:05d}   Record No: {n:06d}",
+    "Phone: 040-2345-{n:04d}   Fax: 040-2345-0000",
+    "Address: 12 Hospital Road, Sector {n}",
+    "Date: 2024-03-{d:02d}   Time: 09:{d:02d}",
+    "Insurance: Policy {n:08d}",
+]
+
+SYMPTOMS = [
+    "fever", "productive cough", "chest pain", "shortness of breath", "nausea",
+    "abdominal pain", "headache", "fatigue", "dizziness", "joint pain", "vomiting",
+]
+CONDITIONS = [
+    "community acquired pneumonia", "type 2 diabetes mellitus", "essential hypertension",
+    "acute gastroenteritis", "urinary tract infection", "bronchial asthma",
+    "iron deficiency anaemia", "migraine", "viral fever",
+]
+DRUGS = [
+    "amoxicillin 500 mg", "metformin 500 mg", "amlodipine 5 mg", "paracetamol 650 mg",
+    "salbutamol inhaler", "ondansetron 4 mg", "ferrous sulphate", "insulin glargine",
+]
+VITALS = "BP {s}/{d} mmHg  HR {hr} bpm  RR {rr}/min  SpO2 {o2}%  Temp {t}.{tt} F"
+
+
+def _sentence(rng, heading):
+    symptom = rng.choice(SYMPTOMS)
+    condition = rng.choice(CONDITIONS)
+    drug = rng.choice(DRUGS)
+    days = rng.randint(2, 14)
+    templates = {
+        'History': f"Patient reports {symptom} for the past {days} days with gradual worsening.",
+        'Chief Complaint': f"Complains of {symptom} and {rng.choice(SYMPTOMS)} since {days} days.",
+        'Presenting Complaint': f"Presented with {symptom} associated with {rng.choice(SYMPTOMS)}.",
+        'Diagnosis': f"Findings are consistent with {condition}.",
+        'Assessment': f"Clinical picture suggests {condition}, patient is hemodynamically stable.",
+        'Problem Summary': f"Known case of {condition} now admitted with {symptom}.",
+        'Treatment Plan': f"Start {drug} and continue medication as prescribed for {days} days.",
+        'Plan': f"Review after {days} days with repeat examination and follow up.",
+        'Suggestion': f"Advised to continue {drug} and monitor for {symptom}.",
+        'Advice': f"Adequate hydration, rest and follow up in the outpatient clinic after {days} days.",
+    }
+    return templates[heading]
+
+
+def case_sheet_lines(rng, pages, sentences_per_section=3, vitals_per_page=8):
+    """Returns one list of text lines per page."""
+    n = rng.randint(1, 99999)
+    header = [line.format(n=n, d=rng.randint(1, 28)) for line in BOILERPLATE]
+    headings = list(HEADINGS)
+    rng.shuffle(headings)
+    per_page = max(1, -(-len(headings) // pages))
+
+    page_lines = []
+    for page_num in range(pages):
+        lines = list(header[:2]) if page_num else list(header)
+        for heading in headings[page_num * per_page:(page_num + 1) * per_page]:
+            lines.append(f"{heading}:")
+            lines.extend(_sentence(rng, heading) for _ in range(sentences_per_section))
+        for _ in range(vitals_per_page):
+            lines.append(VITALS.format(
+                s=rng.randint(100, 160), d=rng.randint(60, 100), hr=rng.randint(60, 120),
+                rr=rng.randint(12, 28), o2=rng.randint(90, 100), t=rng.randint(97, 102), tt=rng.randint(0, 9),
+            ))
+        page_lines.append(lines)
+    return page_lines
+
+
+def _load_font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def render_page_image(lines, dpi=200, noise=0.0, rng=None):
+    """Renders text lines onto a white A4 bitmap, like a flatbed scan."""
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    font_size = max(10, dpi // 7)
+    font = _load_font(font_size)
+    y = dpi // 2
+    for line in lines:
+        draw.text((dpi // 2, y), line, fill=0, font=font)
+        y += int(font_size * 1.5)
+        if y > height - dpi // 2:
+            break
+    if noise and rng is not None:
+        pixels = image.load()
+        for _ in range(int(width * height * noise)):
+            pixels[rng.randrange(width), rng.randrange(height)] = rng.choice((0, 255))
+    return image
+
+
+def _add_text_page(doc, lines):
+    page = doc.new_page(width=595, height=842)
+    y = 50
+    for line in lines:
+        page.insert_text((50, y), line, fontsize=10)
+        y += 14
+        if y > 800:
+            break
+
+
+def _add_scanned_page(doc, lines, dpi, noise, rng):
+    page = doc.new_page(width=595, height=842)
+    buffer = io.BytesIO()
+    render_page_image(lines, dpi=dpi, noise=noise, rng=rng).save(buffer, format='PNG')
+    page.insert_image(page.rect, stream=buffer.getvalue())
+
+
+def make_case_sheet(path, kind='text', pages=2, seed=0, dpi=200, noise=0.0):
+    """
+    Writes one synthetic case sheet PDF. 'text' pages carry a text layer,
+    'scanned' pages are bitmaps only, 'mixed' alternates the two.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown case sheet kind: {kind}")
+    rng = random.Random(f"{kind}-{pages}-{seed}")
+    doc = fitz.open()
+    for page_num, lines in enumerate(case_sheet_lines(rng, pages)):
+        scanned = kind == 'scanned' or (kind == 'mixed' and page_num % 2 == 1)
+        if scanned:
+            _add_scanned_page(doc, lines, dpi, noise, rng)
+        else:
+            _add_text_page(doc, lines)
+    doc.save(path, deflate=True)
+    doc.close()
+    return {'path': path, 'kind': kind, 'pages': pages, 'seed': seed, 'bytes': os.path.getsize(path)}
+
+
+def generate_corpus(out_dir, kinds=KINDS, page_counts=(1, 4), copies=1, seed=0, dpi=200, noise=0.0):
+    """Generates every kind x page count combination and returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = []
+    for kind in kinds:
+        for pages in page_counts:
+            for copy in range(copies):
+                path = os.path.join(out_dir, f"{kind}_{pages}p_{copy}.pdf")
+                manifest.append(make_case_sheet(path, kind, pages, seed + copy, dpi, noise))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic case sheet PDF corpus.")
+    parser.add_argument('out_dir')
+    parser.add_argument('--kinds', nargs='+', default=list(KINDS), choices=KINDS)
+    parser.add_argument('--pages', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--copies', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dpi', type=int, default=200)
+    parser.add_argument('--noise', type=float, default=0.0)
+    args = parser.parse_args()
+    manifest = generate_corpus(args.out_dir, args.kinds, args.pages, args.copies, args.seed, args.dpi, args.noise)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.corpus import case_sheet_lines, make_case_sheet, render_page_image
+from benchmarks.run import describe, git_commit
+from benchmarks.summarizers import rouge1_f
+from casesheet.extract import OCR_CONFIG, OCR_DPI, OCR_LANG, extract_text_with_ocr, preprocess_for_ocr
+from casesheet.metrics import request_trace
+from casesheet.ocr import BACKENDS, AdaptivePolicy, get_engine
+
+
+def short_pages(count, lines_per_page, dpi, seed):
+    """Preprocessed page images holding only a few lines each, so fixed per-call costs dominate."""
+    rng = random.Random(f"ocr-{seed}")
+    pages = []
+    for _ in range(count):
+        lines = [line for page in case_sheet_lines(rng, pages=1) for line in page][:lines_per_page]
+        pages.append(preprocess_for_ocr(render_page_image(lines, dpi=dpi)))
+    return pages
+
+
+def bench_backend(backend, pages, repeat):
+    try:
+        engine = get_engine(backend, OCR_LANG, OCR_CONFIG)
+        start = time.perf_counter()
+        engine.recognize(pages[0])  # first call includes engine start-up
+        first_s = time.perf_counter() - start
+    except Exception as e:
+        return {'skipped': f"{type(e).__name__}: {e}"}
+
+    samples = []
+    for _ in range(repeat):
+        for image in pages:
+            start = time.perf_counter()
+            engine.recognize(image)
+            samples.append(time.perf_counter() - start)
+    return {'first_call_s': round(first_s, 4), 'per_page': describe(samples)}
+
+
+def bench_adaptive(backend, paths, policy):
+    """
+    Fixed-DPI against adaptive OCR on whole scanned sheets: seconds per page,
+    escalation rates, and ROUGE-1 of the adaptive text against the fixed text.
+    """
+    fixed_s, adaptive_s, agreement = 0.0, 0.0, []
+    stats = {'pages': 0, 'page_escalations': 0, 'lines': 0, 'line_escalations': 0}
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            reference = extract_text_with_ocr(path, dpi=policy.high_dpi, backend=backend)
+            fixed_s += time.perf_counter() - start
+            start = time.perf_counter()
+            with request_trace('bench_ocr') as trace:
+                text = extract_text_with_ocr(path, backend=backend, adaptive=policy)
+            adaptive_s += time.perf_counter() - start
+            for key, value in trace.fields.get('ocr_escalation', {}).items():
+                stats[key] += value
+            agreement.append(rouge1_f(text, reference))
+    except Exception as e:
+        return {'skipped': f"{type(e).__name__}: {e}"}
+
+    pages = stats['pages'] or 1
+    return {
+        'fixed_s_per_page': round(fixed_s / pages, 4),
+        'adaptive_s_per_page': round(adaptive_s / pages, 4),
+        'speedup': round(fixed_s / adaptive_s, 3) if adaptive_s else None,
+        'page_escalation_rate': round(stats['page_escalations'] / pages, 4),
+        'line_escalation_rate': round(stats['line_escalations'] / stats['lines'], 4) if stats['lines'] else 0.0,
+        'rouge1_vs_fixed': round(sum(agreement) / len(agreement), 4) if agreement else None,
+        'counts': stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-page OCR overhead of each backend on short pages.")
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--lines', type=int, default=3, help="text lines per page")
+    parser.add_argument('--dpi', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--adaptive', action='store_true', help="also compare fixed and adaptive DPI on scanned sheets")
+    parser.add_argument('--sheets', type=int, default=3, help="scanned sheets for --adaptive")
+    parser.add_argument('--noise', type=float, default=0.002, help="speckle noise of the --adaptive sheets")
+    parser.add_argument('--low-dpi', type=int, default=150)
+    parser.add_argument('--high-dpi', type=int, default=OCR_DPI)
+    parser.add_argument('--page-confidence', type=float, default=70.0)
+    parser.add_argument('--line-confidence', type=float, default=60.0)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    pages = short_pages(args.pages, args.lines, args.dpi, args.seed)
+    report = {'commit': git_commit(), 'pages': args.pages, 'lines_per_page': args.lines, 'dpi': args.dpi,
+              'backends': {}}
+    for backend in args.backends:
+        report['backends'][backend] = bench_backend(backend, pages, args.repeat)
+
+    base = report['backends'].get('pytesseract', {}).get('per_page')
+    for backend, result in report['backends'].items():
+        if base and 'per_page' in result:
+            result['speedup'] = round(base['mean_s'] / result['per_page']['mean_s'], 3)
+
+    if args.adaptive:
+        policy = AdaptivePolicy(args.low_dpi, args.high_dpi, args.page_confidence, args.line_confidence)
+        report['adaptive'] = {'policy': vars(policy), 'backends': {}}
+        corpus_dir = tempfile.mkdtemp(prefix='casesheet-ocr-')
+        try:
+            paths = []
+            for i in range(args.sheets):
+                path = os.path.join(corpus_dir, f'scan_{i}.pdf')
+                make_case_sheet(path, kind='scanned', pages=2, seed=args.seed + i, dpi=args.dpi, noise=args.noise)
+                paths.append(path)
+            for backend in args.backends:
+                report['adaptive']['backends'][backend] = bench_adaptive(backend, paths, policy)
+        finally:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
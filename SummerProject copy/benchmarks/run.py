@@ -0,0 +1,302 @@
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.corpus import KINDS, generate_corpus
+from casesheet.analysis import extract_disease_lsa
+from casesheet.classify import default_classifier
+from casesheet.extract import (OCR_DPI, extract_text_from_pdf, extract_text_with_ocr, open_document,
+                               preprocess_for_ocr, render_page)
+from casesheet.limits import current_rss
+from casesheet.profiling import profile_call
+from casesheet.text import extract_sections, filter_relevant_text
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ('extraction', 'ocr', 'filtering', 'sectioning', 'lsa', 'classify', 'summarization', 'upload')
+
+
+def timed(fn, *args, repeat=1):
+    """Runs fn repeat times and returns (last result, list of wall times)."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        samples.append(time.perf_counter() - start)
+    return result, samples
+
+
+def describe(samples):
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'mean_s': round(statistics.fmean(ordered), 6),
+        'p50_s': round(ordered[len(ordered) // 2], 6),
+        'p95_s': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 6),
+        'min_s': round(ordered[0], 6),
+        'max_s': round(ordered[-1], 6),
+    }
+
+
+def profiled(fn, *args):
+    """
+    Runs fn once under tracemalloc while sampling RSS every 5 ms. Returns
+    (result, peak traced bytes, peak RSS growth in bytes); the RSS figure
+    also covers what MuPDF, PIL and Tesseract allocate outside Python.
+    """
+    baseline = current_rss()
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.005):
+            peak[0] = max(peak[0], current_rss())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    tracemalloc.start()
+    sampler.start()
+    try:
+        result = fn(*args)
+    finally:
+        done.set()
+        sampler.join()
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, traced_peak, max(peak[0], current_rss()) - baseline
+
+
+def memory_profile(fn, *args, pages=1):
+    """Peak memory of one run; with pages handled one at a time it should stay flat as pages grow."""
+    _, traced, rss = profiled(fn, *args)
+    return {'pages': pages, 'traced_peak_mb': round(traced / 2 ** 20, 2), 'rss_peak_growth_mb': round(rss / 2 ** 20, 2)}
+
+
+def render_all(path, dpi=OCR_DPI):
+    """Renders and preprocesses every page as OCR would, without running Tesseract."""
+    with open_document(path) as doc:
+        for page in doc:
+            preprocess_for_ocr(render_page(page, dpi))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=APP_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextlib.contextmanager
+def app_workdir():
+    """Imports the Flask app from a scratch directory so its DB and uploads stay out of the tree."""
+    workdir = tempfile.mkdtemp(prefix='casesheet-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    try:
+        yield workdir
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def login_client(app_module, username='bench'):
+    client = app_module.app.test_client()
+    credentials = {'username': username, 'password': 'bench'}
+    client.post('/register', data=credentials)
+    client.post('/login', data=credentials)
+    return client
+
+
+def upload(client, path):
+    """Posts path to /upload; returns (seconds, error or None)."""
+    with open(path, 'rb') as f:
+        start = time.perf_counter()
+        response = client.post('/upload', data={'file': (f, os.path.basename(path))},
+                               content_type='multipart/form-data')
+        elapsed = time.perf_counter() - start
+    return elapsed, (response.get_json(silent=True) or {}).get('error')
+
+
+def bench_file(app, entry, stages, repeat, memory=False, profile_dir=None, profile_keep=None):
+    pipeline = app.case_pipeline
+    path = entry['path']
+    result = {'file': os.path.basename(path), 'kind': entry['kind'], 'pages': entry['pages'],
+              'bytes': entry['bytes'], 'stages': {}}
+    stage_results = result['stages']
+
+    text = ''
+    if 'extraction' in stages:
+        text, samples = timed(extract_text_from_pdf, path, repeat=repeat)
+        stage_results['extraction'] = describe(samples)
+    if 'ocr' in stages and (not text or entry['kind'] != 'text'):
+        if shutil.which('tesseract'):
+            ocr_text, samples = timed(extract_text_with_ocr, path, repeat=repeat)
+            stage_results['ocr'] = describe(samples)
+            text = text or ocr_text
+        else:
+            stage_results['ocr'] = {'skipped': 'tesseract not found'}
+    if profile_dir:
+        # One extra whole-pipeline run per file, profiled as <profile_dir>/<file name>.*
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            profile_call(name, pipeline.process, path, out_dir=profile_dir, keep=profile_keep)
+            result['profile'] = os.path.join(profile_dir, name)
+        except Exception as e:
+            result['profile_error'] = f"{type(e).__name__}: {e}"
+    if memory:
+        # After the timed runs, so first-call warm-up does not count as per-page memory
+        profiles = result['memory'] = {}
+        if 'extraction' in stages:
+            profiles['extraction'] = memory_profile(extract_text_from_pdf, path, pages=entry['pages'])
+        if 'ocr' in stages and entry['kind'] != 'text':
+            profiles['render'] = memory_profile(render_all, path, pages=entry['pages'])
+            if shutil.which('tesseract'):
+                profiles['ocr'] = memory_profile(extract_text_with_ocr, path, pages=entry['pages'])
+    if not text.strip():
+        result['error'] = 'no text extracted'
+        return result
+
+    if 'filtering' in stages:
+        text, samples = timed(filter_relevant_text, text, repeat=repeat)
+        stage_results['filtering'] = describe(samples)
+    else:
+        text = filter_relevant_text(text)
+    sections, samples = timed(extract_sections, text, repeat=repeat)
+    if 'sectioning' in stages:
+        stage_results['sectioning'] = describe(samples)
+        result['sections_found'] = sorted(sections)
+    if 'lsa' in stages:
+        _, samples = timed(extract_disease_lsa, text, repeat=repeat)
+        stage_results['lsa'] = describe(samples)
+    if 'classify' in stages:
+        _, samples = timed(default_classifier().classify, text, repeat=repeat)
+        stage_results['classify'] = describe(samples)
+    if 'summarization' in stages:
+        contents = [c for c in sections.values() if c] or [text]
+        # Straight to the summarizer so repeats are not served from the pipeline cache
+        _, samples = timed(lambda: [pipeline.summarizer.summarize(c) for c in contents], repeat=repeat)
+        stage_results['summarization'] = describe(samples)
+        stage_results['summarization']['calls_per_run'] = len(contents)
+
+    if 'upload' in stages:
+        # Cold: a new user (no earlier version whose sections could be reused) and
+        # an empty summary cache. Warm: the same file again right after, by the same user.
+        cold, warm = [], []
+        for n in range(repeat):
+            client = login_client(app, f"bench-{entry['kind']}-{os.path.basename(path)}-{n}")
+            pipeline.clear_cache()
+            for samples in (cold, warm):
+                elapsed, error = upload(client, path)
+                samples.append(elapsed)
+                if error:
+                    result['upload_error'] = error
+        stage_results['upload'] = describe(cold)
+        stage_results['upload_warm'] = describe(warm)
+
+    return result
+
+
+def aggregate(files):
+    """Pools per-file samples by stage and document kind."""
+    pooled = {}
+    for entry in files:
+        for stage_name, stats in entry['stages'].items():
+            if 'mean_s' not in stats:
+                continue
+            bucket = pooled.setdefault(stage_name, {}).setdefault(entry['kind'], {'seconds': 0.0, 'pages': 0, 'files': 0})
+            bucket['seconds'] += stats['mean_s']
+            bucket['pages'] += entry['pages']
+            bucket['files'] += 1
+    for kinds in pooled.values():
+        for bucket in kinds.values():
+            bucket['seconds'] = round(bucket['seconds'], 6)
+            bucket['pages_per_s'] = round(bucket['pages'] / bucket['seconds'], 3) if bucket['seconds'] else None
+    return pooled
+
+
+def compare(current, baseline):
+    """Per stage/kind ratio of current to baseline seconds; > 1 is a slowdown."""
+    ratios = {}
+    for stage_name, kinds in current['aggregate'].items():
+        for kind, bucket in kinds.items():
+            base = baseline.get('aggregate', {}).get(stage_name, {}).get(kind)
+            if base and base['seconds']:
+                ratios.setdefault(stage_name, {})[kind] = round(bucket['seconds'] / base['seconds'], 3)
+    return ratios
+
+
+def run(args):
+    corpus_dir = args.corpus or tempfile.mkdtemp(prefix='casesheet-corpus-')
+    manifest = generate_corpus(corpus_dir, args.kinds, args.pages, args.copies, args.seed, args.dpi)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': {'kinds': args.kinds, 'pages': args.pages, 'copies': args.copies, 'seed': args.seed,
+                   'dpi': args.dpi, 'repeat': args.repeat, 'stages': args.stages, 'memory': args.memory},
+        'files': [],
+    }
+
+    with app_workdir():
+        app = importlib.import_module(args.app)
+        for entry in manifest:
+            report['files'].append(bench_file(app, entry, args.stages, args.repeat,
+                                              args.memory, args.profile, len(manifest)))
+
+    report['aggregate'] = aggregate(report['files'])
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            report['vs_baseline'] = compare(report, json.load(f))
+    if not args.corpus:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the case sheet pipeline on a synthetic corpus.")
+    parser.add_argument('--app', default='summer3', help="module exposing the Flask app and its case_pipeline")
+    parser.add_argument('--kinds', nargs='+', default=list(KINDS), choices=KINDS)
+    parser.add_argument('--pages', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--copies', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dpi', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=STAGES)
+    parser.add_argument('--memory', action='store_true',
+                        help="also report peak traced and RSS memory per page of extraction, rendering and OCR")
+    parser.add_argument('--profile', metavar='DIR',
+                        help="also profile one whole-pipeline run per file into DIR (pstats + speedscope)")
+    parser.add_argument('--corpus', help="keep the generated corpus in this directory")
+    parser.add_argument('--baseline', help="earlier JSON report to compare against")
+    parser.add_argument('--out', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
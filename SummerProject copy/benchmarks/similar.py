@@ -0,0 +1,97 @@
+import argparse
+import itertools
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.run import describe, git_commit
+from casesheet.similar import SimilarIndex
+
+
+def fill(index, rows, users, chunk, seed):
+    """Appends rows random unit vectors spread over users; returns seconds taken."""
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    for first in range(0, rows, chunk):
+        n = min(chunk, rows - first)
+        vectors = rng.standard_normal((n, index.dims), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index.add_vectors(np.arange(first + 1, first + n + 1), rng.integers(1, users + 1, n), vectors)
+    return time.perf_counter() - start
+
+
+def bench_queries(index, rows, users, queries, k, seed):
+    """Latency of similar() for random summary ids, over all rows and scoped to the id's owner."""
+    rng = np.random.default_rng(seed + 1)
+    ids = rng.integers(1, rows + 1, queries)
+    index.similar(int(ids[0]), k)  # first touch pages the vectors in
+    results = {}
+    for scope in ('all', 'user'):
+        samples = []
+        for summary_id in ids:
+            user_id = int(index.users[summary_id - 1]) if scope == 'user' else None
+            start = time.perf_counter()
+            index.similar(int(summary_id), k, user_id=user_id)
+            samples.append(time.perf_counter() - start)
+        results[scope] = describe(samples)
+    return results
+
+
+def recall(index, rows, queries, k, seed):
+    """Share of the exact top k an approximate index also returns."""
+    rng = np.random.default_rng(seed + 2)
+    exact = SimilarIndex(index.path, ann='none')
+    found = total = 0
+    for summary_id in rng.integers(1, rows + 1, queries):
+        truth = {hit[0] for hit in exact.similar(int(summary_id), k)}
+        found += len(truth & {hit[0] for hit in index.similar(int(summary_id), k)})
+        total += len(truth)
+    return round(found / total, 4) if total else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similar-case query latency over a synthetic memory-mapped index.")
+    parser.add_argument('--rows', nargs='+', type=int, default=[100_000, 1_000_000])
+    parser.add_argument('--dims', type=int, default=128)
+    parser.add_argument('--users', nargs='+', type=int, default=[1, 3, 50],
+                        help="owners the rows are spread over; 1 is a single-tenant deployment")
+    parser.add_argument('--ann', nargs='+', default=['none'], choices=['none', 'hnsw'])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--chunk', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    report = {'commit': git_commit(), 'dims': args.dims, 'k': args.k, 'runs': []}
+    for rows, users in itertools.product(args.rows, args.users):
+        index_dir = tempfile.mkdtemp(prefix='casesheet-similar-')
+        try:
+            fill_s = fill(SimilarIndex(index_dir, dims=args.dims), rows, users, args.chunk, args.seed)
+            for ann in args.ann:
+                index = SimilarIndex(index_dir, ann=ann)
+                start = time.perf_counter()
+                index.similar(1, args.k)  # hnsw: builds the graph
+                run = {'rows': rows, 'users': users, 'ann': ann, 'fill_s': round(fill_s, 3),
+                       'first_query_s': round(time.perf_counter() - start, 4),
+                       'vectors_mb': round(rows * args.dims / 1024 / 1024, 1),
+                       'query': bench_queries(index, rows, users, args.queries, args.k, args.seed)}
+                if ann != 'none':
+                    run['recall'] = recall(index, rows, min(args.queries, 20), args.k, args.seed)
+                report['runs'].append(run)
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import json
+import random
+import time
+
+from benchmarks.corpus import case_sheet_lines
+from benchmarks.run import describe, git_commit
+from casesheet.summarize import BACKENDS, BartSummarizer
+from casesheet.text import extract_sections, filter_relevant_text
+
+
+def fixed_sections(count=20, seed=0):
+    """A deterministic set of section texts drawn from the synthetic corpus."""
+    sections = []
+    sheet = 0
+    while len(sections) < count:
+        rng = random.Random(f"summarizers-{seed}-{sheet}")
+        text = "\n".join(line for page in case_sheet_lines(rng, pages=1) for line in page)
+        sections.extend(c for c in extract_sections(filter_relevant_text(text)).values() if c)
+        sheet += 1
+    return sections[:count]
+
+
+def _tokens(text):
+    return text.lower().split()
+
+
+def rouge1_f(candidate, reference):
+    cand, ref = _tokens(candidate), _tokens(reference)
+    if not cand or not ref:
+        return 0.0
+    ref_counts = {}
+    for token in ref:
+        ref_counts[token] = ref_counts.get(token, 0) + 1
+    overlap = 0
+    for token in cand:
+        if ref_counts.get(token):
+            ref_counts[token] -= 1
+            overlap += 1
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / len(cand), overlap / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def rougel_f(candidate, reference):
+    cand, ref = _tokens(candidate), _tokens(reference)
+    if not cand or not ref:
+        return 0.0
+    previous = [0] * (len(ref) + 1)
+    for c in cand:
+        current = [0]
+        for j, r in enumerate(ref, 1):
+            current.append(previous[j - 1] + 1 if c == r else max(previous[j], current[j - 1]))
+        previous = current
+    lcs = previous[-1]
+    if not lcs:
+        return 0.0
+    precision, recall = lcs / len(cand), lcs / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def bench_backend(backend, sections, onnx_path, repeat):
+    summarizer = BartSummarizer(backend=backend, onnx_path=onnx_path)
+    start = time.perf_counter()
+    try:
+        summarizer.load()
+    except Exception as e:
+        return {'skipped': f"{type(e).__name__}: {e}"}, None
+    load_s = time.perf_counter() - start
+
+    outputs = []
+    samples = []
+    for text in sections:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            summary = summarizer.summarize(text)
+            samples.append(time.perf_counter() - start)
+        outputs.append(summary)
+    result = {'model_version': summarizer.model_version, 'load_s': round(load_s, 3), 'per_call': describe(samples)}
+    return result, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare summarizer backends on a fixed set of sections.")
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--baseline', default='transformers', choices=BACKENDS)
+    parser.add_argument('--onnx-path')
+    parser.add_argument('--sections', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    sections = fixed_sections(args.sections, args.seed)
+    backends = [args.baseline] + [b for b in args.backends if b != args.baseline]
+    report = {'commit': git_commit(), 'sections': len(sections), 'baseline': args.baseline, 'backends': {}}
+
+    reference = None
+    for backend in backends:
+        result, outputs = bench_backend(backend, sections, args.onnx_path, args.repeat)
+        if outputs is not None:
+            if reference is None and backend == args.baseline:
+                reference = outputs
+            if reference is not None:
+                result['rouge1_f'] = round(sum(map(rouge1_f, outputs, reference)) / len(outputs), 4)
+                result['rougeL_f'] = round(sum(map(rougel_f, outputs, reference)) / len(outputs), 4)
+                base = report['backends'].get(args.baseline, {}).get('per_call')
+                if base:
+                    result['speedup'] = round(base['mean_s'] / result['per_call']['mean_s'], 3)
+        report['backends'][backend] = result
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
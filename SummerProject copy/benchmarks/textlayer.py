@@ -0,0 +1,97 @@
+import argparse
+import json
+import re
+import shutil
+import tempfile
+import time
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.run import describe, git_commit
+from benchmarks.summarizers import rouge1_f
+from casesheet.text import extract_sections, filter_relevant_text
+from casesheet.textlayer import BACKENDS, get_backend
+
+SPACE_RE = re.compile(r'\s+')
+
+
+def read_pages(backend, path):
+    with backend.open(path) as document:
+        return [document.text(index) for index in range(len(document))]
+
+
+def bench_backend(name, paths, repeat):
+    """Seconds per page and pages per second reading every file's text layer repeat times."""
+    backend = get_backend(name)
+    samples, pages, texts = [], 0, {}
+    for _ in range(repeat):
+        for path in paths:
+            start = time.perf_counter()
+            texts[path] = read_pages(backend, path)
+            samples.append(time.perf_counter() - start)
+            pages += len(texts[path])
+    total = sum(samples)
+    return {'per_file': describe(samples), 'pages_per_s': round(pages / total, 2) if total else None}, texts
+
+
+def equivalence(texts, reference):
+    """
+    How close one backend's output is to the reference backend's: identical
+    text after whitespace normalization, identical sections after filtering,
+    and ROUGE-1 of the joined text.
+    """
+    same_text = same_sections = 0
+    agreement = []
+    for path, pages in texts.items():
+        text, ref = "\n".join(pages), "\n".join(reference[path])
+        same_text += SPACE_RE.sub(' ', text).strip() == SPACE_RE.sub(' ', ref).strip()
+        sections = extract_sections(filter_relevant_text(text))
+        ref_sections = extract_sections(filter_relevant_text(ref))
+        same_sections += ({k: SPACE_RE.sub(' ', v) for k, v in sections.items()} ==
+                          {k: SPACE_RE.sub(' ', v) for k, v in ref_sections.items()})
+        agreement.append(rouge1_f(text, ref))
+    files = len(texts) or 1
+    return {
+        'same_text_rate': round(same_text / files, 4),
+        'same_sections_rate': round(same_sections / files, 4),
+        'rouge1': round(sum(agreement) / len(agreement), 4) if agreement else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text-layer throughput and output equivalence of each backend.")
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--reference', default='pypdf2', choices=BACKENDS, help="backend the others are compared to")
+    parser.add_argument('--pages', nargs='+', type=int, default=[1, 4, 16])
+    parser.add_argument('--copies', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    corpus_dir = tempfile.mkdtemp(prefix='casesheet-text-')
+    try:
+        manifest = generate_corpus(corpus_dir, kinds=('text',), page_counts=args.pages, copies=args.copies,
+                                   seed=args.seed)
+        paths = [entry['path'] for entry in manifest]
+        report = {'commit': git_commit(), 'files': len(paths), 'pages': args.pages, 'backends': {}}
+        outputs = {}
+        for name in dict.fromkeys(args.backends + [args.reference]):
+            report['backends'][name], outputs[name] = bench_backend(name, paths, args.repeat)
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    base = report['backends'][args.reference]['per_file']['mean_s']
+    for name, result in report['backends'].items():
+        result['speedup'] = round(base / result['per_file']['mean_s'], 3)
+        result['vs_' + args.reference] = equivalence(outputs[name], outputs[args.reference])
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
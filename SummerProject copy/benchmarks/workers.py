@@ -0,0 +1,111 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from benchmarks.run import describe, git_commit
+from benchmarks.summarizers import fixed_sections
+from casesheet.summarize import BACKENDS, BartSummarizer
+
+
+def memory(process=None):
+    """RSS, plus USS/PSS where the platform reports them, in MiB."""
+    import psutil
+
+    process = process or psutil.Process()
+    try:
+        info = process.memory_full_info()
+    except (psutil.AccessDenied, AttributeError):
+        info = process.memory_info()
+    return {field: round(getattr(info, field) / 2 ** 20, 1) for field in ('rss', 'uss', 'pss') if hasattr(info, field)}
+
+
+# Set in the parent before forking so fork workers inherit the loaded model
+_summarizer = None
+
+
+def _worker(backend, model_path, text, preloaded, results):
+    global _summarizer
+    try:
+        start = time.perf_counter()
+        if not preloaded:
+            _summarizer = BartSummarizer(backend=backend, onnx_path=model_path)
+            _summarizer.load()
+        load_s = time.perf_counter() - start
+        start = time.perf_counter()
+        _summarizer.summarize(text)
+        results.put({'load_s': load_s, 'first_call_s': time.perf_counter() - start, 'memory': memory()})
+    except Exception as e:
+        results.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def bench_mode(backend, model_path, text, workers, start_method):
+    """
+    Starts workers that each summarize one text. With fork the model is
+    loaded once in the parent first, the way gunicorn --preload does it.
+    """
+    global _summarizer
+    context = multiprocessing.get_context(start_method)
+    preloaded = start_method == 'fork'
+    parent = {}
+    if preloaded:
+        start = time.perf_counter()
+        _summarizer = BartSummarizer(backend=backend, onnx_path=model_path)
+        _summarizer.load()
+        parent = {'load_s': round(time.perf_counter() - start, 3), 'memory': memory()}
+
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(backend, model_path, text, preloaded, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    _summarizer = None
+    errors = [r['error'] for r in reports if 'error' in r]
+    if errors:
+        raise RuntimeError(errors[0])
+
+    report = {'workers': workers, 'start_method': start_method,
+              'load_s': describe([r['load_s'] for r in reports]),
+              'first_call_s': describe([r['first_call_s'] for r in reports])}
+    for field in reports[0]['memory']:
+        values = [r['memory'][field] for r in reports]
+        report[f'{field}_mib'] = {'mean': round(sum(values) / len(values), 1), 'max': max(values)}
+    if parent:
+        report['parent'] = parent
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load time and memory per extra worker process for each backend.")
+    parser.add_argument('--backends', nargs='+', default=['transformers', 'mmap'], choices=BACKENDS)
+    parser.add_argument('--model-path', help="exported model directory for the onnx and mmap backends")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--start-methods', nargs='+', default=['spawn', 'fork'], choices=('spawn', 'fork'))
+    parser.add_argument('--out')
+    args = parser.parse_args()
+
+    text = fixed_sections(1)[0]
+    report = {'commit': git_commit(), 'cpu_count': os.cpu_count(), 'backends': {}}
+    for backend in args.backends:
+        modes = {}
+        for start_method in args.start_methods:
+            try:
+                modes[start_method] = bench_mode(backend, args.model_path, text, args.workers, start_method)
+            except Exception as e:
+                modes[start_method] = {'skipped': f"{type(e).__name__}: {e}"}
+        report['backends'][backend] = modes
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+"""Shared case sheet engine used by the Tkinter apps and the Flask app."""
+
+from .classify import CaseSheetClassifier, Classification, default_classifier
+from .metrics import REGISTRY, request_trace, stage
+from .pipeline import ANALYSES, Cancelled, CaseSheetPipeline, CaseSheetResult, save_summary
+from .resources import ResourceBudget, default_budget
+from .summarize import (BartSummarizer, ExtractiveSummarizer, SummaryRouter, Tier, build_summarizers,
+                        distilbart_summarizer, make_summarizer)
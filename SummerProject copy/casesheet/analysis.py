@@ -0,0 +1,97 @@
+NORMAL_KEYWORDS = [
+    "no complaints", "healthy", "routine checkup", "fit", "normal findings", "asymptomatic"
+]
+TAKING_MEDICINE_KEYWORDS = [
+    "medication", "tablet", "capsule", "prescribed", "take medicine", "continue medicine",
+    "on treatment", "course of antibiotics", "blood pressure control", "insulin", "dose"
+]
+CHECKUP_KEYWORDS = [
+    "visit doctor", "consult", "appointment", "examination", "evaluation",
+    "follow up", "symptoms", "fever", "pain", "nausea", "diagnosis pending"
+]
+
+
+def extract_disease_lsa(text, n_components=2):
+    """Returns the top LSA terms of the document and the lines that mention them."""
+    disease_keywords, relevant_sentences = lsa_disease_keywords(text, n_components)
+    return disease_summary(disease_keywords), relevant_sentences
+
+
+def disease_summary(disease_keywords):
+    return " ".join(disease_keywords[:3]) if disease_keywords else "No disease identified"
+
+
+def lsa_disease_keywords(text, n_components=2):
+    """The top five terms of each LSA component, and the lines that mention any of them."""
+    # sklearn is only needed by the front-ends that report a disease
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.decomposition import TruncatedSVD
+
+    sentences = text.split('\n')
+    if not sentences:
+        return [], []
+
+    vectorizer = TfidfVectorizer(stop_words='english')
+    try:
+        X = vectorizer.fit_transform(sentences)
+    except ValueError:
+        return [], []
+
+    svd = TruncatedSVD(n_components=n_components)
+    svd.fit_transform(X)
+    terms = vectorizer.get_feature_names_out()
+    components = svd.components_
+
+    disease_keywords = []
+    for component in components:
+        top_term_indices = component.argsort()[-5:][::-1]
+        disease_keywords.extend([terms[i] for i in top_term_indices])
+
+    relevant_sentences = [s for s in sentences if any(kw in s.lower() for kw in disease_keywords)]
+    return disease_keywords, relevant_sentences
+
+
+def sentiment_polarity(text):
+    """Mean lexicon polarity of the text, from -1 (negative) to 1 (positive)."""
+    from .classify import default_classifier
+    return default_classifier().classify(text)['status'].score
+
+
+STATUS_MESSAGES = {
+    'stable': "Stable: Patient condition appears positive.",
+    'critical': "Critical: Patient may require urgent attention.",
+    'monitor': "Monitor: Patient condition needs regular observation.",
+}
+SUGGESTION_MESSAGES = {
+    'stable': "✅ Patient condition is stable. Continue treatment and review later.",
+    'critical': "⚠️ Patient may need urgent attention. Refer immediately.",
+    'monitor': "🔍 Monitor progress and revisit if symptoms persist.",
+}
+STATE_MESSAGES = {
+    'medicine': "💊 Taking Medicine: Patient is on a prescribed treatment plan and should continue medication as advised.",
+    'checkup': "🩺 Checkup to a Doctor: Patient needs medical evaluation for symptoms or a routine examination.",
+    'normal': "✅ Normal: Patient is generally healthy and requires no immediate medical attention.",
+    'unknown': "ℹ Unable to determine exact patient state from the given text.",
+}
+
+
+def status_label(polarity):
+    if polarity > 0.2:
+        return 'stable'
+    elif polarity < -0.2:
+        return 'critical'
+    return 'monitor'
+
+
+def analyze_patient_status(polarity):
+    return STATUS_MESSAGES[status_label(polarity)]
+
+
+def suggest_from_polarity(polarity):
+    return SUGGESTION_MESSAGES[status_label(polarity)]
+
+
+def determine_patient_state(text):
+    """Determines the patient's state from the keyword class with the most hits in the text."""
+    from .classify import default_classifier
+    return STATE_MESSAGES[default_classifier().classify(text)['state'].label]
@@ -0,0 +1,56 @@
+"""
+Summarizes PDFs from the command line, one after another, writing each
+summary next to its PDF as <name>_summary.txt:
+
+    python -m casesheet.batch notes/*.pdf --summarizer extractive --profile profiles
+
+With --profile every file's run is profiled (see casesheet.profiling) and
+saved as <dir>/<file name>.pstats and .speedscope.json.
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+from . import profiling
+from .pipeline import ANALYSES, CaseSheetPipeline, save_summary
+
+
+def iter_pdfs(paths):
+    """The PDFs named in paths, directories expanded to the PDFs directly in them."""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, '*.pdf')))
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize case sheet PDFs.")
+    parser.add_argument('paths', nargs='+', help="PDF files or directories of them")
+    parser.add_argument('--summarizer', default='extractive', help="summarizer name (see casesheet.summarize)")
+    parser.add_argument('--analyses', nargs='*', default=['suggestion'], choices=ANALYSES)
+    parser.add_argument('--profile', metavar='DIR', help="profile each file's run into DIR (pstats + speedscope)")
+    parser.add_argument('--profile-keep', type=int, help="profiles kept in DIR (default: CASESHEET_PROFILE_KEEP)")
+    args = parser.parse_args()
+
+    pipeline = CaseSheetPipeline(summarizer=args.summarizer, analyses=args.analyses)
+    failed = 0
+    for path in iter_pdfs(args.paths):
+        try:
+            if args.profile:
+                name = os.path.splitext(os.path.basename(path))[0]
+                result = profiling.profile_call(name, pipeline.process, path, out_dir=args.profile,
+                                                keep=args.profile_keep)
+            else:
+                result = pipeline.process(path)
+            print(f"{path} -> {save_summary(path, result.render())}")
+        except Exception as e:
+            failed += 1
+            print(f"{path}: {e}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
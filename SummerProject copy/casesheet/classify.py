@@ -0,0 +1,246 @@
+"""
+Patient state and status in one pass over a document's token ids: keyword
+phrase hits per state class and lexicon polarity for the status, for one
+document or a whole batch at once. Given section spans, the status is scored
+per clinical section from the same token array and then aggregated.
+"""
+
+import os
+import re
+import threading
+
+import numpy as np
+
+from .analysis import CHECKUP_KEYWORDS, NORMAL_KEYWORDS, TAKING_MEDICINE_KEYWORDS, status_label
+
+# Highest priority first; a tie in keyword hits goes to the earlier class
+STATE_CLASSES = (
+    ('medicine', TAKING_MEDICINE_KEYWORDS),
+    ('checkup', CHECKUP_KEYWORDS),
+    ('normal', NORMAL_KEYWORDS),
+)
+STATUS_THRESHOLD = 0.2
+NEGATIONS = ('no', 'not', "n't", 'never')
+# Sections that describe the patient's condition; history and plans only dilute it
+SENTIMENT_SECTIONS = ('chief complaint', 'presenting complaint', 'problem summary', 'diagnosis', 'assessment')
+
+# "doesn't" -> "does", "n't": the word stops before n't so the negation is its own token
+TOKEN_RE = re.compile(r"[a-z]+(?=n't)|n't|[a-z]+")
+
+_UNKNOWN = 0
+_SEPARATOR = -1  # between documents in a batch, so phrases never span two
+
+
+class Classification:
+    """A label with the share of the evidence that supports it (0 when there was none)."""
+
+    def __init__(self, label, confidence, score=None):
+        self.label = label
+        self.confidence = confidence
+        self.score = score
+
+    def as_dict(self):
+        data = {'label': self.label, 'confidence': round(self.confidence, 4)}
+        if self.score is not None:
+            data['score'] = round(self.score, 4)
+        return data
+
+
+def plural(word):
+    """Regular English plural of word, for keywords to also match their plural."""
+    if word.endswith(('s', 'x', 'z', 'ch', 'sh')):
+        return word + 'es'
+    if word.endswith('y') and word[-2:-1] not in ('a', 'e', 'i', 'o', 'u'):
+        return word[:-1] + 'ies'
+    return word + 's'
+
+
+def load_lexicon():
+    """TextBlob's adjective lexicon as word -> polarity, averaged over the word's senses."""
+    import xml.etree.ElementTree as ET
+    import textblob
+
+    path = os.path.join(os.path.dirname(textblob.__file__), 'en', 'en-sentiment.xml')
+    senses = {}
+    for word in ET.parse(path).getroot().iter('word'):
+        form = word.get('form', '').lower()
+        if TOKEN_RE.fullmatch(form):
+            senses.setdefault(form, []).append(float(word.get('polarity', 0.0)))
+    return {form: sum(values) / len(values) for form, values in senses.items()}
+
+
+class CaseSheetClassifier:
+    """
+    Tokenizes once into ids over a fixed vocabulary (keyword words plus the
+    sentiment lexicon) and scores everything from that array with NumPy.
+    Keywords match whole words; a keyword word's plural maps to the same id,
+    so "medications" counts as "medication".
+    """
+
+    def __init__(self, lexicon=None, state_classes=STATE_CLASSES):
+        lexicon = load_lexicon() if lexicon is None else lexicon
+        self.state_labels = [label for label, _ in state_classes]
+
+        self.vocab = {}
+        polarity = [0.0]
+        for word, value in lexicon.items():
+            self.vocab[word] = len(polarity)
+            polarity.append(value)
+        in_lexicon = len(polarity)
+
+        self.phrases = []  # (class index, token ids)
+        self.phrase_text = []
+        for index, (_, keywords) in enumerate(state_classes):
+            for keyword in keywords:
+                ids = []
+                for word in TOKEN_RE.findall(keyword.lower()):
+                    if word not in self.vocab:
+                        self.vocab[word] = len(polarity)
+                        polarity.append(0.0)
+                    ids.append(self.vocab[word])
+                    self.vocab.setdefault(plural(word), self.vocab[word])
+                self.phrases.append((index, np.array(ids)))
+                self.phrase_text.append(keyword)
+        for word in NEGATIONS:
+            if word not in self.vocab:
+                self.vocab[word] = len(polarity)
+                polarity.append(0.0)
+
+        self.polarity = np.array(polarity)
+        self.scored = np.zeros(len(polarity), dtype=bool)
+        self.scored[1:in_lexicon] = True
+        self.negation_ids = np.array([self.vocab[w] for w in NEGATIONS])
+
+    def tokenize(self, text):
+        """Token ids of text; words outside the vocabulary map to 0."""
+        get = self.vocab.get
+        return np.fromiter((get(t, _UNKNOWN) for t in TOKEN_RE.findall(text.lower())), dtype=np.int64)
+
+    def tokenize_spans(self, text):
+        """Token ids plus the character offset each token starts at."""
+        get = self.vocab.get
+        matches = list(TOKEN_RE.finditer(text.lower()))
+        ids = np.fromiter((get(m.group(), _UNKNOWN) for m in matches), dtype=np.int64, count=len(matches))
+        starts = np.fromiter((m.start() for m in matches), dtype=np.int64, count=len(matches))
+        return ids, starts
+
+    def classify(self, text, spans=None, sections=SENTIMENT_SECTIONS):
+        """
+        Classifies one document. With spans (see text.section_spans) the
+        status comes from the named sections only, each scored from the
+        shared token array; the result then also has a 'sections' entry.
+        """
+        if spans is None:
+            return self.classify_batch([text])[0]
+        ids, starts = self.tokenize_spans(text)
+        relevant = {name: spans[name] for name in sections if name in spans}
+        if not relevant:
+            return self.score_ids([ids])[0]
+        result = self.score_ids([ids], status=False)[0]
+        result['sections'], result['status'] = self.score_sections(ids, starts, relevant)
+        return result
+
+    def classify_batch(self, texts):
+        """
+        Returns one dict per text: 'state' and 'status' Classifications and
+        'entities', the (state class, keyword) pairs found.
+        """
+        return self.score_ids([self.tokenize(text) for text in texts])
+
+    def score_ids(self, docs, status=True):
+        """Scores already tokenized documents, concatenated into one array."""
+        if not docs:
+            return []
+        count = len(docs)
+        pieces = []
+        for ids in docs:
+            pieces.extend((ids, [_SEPARATOR]))
+        ids = np.concatenate(pieces).astype(np.int64)
+        doc = np.repeat(np.arange(count), [len(d) + 1 for d in docs])
+
+        phrase_hits = np.zeros((count, len(self.phrases)))
+        hits = np.zeros((count, len(self.state_labels)))
+        for p, (index, phrase) in enumerate(self.phrases):
+            n = len(phrase)
+            if n > len(ids):
+                continue
+            match = ids[:len(ids) - n + 1] == phrase[0]
+            for offset in range(1, n):
+                match &= ids[offset:len(ids) - n + 1 + offset] == phrase[offset]
+            phrase_hits[:, p] = np.bincount(doc[:len(match)][match], minlength=count)
+            hits[:, index] += phrase_hits[:, p]
+
+        results = [{'state': self._state(hits[i]), 'entities': self._entities(phrase_hits[i])} for i in range(count)]
+        if not status:
+            return results
+
+        scored, values = self._polarities(ids)
+        totals = np.bincount(doc, weights=np.where(scored, values, 0.0), minlength=count)
+        words = np.bincount(doc, weights=scored, minlength=count)
+        positive = np.bincount(doc, weights=scored & (values > STATUS_THRESHOLD), minlength=count)
+        negative = np.bincount(doc, weights=scored & (values < -STATUS_THRESHOLD), minlength=count)
+
+        for i, result in enumerate(results):
+            result['status'] = _status(totals[i], words[i], positive[i], negative[i])
+        return results
+
+    def score_sections(self, ids, starts, spans):
+        """
+        Returns ({section: status Classification}, aggregate Classification).
+        Running sums over the token array make each section O(1) after one
+        pass; the aggregate weighs sections by their lexicon word count.
+        """
+        scored, values = self._polarities(ids)
+        sums = np.zeros((4, len(ids) + 1))
+        np.cumsum(np.where(scored, values, 0.0), out=sums[0, 1:])
+        np.cumsum(scored, out=sums[1, 1:])
+        np.cumsum(scored & (values > STATUS_THRESHOLD), out=sums[2, 1:])
+        np.cumsum(scored & (values < -STATUS_THRESHOLD), out=sums[3, 1:])
+
+        names = list(spans)
+        bounds = np.searchsorted(starts, np.array([spans[name] for name in names]).reshape(-1))
+        per_section = sums[:, bounds[1::2]] - sums[:, bounds[0::2]]
+        sections = {name: _status(*per_section[:, i]) for i, name in enumerate(names)}
+        return sections, _status(*per_section.sum(axis=1))
+
+    def _polarities(self, ids):
+        # Lexicon words average into the polarity; "not good" counts as -0.5 * good
+        safe_ids = np.where(ids < 0, _UNKNOWN, ids)
+        scored = self.scored[safe_ids]
+        values = self.polarity[safe_ids]
+        negated = np.zeros(len(ids), dtype=bool)
+        negated[1:] = np.isin(ids[:-1], self.negation_ids)
+        return scored, np.where(negated, values * -0.5, values)
+
+    def _entities(self, phrase_hits):
+        """(state class, keyword phrase) for each keyword found in the document."""
+        return [(self.state_labels[self.phrases[p][0]], self.phrase_text[p]) for p in np.flatnonzero(phrase_hits)]
+
+    def _state(self, hits):
+        total = hits.sum()
+        if not total:
+            return Classification('unknown', 0.0)
+        best = int(np.argmax(hits))  # argmax keeps the first of equal counts
+        return Classification(self.state_labels[best], float(hits[best] / total))
+
+
+def _status(total, words, positive, negative):
+    polarity = float(total / words) if words else 0.0
+    label = status_label(polarity)
+    support = {'stable': positive, 'critical': negative, 'monitor': words - positive - negative}[label]
+    confidence = float(support / words) if words else 0.0
+    return Classification(label, confidence, polarity)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_classifier():
+    """The process-wide classifier; the lexicon is parsed on first use only."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = CaseSheetClassifier()
+    return _default
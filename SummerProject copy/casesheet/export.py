@@ -0,0 +1,158 @@
+"""
+Streams stored summaries out of summaries.db as JSONL or Parquet, chunk by
+chunk from one cursor, so exports never hold the whole table in memory.
+
+    python -m casesheet.export summaries.db --format parquet --since 2026-01-01 --out summaries.parquet
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+
+FORMATS = ('jsonl', 'parquet')
+MIMETYPES = {'jsonl': 'application/x-ndjson', 'parquet': 'application/vnd.apache.parquet'}
+CHUNK_ROWS = 500
+
+COLUMNS = ('id', 'user_id', 'username', 'filename', 'created_at', 'version', 'parent_id', 'disease', 'status',
+           'state', 'model_version', 'summary_tiers', 'summary')
+
+
+def iter_summary_chunks(db_path, user_id=None, username=None, since=None, until=None, chunk_size=CHUNK_ROWS):
+    """
+    Yields lists of up to chunk_size row dicts, oldest first. since/until are
+    ISO dates or timestamps compared against created_at (until is exclusive).
+    """
+    where, params = [], []
+    if user_id is not None:
+        where.append("s.user_id = ?")
+        params.append(user_id)
+    if username is not None:
+        where.append("u.username = ?")
+        params.append(username)
+    if since:
+        where.append("s.created_at >= ?")
+        params.append(since)
+    if until:
+        where.append("s.created_at < ?")
+        params.append(until)
+    query = ("SELECT s.id, s.user_id, u.username, s.filename, s.created_at, s.version, s.parent_id, "
+             "s.disease, s.status, s.state, s.model_version, s.summary_tiers, s.summary "
+             "FROM summaries s LEFT JOIN users u ON u.id = s.user_id")
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY s.created_at, s.id"
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [dict(zip(COLUMNS, row)) for row in rows]
+    finally:
+        conn.close()
+
+
+def iter_jsonl(chunks):
+    """One JSON object per line, encoded a chunk at a time."""
+    for chunk in chunks:
+        lines = []
+        for row in chunk:
+            row = dict(row, summary_tiers=json.loads(row['summary_tiers']) if row['summary_tiers'] else None)
+            lines.append(json.dumps(row, ensure_ascii=False))
+        yield ("\n".join(lines) + "\n").encode('utf-8')
+
+
+class _ChunkSink:
+    """File-like target for the Parquet writer that hands back what was written so far."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('id', pa.int64()), ('user_id', pa.int64()), ('username', pa.string()), ('filename', pa.string()),
+        ('created_at', pa.string()), ('version', pa.int64()), ('parent_id', pa.int64()),
+        ('disease', pa.string()), ('status', pa.string()), ('state', pa.string()), ('model_version', pa.string()),
+        ('summary_tiers', pa.string()), ('summary', pa.string()),
+    ])
+
+
+def iter_parquet(chunks):
+    """Parquet bytes, one row group per chunk, yielded as each row group is written."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs `pip install pyarrow`.")
+
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(fmt, chunks):
+    if fmt == 'jsonl':
+        return iter_jsonl(chunks)
+    if fmt == 'parquet':
+        return iter_parquet(chunks)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export stored summaries as JSONL or Parquet.")
+    parser.add_argument('db', nargs='?', default='summaries.db')
+    parser.add_argument('--format', default='jsonl', choices=FORMATS)
+    parser.add_argument('--user', help="username to export (default: everyone)")
+    parser.add_argument('--since', help="ISO date or timestamp, inclusive")
+    parser.add_argument('--until', help="ISO date or timestamp, exclusive")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--out', help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    chunks = iter_summary_chunks(args.db, username=args.user, since=args.since, until=args.until,
+                                 chunk_size=args.chunk_size)
+    out = open(args.out, 'wb') if args.out else sys.stdout.buffer
+    try:
+        for data in iter_export(args.format, chunks):
+            out.write(data)
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import os
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageEnhance
+
+from .limits import LimitExceeded, default_limits
+from .metrics import REGISTRY, current_trace, stage
+from .ocr import get_engine, page_confidence, single_line_config
+from .pages import PageDeduper, fingerprint_page
+from .textlayer import fallback_for, get_backend as get_text_backend
+
+OCR_DPI = 300
+OCR_LANG = 'eng'
+OCR_CONFIG = '--oem 3 --psm 4'
+
+
+# Extractors take a source: a file path, or the PDF bytes of an upload kept in memory
+
+def source_size(source):
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    return os.path.getsize(source)
+
+
+def open_document(source):
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype='pdf')
+    return fitz.open(source)
+
+
+def page_count(source):
+    with open_document(source) as doc:
+        return len(doc)
+
+
+def iter_pdf_text(file_path, progress=None, backend=None, limits=None):
+    """
+    Yields the text layer of each page; empty string for pages without one.
+    progress(page_num, page_count) is called as each page is read. backend
+    names a casesheet.textlayer backend (default: CASESHEET_TEXT_BACKEND);
+    if it fails on a file, the fallback backend carries on from that page.
+    limits (default: from the environment) raises LimitExceeded for too
+    many pages, too much text or a worker over its memory ceiling.
+    """
+    limits = limits or default_limits()
+    reader = get_text_backend(backend)
+    fallback = fallback_for(reader.name)
+    done = nbytes = 0
+    with stage('pdf_text', nbytes=source_size(file_path)) as rec:
+        while True:
+            try:
+                with reader.open(file_path) as document:
+                    rec.pages = len(document)
+                    limits.check_pages(rec.pages)
+                    for index in range(done, rec.pages):
+                        text = document.text(index)
+                        done += 1
+                        nbytes += len(text.encode('utf-8'))
+                        limits.check_text(nbytes)
+                        limits.check_memory()
+                        if progress:
+                            progress(done, rec.pages)
+                        yield text
+                return
+            except LimitExceeded:
+                raise
+            except Exception as e:
+                if fallback is None:
+                    raise RuntimeError(f"Error reading PDF: {str(e)}")
+                REGISTRY.inc("pdf_text_fallbacks_total", {"backend": reader.name, "fallback": fallback.name})
+                reader, fallback = fallback, None
+
+
+def extract_text_from_pdf(file_path, progress=None, backend=None, limits=None):
+    pages = [page_text for page_text in iter_pdf_text(file_path, progress, backend, limits) if page_text]
+    return "\n".join(pages).strip()
+
+
+def preprocess_for_ocr(image):
+    """Greyscale, binarize and sharpen a page render before handing it to Tesseract."""
+    image = image.convert('L')
+    image = image.point(lambda x: 0 if x < 140 else 255)
+    image = ImageEnhance.Contrast(image).enhance(2.5)
+    image = ImageEnhance.Sharpness(image).enhance(2.0)
+    return image
+
+
+def render_page(page, dpi=OCR_DPI, clip=None, limits=None):
+    """
+    Renders a page (or the clip rectangle of it) straight to a greyscale PIL
+    image, without a PNG round trip. Oversized pages are rendered at a lower
+    DPI so the image stays within limits.max_pixels.
+    """
+    dpi = (limits or default_limits()).render_dpi(clip or page.rect, dpi)
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False, clip=clip)
+    return Image.frombytes('L', (pix.width, pix.height), pix.samples)
+
+
+def iter_ocr_text(pdf_path, dpi=OCR_DPI, lang=OCR_LANG, config=OCR_CONFIG, progress=None, backend=None,
+                  adaptive=None, dedupe=None, limits=None):
+    """
+    Renders and OCRs one page at a time, calling progress(page_num, page_count)
+    after each. backend picks the OCR engine (see casesheet.ocr); adaptive is
+    an AdaptivePolicy, or None to read every page at dpi. dedupe is a
+    pages.DedupePolicy: blank pages, repeats of an earlier page and known
+    templates are then answered from a low-DPI fingerprint without OCR.
+    limits are enforced as in iter_pdf_text, before any page is rendered.
+    """
+    limits = limits or default_limits()
+    nbytes = 0
+    try:
+        engine = get_engine(backend, lang, config)
+        line_engine = get_engine(backend, lang, single_line_config(config)) if adaptive else None
+        stats = {'pages': 0, 'page_escalations': 0, 'lines': 0, 'line_escalations': 0}
+        skipped = {'blank': 0, 'duplicate': 0, 'template': 0}
+        deduper = PageDeduper(dedupe) if dedupe else None
+        with stage('ocr', nbytes=source_size(pdf_path)) as rec, open_document(pdf_path) as doc:
+            rec.pages = len(doc)
+            limits.check_pages(rec.pages)
+            for page_num in range(len(doc)):
+                limits.check_memory()
+                page = doc.load_page(page_num)
+                fingerprint = fingerprint_page(page) if deduper else None
+                known = deduper.lookup(fingerprint) if deduper else None
+                if known:
+                    reason, page_text = known
+                    skipped[reason] += 1
+                    REGISTRY.inc("ocr_pages_skipped_total", {"reason": reason})
+                elif adaptive:
+                    page_text = ocr_page_adaptive(page, engine, line_engine, adaptive, stats, limits)
+                else:
+                    page_text = engine.recognize(preprocess_for_ocr(render_page(page, dpi, limits=limits)))
+                nbytes += len(page_text.encode('utf-8'))
+                limits.check_text(nbytes)
+                if deduper and not known:
+                    deduper.remember(fingerprint, page_text)
+                if progress:
+                    progress(page_num + 1, rec.pages)
+                yield page_text
+        trace = current_trace()
+        if trace is not None:
+            if adaptive:
+                trace.fields['ocr_escalation'] = stats
+            if deduper:
+                trace.fields['ocr_skipped'] = skipped
+    except (ImportError, RuntimeError, LimitExceeded):
+        raise
+    except Exception as e:
+        raise RuntimeError(f"OCR failed: {str(e)}")
+
+
+def ocr_page_adaptive(page, engine, line_engine, policy, stats, limits=None):
+    """
+    One page under an AdaptivePolicy. stats counts pages, lines and how many
+    of each were escalated; the same counts go to the metrics registry.
+    """
+    image = render_page(page, policy.low_dpi, limits=limits)
+    lines = engine.recognize_lines(preprocess_for_ocr(image))
+    stats['pages'] += 1
+    if page_confidence(lines) < policy.page_confidence:
+        stats['page_escalations'] += 1
+        REGISTRY.inc("ocr_pages_total", {"read": "page_escalated"})
+        return engine.recognize(preprocess_for_ocr(render_page(page, policy.high_dpi, limits=limits)))
+
+    weak = [line for line in lines if line.confidence < policy.line_confidence]
+    stats['lines'] += len(lines)
+    stats['line_escalations'] += len(weak)
+    REGISTRY.inc("ocr_pages_total", {"read": "lines_escalated" if weak else "low_dpi"})
+    REGISTRY.inc("ocr_lines_total", value=len(lines))
+    if weak:
+        REGISTRY.inc("ocr_lines_escalated_total", value=len(weak))
+    scale = page.rect.width / image.width  # low-DPI pixels to PDF points
+    pad = policy.line_padding
+    for line in weak:
+        left, top, right, bottom = line.box
+        clip = fitz.Rect((left - pad) * scale, (top - pad) * scale, (right + pad) * scale, (bottom + pad) * scale)
+        clip &= page.rect
+        if clip.is_empty:
+            continue
+        reread = line_engine.recognize_lines(preprocess_for_ocr(render_page(page, policy.high_dpi, clip, limits)))
+        if reread and page_confidence(reread) > line.confidence:
+            line.text = " ".join(r.text for r in reread)
+    return "\n".join(line.text for line in lines)
+
+
+def extract_text_with_ocr(pdf_path, dpi=OCR_DPI, lang=OCR_LANG, config=OCR_CONFIG, progress=None, backend=None,
+                          adaptive=None, dedupe=None, limits=None):
+    pages = list(iter_ocr_text(pdf_path, dpi, lang, config, progress, backend, adaptive, dedupe, limits))
+    return "\n".join(pages).strip()
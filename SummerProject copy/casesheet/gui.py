@@ -0,0 +1,161 @@
+import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import filedialog, ttk
+
+from .pipeline import Cancelled
+
+POLL_MS = 100
+
+STEP_LABELS = {
+    'extract': "Reading page",
+    'ocr': "OCR page",
+    'summarize': "Summarizing section",
+}
+
+
+class SummarizerApp:
+    """
+    Tkinter front-end that runs the pipeline on a worker thread. The worker
+    reports through a queue that the Tk main loop drains with after(), so the
+    window stays responsive during OCR. Several files can be queued at once,
+    and dropped onto the window when tkinterdnd2 is installed.
+    """
+
+    def __init__(self, process, title="🩺 Medical Case Sheet Summarizer"):
+        self.process = process  # process(file_path, progress, cancel) -> summary text
+        self.jobs = queue.Queue()
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()  # shared by the jobs queued since the last Cancel
+        self.pending = 0
+
+        self.window, dnd = _make_root()
+        self.window.title(title)
+
+        label = tk.Label(self.window, text="📄 Upload Medical Case Sheet PDFs", font=("Arial", 12))
+        label.pack(pady=10)
+
+        buttons = tk.Frame(self.window)
+        buttons.pack(pady=5)
+        self.upload_button = tk.Button(buttons, text="Upload Case Sheets", command=self.upload_files, font=("Arial", 10))
+        self.upload_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = tk.Button(buttons, text="Cancel", command=self.cancel, font=("Arial", 10), state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
+        self.progress = ttk.Progressbar(self.window, mode='determinate', maximum=1.0)
+        self.progress.pack(fill=tk.X, padx=10, pady=5)
+        self.status = tk.Label(self.window, text="Idle", font=("Arial", 10))
+        self.status.pack()
+
+        self.output = tk.Text(self.window, wrap=tk.WORD)
+        self.output.pack(expand=True, fill=tk.BOTH, padx=10, pady=10)
+
+        if dnd:
+            self.window.drop_target_register(dnd)
+            self.window.dnd_bind('<<Drop>>', self._on_drop)
+
+        self.window.geometry("700x500")
+        threading.Thread(target=self._worker, daemon=True).start()
+        self.window.after(POLL_MS, self._poll)
+
+    def run(self):
+        self.window.mainloop()
+
+    def upload_files(self):
+        self.add_files(filedialog.askopenfilenames(filetypes=[("PDF files", "*.pdf")]))
+
+    def add_files(self, paths):
+        for path in paths:
+            if path.lower().endswith('.pdf'):
+                self.pending += 1
+                self.jobs.put((path, self.cancel_event))
+        self._update_status()
+
+    def cancel(self):
+        """Stops the file in progress and drops everything still queued."""
+        # Every job submitted so far sees the set event, even one the worker
+        # has just taken off the queue; files added later get a fresh one.
+        self.cancel_event.set()
+        self.cancel_event = threading.Event()
+        while True:
+            try:
+                self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+        self._update_status()
+
+    def _on_drop(self, event):
+        self.add_files(self.window.tk.splitlist(event.data))
+
+    def _worker(self):
+        while True:
+            path, cancel = self.jobs.get()
+            if cancel.is_set():
+                self.events.put(('cancelled', path))
+                continue
+            self.events.put(('start', path))
+            try:
+                summary = self.process(
+                    path,
+                    progress=lambda step, done, total: self.events.put(('progress', path, step, done, total)),
+                    cancel=cancel,
+                )
+                self.events.put(('done', path, summary))
+            except Cancelled:
+                self.events.put(('cancelled', path))
+            except Exception as e:
+                self.events.put(('error', path, str(e)))
+
+    def _poll(self):
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            self._handle(event)
+        self.window.after(POLL_MS, self._poll)
+
+    def _handle(self, event):
+        kind, path = event[0], event[1]
+        name = os.path.basename(path)
+        if kind == 'start':
+            self.progress['value'] = 0
+            self.cancel_button.config(state=tk.NORMAL)
+            self.status.config(text=f"{name}: starting")
+        elif kind == 'progress':
+            step, done, total = event[2:]
+            self.progress['value'] = done / total if total else 0
+            self.status.config(text=f"{name}: {STEP_LABELS.get(step, step)} {done}/{total}")
+        else:
+            self.pending -= 1
+            if kind == 'done':
+                self._append(f"===== {name} =====\n{event[2]}\n\n")
+            elif kind == 'error':
+                self._append(f"===== {name} =====\nError: {event[2]}\n\n")
+            else:
+                self._append(f"===== {name} =====\nCancelled.\n\n")
+            self.progress['value'] = 0
+            self._update_status()
+
+    def _append(self, text):
+        self.output.insert(tk.END, text)
+        self.output.see(tk.END)
+
+    def _update_status(self):
+        if self.pending > 0:
+            self.status.config(text=f"{self.pending} file(s) queued")
+            self.cancel_button.config(state=tk.NORMAL)
+        else:
+            self.status.config(text="Idle")
+            self.cancel_button.config(state=tk.DISABLED)
+
+
+def _make_root():
+    """Uses tkinterdnd2 for drag-and-drop when it is installed, plain Tk otherwise."""
+    try:
+        from tkinterdnd2 import DND_FILES, TkinterDnD
+    except ImportError:
+        return tk.Tk(), None
+    return TkinterDnD.Tk(), DND_FILES
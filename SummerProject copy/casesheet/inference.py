@@ -0,0 +1,230 @@
+"""
+Inference sidecar: one process owns the summarization models and serves every
+web worker over a Unix socket, merging concurrent requests into micro-batches.
+
+    python -m casesheet.inference --socket /tmp/casesheet-infer.sock --tiers bart,distilbart
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+from .metrics import REGISTRY
+from .resources import ResourceBudget, set_default_budget
+from .summarize import BACKENDS, build_summarizers
+
+logger = logging.getLogger("casesheet.inference")
+
+DEFAULT_SOCKET = '/tmp/casesheet-infer.sock'
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+_HEADER = struct.Struct('!I')
+
+
+def send_message(sock, message):
+    payload = json.dumps(message).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def recv_message(sock):
+    """Returns the next framed JSON message, or None when the peer closed the connection."""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    payload = _recv_exactly(sock, _HEADER.unpack(header)[0])
+    if payload is None:
+        raise ConnectionError("Connection closed mid-message.")
+    return json.loads(payload.decode('utf-8'))
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class MicroBatcher:
+    """
+    Feeds queued texts to summarize_batch in groups: a batch closes when it
+    reaches max_batch or max_wait seconds after its first request arrived.
+    """
+
+    def __init__(self, name, summarizer, max_batch=8, max_wait=0.02):
+        self.name = name
+        self.summarizer = summarizer
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True).start()
+
+    def submit(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            start = time.perf_counter()
+            try:
+                summaries = self.summarizer.summarize_batch(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+            REGISTRY.observe("inference_batch_size", len(batch), {"tier": self.name}, buckets=BATCH_SIZE_BUCKETS)
+            REGISTRY.observe("inference_batch_seconds", elapsed, {"tier": self.name})
+            for (_, future), summary in zip(batch, summaries):
+                future.set_result(summary)
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # every web worker thread holds a connection
+
+    def __init__(self, socket_path, summarizers, max_batch=8, max_wait=0.02):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.summarizers = summarizers
+        self.batchers = {name: MicroBatcher(name, s, max_batch, max_wait) for name, s in summarizers.items()}
+        super().__init__(socket_path, _Handler)
+
+    def info(self):
+        return {name: getattr(s, 'model_version', name) for name, s in self.summarizers.items()}
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """One connection per client thread; requests on it are answered in order."""
+
+    def handle(self):
+        while True:
+            try:
+                message = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            if message is None:
+                return
+            send_message(self.request, self._answer(message))
+
+    def _answer(self, message):
+        if message.get('op') == 'info':
+            return {'tiers': self.server.info()}
+        if message.get('op') == 'metrics':
+            return {'metrics': REGISTRY.render()}
+        batcher = self.server.batchers.get(message.get('tier'))
+        if batcher is None:
+            return {'error': f"Unknown tier: {message.get('tier')}"}
+        try:
+            return {'summary': batcher.submit(message['text']).result()}
+        except Exception as e:
+            return {'error': f"{type(e).__name__}: {e}"}
+
+
+class RemoteSummarizer:
+    """Summarizer that forwards to a tier of the inference sidecar."""
+
+    def __init__(self, name, socket_path=DEFAULT_SOCKET, timeout=300.0):
+        self.name = name
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.model_version = f"remote:{name}"
+        self._local = threading.local()
+
+    def load(self):
+        """Checks the sidecar serves this tier and picks up its model version."""
+        tiers = self._request({'op': 'info'})['tiers']
+        if self.name not in tiers:
+            raise RuntimeError(f"Inference server at {self.socket_path} has no '{self.name}' tier.")
+        self.model_version = f"remote:{tiers[self.name]}"
+
+    def summarize(self, text):
+        response = self._request({'tier': self.name, 'text': text})
+        if 'error' in response:
+            raise RuntimeError(f"Inference server error: {response['error']}")
+        return response['summary']
+
+    def summarize_batch(self, texts):
+        return [self.summarize(text) for text in texts]
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _request(self, message):
+        # One persistent connection per thread; reconnect once if the server restarted
+        for attempt in range(2):
+            sock = getattr(self._local, 'sock', None)
+            try:
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                send_message(sock, message)
+                response = recv_message(sock)
+                if response is None:
+                    raise ConnectionError("Inference server closed the connection.")
+                return response
+            except (ConnectionError, OSError):
+                if sock is not None:
+                    sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve summarization models to local workers over a Unix socket.")
+    parser.add_argument('--socket', default=os.environ.get('CASESHEET_INFERENCE_SOCKET', DEFAULT_SOCKET))
+    parser.add_argument('--tiers', default='bart,distilbart')
+    parser.add_argument('--backend', default=os.environ.get('CASESHEET_SUMMARIZER_BACKEND', 'transformers'), choices=BACKENDS)
+    parser.add_argument('--onnx-path', default=os.environ.get('CASESHEET_ONNX_MODEL_PATH'))
+    parser.add_argument('--distilbart-onnx-path', default=os.environ.get('CASESHEET_DISTILBART_ONNX_MODEL_PATH'))
+    parser.add_argument('--max-batch', type=int, default=8)
+    parser.add_argument('--max-wait-ms', type=float, default=20.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # The sidecar runs no upload workers: its share of the cores all goes to the models
+    budget = set_default_budget(ResourceBudget.from_env('sidecar'))
+    summarizers = build_summarizers(args.tiers.split(','), args.backend, args.onnx_path, args.distilbart_onnx_path)
+    for summarizer in summarizers.values():
+        if hasattr(summarizer, 'load'):
+            summarizer.load()
+    budget.apply().report()
+    server = InferenceServer(args.socket, summarizers, args.max_batch, args.max_wait_ms / 1000)
+    logger.info("Serving %s on %s (max batch %d, max wait %.1f ms)",
+                ", ".join(server.info().values()), args.socket, args.max_batch, args.max_wait_ms)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(args.socket)
+
+
+if __name__ == '__main__':
+    main()
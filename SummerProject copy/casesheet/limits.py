@@ -0,0 +1,181 @@
+"""
+Resource ceilings for one document and for the worker process. A document
+may have at most max_pages pages and max_text_bytes of extracted text;
+page renders are scaled down to max_pixels. MemoryWatchdog recycles a
+worker whose RSS stays over max_rss_bytes; a quarter above that, the hard
+ceiling checked between pages fails the request that is still growing
+instead of letting it take the worker down.
+"""
+
+import copy
+import gc
+import logging
+import math
+import os
+import signal
+import sys
+import threading
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger("casesheet.limits")
+
+MB = 1024 * 1024
+
+
+class LimitExceeded(ValueError):
+    """A document or the worker went past a configured ceiling; status is the HTTP code to answer with."""
+
+    status = 413
+
+    def __init__(self, code, message, limit, value):
+        super().__init__(message)
+        self.code = code
+        self.limit = limit
+        self.value = value
+
+    def as_dict(self):
+        return {'error': str(self), 'code': self.code, 'limit': self.limit, 'value': self.value}
+
+
+class MemoryExceeded(LimitExceeded):
+    status = 503
+
+
+class Limits:
+    """Per-document ceilings plus the worker's RSS ceiling; None switches a check off."""
+
+    def __init__(self, max_pages=300, max_pixels=40_000_000, max_text_bytes=10 * MB, max_rss_bytes=None):
+        self.max_pages = max_pages
+        self.max_pixels = max_pixels
+        self.max_text_bytes = max_text_bytes
+        self.max_rss_bytes = max_rss_bytes  # None: no ceiling
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        rss = env('CASESHEET_MAX_RSS_MB')
+        return cls(max_pages=int(env('CASESHEET_MAX_PAGES', '300')),
+                   max_pixels=int(float(env('CASESHEET_MAX_RENDER_MPIX', '40')) * 1_000_000),
+                   max_text_bytes=int(float(env('CASESHEET_MAX_TEXT_MB', '10')) * MB),
+                   max_rss_bytes=int(float(rss) * MB) if rss else None)
+
+    def replace(self, **changes):
+        limits = copy.copy(self)
+        for name, value in changes.items():
+            setattr(limits, name, value)
+        return limits
+
+    def check_pages(self, pages):
+        if self.max_pages is not None and pages > self.max_pages:
+            REGISTRY.inc("limits_exceeded_total", {"limit": "pages"})
+            raise LimitExceeded('too_many_pages', f"The PDF has {pages} pages; the limit is {self.max_pages}.",
+                                self.max_pages, pages)
+
+    def check_text(self, nbytes):
+        if self.max_text_bytes is not None and nbytes > self.max_text_bytes:
+            REGISTRY.inc("limits_exceeded_total", {"limit": "text_bytes"})
+            raise LimitExceeded('text_too_large',
+                                f"The extracted text passed the {self.max_text_bytes / MB:g} MB limit.",
+                                self.max_text_bytes, nbytes)
+
+    @property
+    def hard_rss_bytes(self):
+        return None if self.max_rss_bytes is None else int(self.max_rss_bytes * 1.25)
+
+    def check_memory(self):
+        if self.max_rss_bytes is None:
+            return
+        rss = current_rss()
+        if rss > self.hard_rss_bytes:
+            REGISTRY.inc("limits_exceeded_total", {"limit": "rss"})
+            raise MemoryExceeded('memory_exhausted',
+                                 f"The worker is over its {self.hard_rss_bytes / MB:.0f} MB memory ceiling.",
+                                 self.hard_rss_bytes, rss)
+
+    def render_dpi(self, rect, dpi):
+        """dpi, lowered just enough that a render of rect (in PDF points) stays within max_pixels."""
+        pixels = (rect.width * dpi / 72) * (rect.height * dpi / 72)
+        if not self.max_pixels or pixels <= self.max_pixels:
+            return dpi
+        REGISTRY.inc("render_downscaled_total")
+        return max(1, int(dpi * math.sqrt(self.max_pixels / pixels)))
+
+
+_default = None
+
+
+def default_limits():
+    """The process-wide limits from the environment."""
+    global _default
+    if _default is None:
+        _default = Limits.from_env()
+    return _default
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import psutil
+        return psutil.Process().memory_info().rss
+
+
+def recycle_gunicorn_worker():
+    """Asks the gunicorn master for a fresh worker: SIGTERM lets this one finish its requests and exit."""
+    if 'gunicorn' in sys.modules:
+        os.kill(os.getpid(), signal.SIGTERM)
+        return True
+    return False
+
+
+class MemoryWatchdog:
+    """
+    Samples RSS every interval seconds. Past the ceiling it collects garbage
+    first; if RSS is still past it, recycle() is called, by default
+    restarting the worker under gunicorn. Once it has, draining is set and
+    callers should stop taking work; elsewhere it only logs.
+    """
+
+    def __init__(self, ceiling_bytes, interval=5.0, recycle=recycle_gunicorn_worker):
+        self.ceiling_bytes = ceiling_bytes
+        self.interval = interval
+        self.recycle = recycle
+        self.draining = threading.Event()
+        self.peak = 0
+        self._warned = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='memory-watchdog', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self):
+        rss = current_rss()
+        self.peak = max(self.peak, rss)
+        if rss <= self.ceiling_bytes or self.draining.is_set():
+            return rss
+        gc.collect()
+        rss = current_rss()
+        if rss <= self.ceiling_bytes:
+            return rss
+        if self.recycle():
+            REGISTRY.inc("worker_recycles_total")
+            logger.warning("RSS %d MB is over the %d MB ceiling; recycling the worker",
+                           rss // MB, self.ceiling_bytes // MB)
+            self.draining.set()
+        elif not self._warned:
+            logger.warning("RSS %d MB is over the %d MB ceiling, but only gunicorn workers can be recycled",
+                           rss // MB, self.ceiling_bytes // MB)
+            self._warned = True
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
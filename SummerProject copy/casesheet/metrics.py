@@ -0,0 +1,285 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger("casesheet.metrics")
+
+# Seconds; spans a fast regex pass up to a multi-minute OCR run
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_local = threading.local()
+
+
+class StageRecord:
+    """Timing and volume of one pipeline stage run."""
+
+    def __init__(self, name, pages=0, nbytes=0):
+        self.name = name
+        self.pages = pages
+        self.nbytes = nbytes
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.error = None
+
+    def as_dict(self):
+        data = {
+            "stage": self.name,
+            "wall_s": round(self.wall, 6),
+            "cpu_s": round(self.cpu, 6),
+            "pages": self.pages,
+            "bytes": self.nbytes,
+        }
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms rendered in Prometheus text format."""
+
+    def __init__(self, prefix="casesheet"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels=None, value=1.0):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, value, labels=None, buckets=DEFAULT_BUCKETS):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def observe_stage(self, record):
+        labels = {"stage": record.name}
+        self.inc("stage_runs_total", labels)
+        self.inc("stage_cpu_seconds_total", labels, record.cpu)
+        self.observe("stage_wall_seconds", record.wall, labels)
+        if record.pages:
+            self.inc("stage_pages_total", labels, record.pages)
+        if record.nbytes:
+            self.inc("stage_bytes_total", labels, record.nbytes)
+        if record.error:
+            self.inc("stage_errors_total", labels)
+
+    def render(self):
+        """Returns the registry in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((key, (hist.buckets, list(hist.counts), hist.total, hist.sum)) for key, hist in self._histograms.items()),
+                key=lambda item: item[0],
+            )
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name in seen:
+                return
+            seen.add(name)
+            help_kind, text = self._help.get(name, (kind, name.replace("_", " ")))
+            lines.append(f"# HELP {self.prefix}_{name} {text}")
+            lines.append(f"# TYPE {self.prefix}_{name} {help_kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{self.prefix}_{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), (buckets, counts, total, total_sum) in histograms:
+            header(name, "histogram")
+            for bound, count in zip(buckets, counts):
+                bucket_labels = labels + (("le", _format_value(bound)),)
+                lines.append(f"{self.prefix}_{name}_bucket{_format_labels(bucket_labels)} {count}")
+            lines.append(f"{self.prefix}_{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {total}")
+            lines.append(f"{self.prefix}_{name}_sum{_format_labels(labels)} {_format_value(total_sum)}")
+            lines.append(f"{self.prefix}_{name}_count{_format_labels(labels)} {total}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("stage_runs_total", "counter", "Pipeline stage executions.")
+REGISTRY.describe("stage_errors_total", "counter", "Pipeline stage executions that raised.")
+REGISTRY.describe("stage_cpu_seconds_total", "counter", "CPU time spent in each pipeline stage.")
+REGISTRY.describe("stage_pages_total", "counter", "PDF pages handled by each pipeline stage.")
+REGISTRY.describe("stage_bytes_total", "counter", "Bytes of input handled by each pipeline stage.")
+REGISTRY.describe("stage_wall_seconds", "histogram", "Wall-clock time of each pipeline stage.")
+REGISTRY.describe("ocr_pages_total", "counter", "Adaptive OCR pages by how they were read (low_dpi, lines_escalated, page_escalated).")
+REGISTRY.describe("ocr_lines_total", "counter", "Text lines read at low DPI by adaptive OCR.")
+REGISTRY.describe("ocr_lines_escalated_total", "counter", "Low-confidence lines re-read at high DPI by adaptive OCR.")
+REGISTRY.describe("ocr_pages_skipped_total", "counter", "Scanned pages answered without OCR, by reason (blank, duplicate, template).")
+REGISTRY.describe("pdf_text_fallbacks_total", "counter", "Files whose text layer was read by the fallback backend after the configured one failed.")
+REGISTRY.describe("scheduler_rejected_total", "counter", "Jobs refused with 429 because their lane's queue was full.")
+REGISTRY.describe("scheduler_wait_seconds", "histogram", "Time jobs spent queued before a worker picked them up, by lane.")
+REGISTRY.describe("limits_exceeded_total", "counter", "Documents refused for passing a page, text or memory ceiling.")
+REGISTRY.describe("render_downscaled_total", "counter", "Page renders taken at a lower DPI to stay within the pixel ceiling.")
+REGISTRY.describe("worker_recycles_total", "counter", "Worker restarts requested by the memory watchdog.")
+REGISTRY.describe("requests_total", "counter", "Processed requests by endpoint and outcome.")
+REGISTRY.describe("request_wall_seconds", "histogram", "Wall-clock time of whole requests.")
+
+
+class RequestTrace:
+    """Collects the stage records of one request for the structured log line."""
+
+    def __init__(self, request_id, endpoint, **fields):
+        self.request_id = request_id
+        self.endpoint = endpoint
+        self.fields = fields
+        self.stages = []
+        self.status = "ok"
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def as_dict(self):
+        data = {
+            "request_id": self.request_id,
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "wall_s": round(self.wall, 6),
+            "cpu_s": round(self.cpu, 6),
+        }
+        data.update(self.fields)
+        data["stages"] = [s.as_dict() for s in self.stages]
+        return data
+
+    def stage_totals(self):
+        """Wall seconds per stage name, summed over repeated runs of a stage."""
+        totals = {}
+        for record in self.stages:
+            totals[record.name] = round(totals.get(record.name, 0.0) + record.wall, 6)
+        return totals
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def use_trace(trace):
+    """Records stages run in this thread on trace, e.g. on a worker doing a request's job."""
+    previous = current_trace()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def stage(name, pages=0, nbytes=0, registry=None):
+    """
+    Times one pipeline stage. The yielded record can be updated inside the
+    block (e.g. page count once the PDF is open).
+    """
+    record = StageRecord(name, pages=pages, nbytes=nbytes)
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield record
+    except Exception as e:
+        record.error = type(e).__name__
+        raise
+    finally:
+        record.wall = time.perf_counter() - wall_start
+        record.cpu = time.thread_time() - cpu_start
+        (registry or REGISTRY).observe_stage(record)
+        trace = current_trace()
+        if trace is not None:
+            trace.stages.append(record)
+
+
+@contextmanager
+def request_trace(endpoint, request_id=None, registry=None, **fields):
+    """
+    Scopes stage records to a request and emits one JSON log line on exit.
+    """
+    registry = registry or REGISTRY
+    trace = RequestTrace(request_id or uuid.uuid4().hex, endpoint, **fields)
+    previous = current_trace()
+    _local.trace = trace
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield trace
+    except Exception:
+        trace.status = "error"
+        raise
+    finally:
+        trace.wall = time.perf_counter() - wall_start
+        trace.cpu = time.thread_time() - cpu_start
+        _local.trace = previous
+        registry.inc("requests_total", {"endpoint": endpoint, "status": trace.status})
+        registry.observe("request_wall_seconds", trace.wall, {"endpoint": endpoint})
+        logger.info(json.dumps(trace.as_dict(), ensure_ascii=False))
+
+
+def configure_logging(level=logging.INFO):
+    """
+    Makes sure casesheet's INFO logs (one JSON trace line per request on
+    casesheet.metrics, startup reports) are written even when the host, e.g.
+    gunicorn without --log-config, never configured logging. A host that has
+    set up handlers keeps them; only the casesheet level is set.
+    """
+    package = logging.getLogger("casesheet")
+    if package.level == logging.NOTSET:
+        package.setLevel(level)
+    if package.handlers or logging.getLogger().handlers:
+        return
+    # Trace lines stay bare JSON so log shippers can parse them
+    trace_handler = logging.StreamHandler()
+    trace_handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(trace_handler)
+    logger.propagate = False
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    package.addHandler(handler)
+    package.propagate = False
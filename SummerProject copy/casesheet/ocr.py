@@ -0,0 +1,271 @@
+"""
+OCR engines behind one recognize(image) call. pytesseract runs the tesseract
+binary once per page (temp files, model reload each time); tesserocr keeps a
+Tesseract API per thread alive and reads PIL images from memory. Both also
+give per-line confidences (recognize_lines) for adaptive-resolution OCR.
+"""
+
+import contextlib
+import os
+import shlex
+import threading
+from collections.abc import Mapping
+
+BACKENDS = ('pytesseract', 'tesserocr')
+DEFAULT_BACKEND = os.environ.get('CASESHEET_OCR_BACKEND', 'pytesseract')
+
+# fixed: every page at one DPI. adaptive: see AdaptivePolicy
+OCR_MODE = os.environ.get('CASESHEET_OCR_MODE', 'fixed')
+
+TESSERACT_MISSING = ("Tesseract-OCR is not installed or not in your system's PATH. "
+                     "Please install it to enable OCR for scanned PDFs.")
+
+
+def parse_config(config):
+    """Splits a tesseract CLI config ('--oem 3 --psm 4 -c key=value') into (oem, psm, variables)."""
+    oem = psm = None
+    variables = {}
+    args = shlex.split(config or '')
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg == '--oem':
+            oem, i = int(value), i + 2
+        elif arg == '--psm':
+            psm, i = int(value), i + 2
+        elif arg == '-c' and value and '=' in value:
+            key, val = value.split('=', 1)
+            variables[key] = val
+            i += 2
+        else:
+            raise ValueError(f"Unsupported OCR config option: {arg}")
+    return oem, psm, variables
+
+
+class Line:
+    """One recognized text line: its text, mean word confidence (0-100) and (left, top, right, bottom) box."""
+
+    def __init__(self, text, confidence, box, words):
+        self.text = text
+        self.confidence = confidence
+        self.box = box
+        self.words = words
+
+
+class AdaptivePolicy:
+    """
+    Reads every page at low_dpi first. Pages whose mean word confidence is
+    under page_confidence are re-read whole at high_dpi; on the rest, only
+    lines under line_confidence are re-rendered at high_dpi and re-read.
+    """
+
+    def __init__(self, low_dpi=150, high_dpi=300, page_confidence=70.0, line_confidence=60.0, line_padding=4):
+        if low_dpi >= high_dpi:
+            raise ValueError("low_dpi must be below high_dpi.")
+        self.low_dpi = low_dpi
+        self.high_dpi = high_dpi
+        self.page_confidence = page_confidence
+        self.line_confidence = line_confidence
+        self.line_padding = line_padding  # pixels at low_dpi added around a re-read line
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(low_dpi=int(env('CASESHEET_OCR_LOW_DPI', '150')),
+                   high_dpi=int(env('CASESHEET_OCR_HIGH_DPI', '300')),
+                   page_confidence=float(env('CASESHEET_OCR_PAGE_CONFIDENCE', '70')),
+                   line_confidence=float(env('CASESHEET_OCR_LINE_CONFIDENCE', '60')))
+
+
+def default_policy():
+    """The AdaptivePolicy from the environment when CASESHEET_OCR_MODE=adaptive, else None (fixed DPI)."""
+    if OCR_MODE == 'adaptive':
+        return AdaptivePolicy.from_env()
+    if OCR_MODE != 'fixed':
+        raise ValueError(f"Unknown OCR mode: {OCR_MODE}")
+    return None
+
+
+def page_confidence(lines):
+    """Mean confidence over all words of the page, or 0 for a page with none."""
+    words = sum(line.words for line in lines)
+    if not words:
+        return 0.0
+    return sum(line.confidence * line.words for line in lines) / words
+
+
+class PytesseractEngine:
+    """One tesseract process per call."""
+
+    name = 'pytesseract'
+
+    def __init__(self, lang, config):
+        self.lang = lang
+        self.config = config
+        try:
+            import pytesseract.pytesseract as runner
+        except ImportError:
+            pass
+        else:
+            # pytesseract passes its module-level environ to every tesseract process it starts
+            runner.environ = _TesseractEnvironment(ocr_threads())
+
+    def recognize(self, image):
+        import pytesseract
+        try:
+            return pytesseract.image_to_string(image, lang=self.lang, config=self.config)
+        except pytesseract.TesseractNotFoundError:
+            raise RuntimeError(TESSERACT_MISSING)
+
+    def recognize_lines(self, image):
+        import pytesseract
+        try:
+            data = pytesseract.image_to_data(image, lang=self.lang, config=self.config,
+                                             output_type=pytesseract.Output.DICT)
+        except pytesseract.TesseractNotFoundError:
+            raise RuntimeError(TESSERACT_MISSING)
+
+        grouped = {}
+        for i, word in enumerate(data['text']):
+            confidence = float(data['conf'][i])
+            if confidence < 0 or not word.strip():
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            left, top = data['left'][i], data['top'][i]
+            grouped.setdefault(key, []).append((word, confidence, left, top,
+                                                left + data['width'][i], top + data['height'][i]))
+        lines = []
+        for words in grouped.values():
+            box = (min(w[2] for w in words), min(w[3] for w in words),
+                   max(w[4] for w in words), max(w[5] for w in words))
+            lines.append(Line(" ".join(w[0] for w in words), sum(w[1] for w in words) / len(words), box, len(words)))
+        return lines
+
+
+class TesserocrEngine:
+    """
+    A Tesseract API per thread, created on first use and kept for the life of
+    the thread; the API object itself is not safe to share between threads.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, lang, config):
+        try:
+            import tesserocr
+        except ImportError:
+            raise ImportError("The tesserocr OCR backend needs `pip install tesserocr` (built against libtesseract).")
+        self._tesserocr = tesserocr
+        self.lang = lang
+        self.oem, self.psm, self.variables = parse_config(config)
+        self._local = threading.local()
+        self.threads = ocr_threads()
+        try:
+            from threadpoolctl import ThreadpoolController
+        except ImportError:
+            self._openmp = None
+        else:
+            # Found once, after libtesseract (and its OpenMP) has loaded
+            self._openmp = ThreadpoolController().select(user_api='openmp')
+
+    def _limited(self):
+        """
+        Caps OpenMP at the OCR budget for this thread while Tesseract runs and
+        restores it after, so torch and MKL keep their own thread counts.
+        """
+        if self._openmp is None or 'OMP_THREAD_LIMIT' in os.environ:
+            return contextlib.nullcontext()
+        return self._openmp.limit(limits=self.threads)
+
+    def api(self):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            kwargs = {'lang': self.lang}
+            if self.oem is not None:
+                kwargs['oem'] = self.oem
+            if self.psm is not None:
+                kwargs['psm'] = self.psm
+            api = self._tesserocr.PyTessBaseAPI(**kwargs)
+            for key, value in self.variables.items():
+                api.SetVariable(key, value)
+            self._local.api = api
+        return api
+
+    def recognize(self, image):
+        api = self.api()
+        api.SetImage(image)
+        with self._limited():
+            return api.GetUTF8Text()
+
+    def recognize_lines(self, image):
+        RIL = self._tesserocr.RIL
+        api = self.api()
+        api.SetImage(image)
+        with self._limited():
+            api.Recognize()
+        lines = []
+        iterator = api.GetIterator()
+        if iterator is None:
+            return lines
+        for item in self._tesserocr.iterate_level(iterator, RIL.TEXTLINE):
+            text = (item.GetUTF8Text(RIL.TEXTLINE) or '').strip()
+            box = item.BoundingBox(RIL.TEXTLINE)
+            if text and box:
+                lines.append(Line(text, item.Confidence(RIL.TEXTLINE), box, len(text.split())))
+        return lines
+
+
+class _TesseractEnvironment(Mapping):
+    """
+    os.environ as the tesseract processes see it: OMP_THREAD_LIMIT is the OCR
+    thread budget unless set explicitly. A live view, so later changes to
+    os.environ still reach the child processes.
+    """
+
+    def __init__(self, threads):
+        self.threads = str(threads)
+
+    def _overlay(self):
+        return {} if 'OMP_THREAD_LIMIT' in os.environ else {'OMP_THREAD_LIMIT': self.threads}
+
+    def __getitem__(self, key):
+        overlay = self._overlay()
+        return overlay[key] if key in overlay else os.environ[key]
+
+    def __iter__(self):
+        return iter({**os.environ, **self._overlay()})
+
+    def __len__(self):
+        return len({**os.environ, **self._overlay()})
+
+
+def ocr_threads():
+    from .resources import default_budget
+    return default_budget().ocr_threads
+
+
+def single_line_config(config):
+    """config with the page segmentation mode switched to one text line (psm 7)."""
+    oem, _, variables = parse_config(config)
+    parts = ([f'--oem {oem}'] if oem is not None else []) + ['--psm 7']
+    parts += [f'-c {key}={value}' for key, value in variables.items()]
+    return ' '.join(parts)
+
+
+_ENGINES = {'pytesseract': PytesseractEngine, 'tesserocr': TesserocrEngine}
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_engine(backend=None, lang='eng', config=''):
+    """The shared engine for backend (default: CASESHEET_OCR_BACKEND) with this language and config."""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in _ENGINES:
+        raise ValueError(f"Unknown OCR backend: {backend}")
+    key = (backend, lang, config)
+    with _cache_lock:
+        engine = _cache.get(key)
+        if engine is None:
+            engine = _cache[key] = _ENGINES[backend](lang, config)
+    return engine
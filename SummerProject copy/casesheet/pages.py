@@ -0,0 +1,300 @@
+"""
+Page fingerprints for OCR: a perceptual hash and a binarized thumbnail from
+a cheap 150 DPI render, used to skip blank pages, reuse the text of repeated
+pages within a document, and look up known form templates in a persistent
+hash -> text store.
+
+    python -m casesheet.pages add-template templates.db consent_form.pdf --name consent
+"""
+
+import argparse
+import heapq
+import os
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+from PIL import Image
+
+FINGERPRINT_DPI = 150
+HASH_SIZE = 16  # 16x16 difference hash: 256 bits
+GRID_SIZE = 32  # ink share per cell of a 32x32 grid, for ranking candidate duplicates
+HASH_MARGIN = 2  # grey levels; near-equal neighbours hash as 0 so scan noise on blank areas keeps the hash
+
+
+class PageFingerprint:
+    """
+    The thumbnail is kept bit-packed and compressed: a 150 DPI A4 page is
+    2.2 MB as a bool array but some tens of KB this way.
+    """
+
+    def __init__(self, dhash, thumb, ink):
+        self.dhash = dhash  # int
+        self.shape = thumb.shape
+        self.packed = zlib.compress(np.packbits(thumb).tobytes(), 1)
+        self.ink = ink  # share of inked thumbnail pixels
+        self.grid = ink_grid(thumb)
+        self.rows = np.count_nonzero(thumb, axis=1).astype(np.float32)  # ink per row, for lining pages up
+        self.cols = np.count_nonzero(thumb, axis=0).astype(np.float32)
+
+    @property
+    def thumb(self):
+        """Bool array, True where the page has ink."""
+        bits = np.unpackbits(np.frombuffer(zlib.decompress(self.packed), dtype=np.uint8))
+        return bits[:self.shape[0] * self.shape[1]].reshape(self.shape).astype(bool)
+
+    @property
+    def key(self):
+        return f"{self.dhash:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+
+def ink_grid(thumb, size=GRID_SIZE):
+    """Share of inked pixels in each cell of a size x size grid over the thumbnail."""
+    rows = np.linspace(0, thumb.shape[0], size + 1).astype(int)[:-1]
+    cols = np.linspace(0, thumb.shape[1], size + 1).astype(int)[:-1]
+    counts = np.add.reduceat(np.add.reduceat(thumb.astype(np.float32), rows, axis=0), cols, axis=1)
+    return counts / (thumb.size / (size * size))
+
+
+def fingerprint_image(image, hash_size=HASH_SIZE):
+    """Fingerprint of a greyscale PIL page render."""
+    gray = np.asarray(image.convert('L'))
+    thumb = gray < 128
+    small = np.asarray(image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1] + HASH_MARGIN).flatten()
+    dhash = int.from_bytes(np.packbits(bits).tobytes(), 'big')
+    return PageFingerprint(dhash, thumb, float(thumb.mean()))
+
+
+def fingerprint_page(page, dpi=FINGERPRINT_DPI):
+    import fitz
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return fingerprint_image(Image.frombytes('L', (pix.width, pix.height), pix.samples))
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def _offset(a, b, max_shift):
+    """The shift s (|s| <= max_shift) for which b[i - s] best matches a[i], by mean absolute difference."""
+    best, best_cost = 0, None
+    for shift in range(-max_shift, max_shift + 1):
+        if shift >= 0:
+            x, y = a[shift:], b[:len(b) - shift]
+        else:
+            x, y = a[:shift], b[-shift:]
+        cost = np.abs(x - y).mean() if len(x) else np.inf
+        if best_cost is None or cost < best_cost:
+            best, best_cost = shift, cost
+    return best
+
+
+def _shifted(mask, dy, dx):
+    """mask moved down by dy and right by dx, zero-filled."""
+    out = np.zeros_like(mask)
+    h, w = mask.shape
+    out[max(dy, 0):h + min(dy, 0), max(dx, 0):w + min(dx, 0)] = \
+        mask[max(-dy, 0):h + min(-dy, 0), max(-dx, 0):w + min(-dx, 0)]
+    return out
+
+
+def _connected(mask):
+    """Set pixels of mask with at least one of their 8 neighbours set."""
+    across = np.zeros_like(mask)
+    across[:, 1:] |= mask[:, :-1]
+    across[:, :-1] |= mask[:, 1:]
+    row = across | mask
+    across[1:] |= row[:-1]  # now also the three neighbours above and below
+    across[:-1] |= row[1:]
+    return mask & across
+
+
+def changed_ink(a, b, max_shift):
+    """
+    Pixels where the thumbnails of fingerprints a and b differ once b is moved
+    by up to max_shift pixels to line up with a, leaving out isolated pixels
+    (scan noise).
+    """
+    dy = _offset(a.rows, b.rows, max_shift)
+    dx = _offset(a.cols, b.cols, max_shift)
+    return _connected(a.thumb ^ _shifted(b.thumb, dy, dx))
+
+
+class DedupePolicy:
+    """
+    A page is blank when under max_ink of its thumbnail is inked. Two pages
+    are the same when their hashes differ in at most max_distance bits and,
+    with the thumbnails lined up (a copy may sit up to max_shift_mm off), no
+    cell_mm square holds more than max_cell_fraction of changed pixels.
+    Isolated changed pixels are scan noise and do not count; a different name
+    or digit changes a connected stroke and fails. The hash alone cannot tell
+    two fillings of one form apart, hence the thumbnail check at 150 DPI: at
+    72 DPI a 6 and a 9 differ in two pixels. Pages shifted by a fraction of a
+    pixel or skewed (most rescans) do not line up and are OCR'd as usual.
+
+    Pages of one form all hash alike, so each page is checked against at most
+    max_candidates earlier pages, those whose coarse ink grid is closest
+    (filled-in values move ink between cells), which keeps a long scan linear. duplicates=False leaves only the blank
+    check and the template store.
+    """
+
+    def __init__(self, skip_blank=True, max_ink=0.0001, max_distance=12, max_shift_mm=3.0, cell_mm=2.8,
+                 max_cell_fraction=0.04, max_candidates=3, duplicates=True, templates=None):
+        self.skip_blank = skip_blank
+        self.max_ink = max_ink
+        self.max_distance = max_distance
+        self.max_candidates = max_candidates
+        self.duplicates = duplicates
+        self.max_shift_mm = max_shift_mm
+        self.cell_mm = cell_mm
+        self.max_cell_fraction = max_cell_fraction  # changed share of one cell's pixels
+        self.templates = templates  # a TemplateStore, or None
+
+    @classmethod
+    def from_env(cls):
+        """
+        CASESHEET_PAGE_DEDUPE=1 turns on blank and duplicate skipping; a
+        CASESHEET_PAGE_TEMPLATES store is consulted either way. None when
+        neither is set.
+        """
+        enabled = os.environ.get('CASESHEET_PAGE_DEDUPE', '0') in ('1', 'true', 'yes')
+        path = os.environ.get('CASESHEET_PAGE_TEMPLATES')
+        if not enabled and not path:
+            return None
+        return cls(skip_blank=enabled, duplicates=enabled, templates=TemplateStore(path) if path else None)
+
+    def is_blank(self, fp):
+        return self.skip_blank and fp.ink < self.max_ink
+
+    def same(self, a, b):
+        if a.shape != b.shape or hamming(a.dhash, b.dhash) > self.max_distance:
+            return False
+        if a.packed == b.packed:
+            return True
+        # Pixels per mm, from the thumbnail's long side against a letter/A4-sized page (about 280 mm)
+        per_mm = max(a.shape) / 280.0
+        ys, xs = np.divmod(np.flatnonzero(changed_ink(a, b, max(1, round(self.max_shift_mm * per_mm)))), a.shape[1])
+        cell = max(2, round(self.cell_mm * per_mm))
+        counts = np.bincount((ys // cell) * (a.shape[1] // cell + 1) + xs // cell)
+        return counts.max(initial=0) <= self.max_cell_fraction * cell * cell
+
+
+def default_dedupe():
+    """A DedupePolicy when CASESHEET_PAGE_DEDUPE or CASESHEET_PAGE_TEMPLATES is set, else None."""
+    return DedupePolicy.from_env()
+
+
+class PageDeduper:
+    """Per-document memory of OCR'd pages, consulted before each page is OCR'd."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.seen = []  # (fingerprint, text)
+
+    def lookup(self, fp):
+        """Returns (reason, text) when the page need not be OCR'd, else None."""
+        if self.policy.is_blank(fp):
+            return 'blank', ''
+        if self.policy.duplicates:
+            for earlier, text in self.candidates(fp):
+                if self.policy.same(fp, earlier):
+                    return 'duplicate', text
+        if self.policy.templates is not None:
+            text = self.policy.templates.lookup(fp, self.policy)
+            if text is not None:
+                return 'template', text
+        return None
+
+    def candidates(self, fp):
+        """The earlier pages worth a thumbnail check: hash within reach, closest ink grid first."""
+        near = [(float(np.abs(fp.grid - earlier.grid).sum()), index)
+                for index, (earlier, _) in enumerate(self.seen)
+                if earlier.shape == fp.shape and hamming(fp.dhash, earlier.dhash) <= self.policy.max_distance]
+        return [self.seen[index] for _, index in heapq.nsmallest(self.policy.max_candidates, near)]
+
+    def remember(self, fp, text):
+        if self.policy.duplicates:
+            self.seen.append((fp, text))
+
+
+class TemplateStore:
+    """
+    Known pages (letterheads, consent forms) and their text in SQLite. The
+    whole store is small and read into memory once; writes go straight to disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+        with sqlite3.connect(path) as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS page_templates
+                            (dhash TEXT PRIMARY KEY,
+                             name TEXT,
+                             width INTEGER,
+                             height INTEGER,
+                             thumb BLOB,
+                             text TEXT)''')
+
+    def _load(self):
+        with self._lock:
+            if self._entries is None:
+                entries = []
+                with sqlite3.connect(self.path) as conn:
+                    for dhash, width, height, thumb, text in conn.execute(
+                            "SELECT dhash, width, height, thumb, text FROM page_templates"):
+                        bits = np.unpackbits(np.frombuffer(zlib.decompress(thumb), dtype=np.uint8))
+                        thumb_array = bits[:width * height].reshape(height, width).astype(bool)
+                        entries.append((PageFingerprint(int(dhash, 16), thumb_array, float(thumb_array.mean())), text))
+                self._entries = entries
+            return self._entries
+
+    def lookup(self, fp, policy):
+        for template, text in self._load():
+            if policy.same(fp, template):
+                return text
+        return None
+
+    def add(self, fp, text, name=None):
+        height, width = fp.shape
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("INSERT OR REPLACE INTO page_templates (dhash, name, width, height, thumb, text) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (fp.key, name, width, height, fp.packed, text))
+        with self._lock:
+            self._entries = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the known-page template store used by OCR.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    add = sub.add_parser('add-template', help="OCR pages of a PDF and store them as known templates")
+    add.add_argument('store')
+    add.add_argument('pdf')
+    add.add_argument('--pages', type=int, nargs='+', help="1-based pages to add (default: all)")
+    add.add_argument('--name')
+    listing = sub.add_parser('list', help="list stored templates")
+    listing.add_argument('store')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        with sqlite3.connect(args.store) as conn:
+            for dhash, name, text in conn.execute("SELECT dhash, name, text FROM page_templates"):
+                print(f"{dhash[:16]}  {name or '-'}  {len(text)} chars")
+        return
+
+    from .extract import OCR_CONFIG, OCR_LANG, open_document, preprocess_for_ocr, render_page
+    from .ocr import get_engine
+    store = TemplateStore(args.store)
+    engine = get_engine(None, OCR_LANG, OCR_CONFIG)
+    with open_document(args.pdf) as doc:
+        for page_num in args.pages or range(1, len(doc) + 1):
+            page = doc.load_page(page_num - 1)
+            text = engine.recognize(preprocess_for_ocr(render_page(page)))
+            store.add(fingerprint_page(page), text, args.name)
+            print(f"Added page {page_num} of {args.pdf}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from . import analysis
+from .classify import default_classifier
+from .extract import iter_ocr_text, iter_pdf_text, page_count
+from .limits import default_limits
+from .metrics import stage
+from .ocr import default_policy
+from .pages import default_dedupe
+from .summarize import make_summarizer
+from .text import (PLAN_SECTIONS, SECTION_ORDER, SectionTracker, default_early_exit, extract_sections,
+                   filter_relevant_text, section_spans)
+
+# Optional analyses a front-end can ask for on top of the section summaries
+ANALYSES = ('disease', 'status', 'suggestion', 'state')
+
+
+class Cancelled(Exception):
+    """Raised when a caller cancels a pipeline run between pages or sections."""
+
+
+class CaseSheetResult:
+    """Everything the pipeline learned about one case sheet."""
+
+    def __init__(self, text, sections):
+        self.text = text
+        self.sections = sections
+        self.summaries = []  # (section name, summary) in SECTION_ORDER
+        self.tiers = {}  # section name -> summarizer that produced it
+        self.disease = None
+        self.disease_keywords = []
+        self.relevant_sentences = []
+        self.polarity = None
+        self.classification = {}  # 'state'/'status' -> Classification, 'sections' -> per-section status
+        self.status = None
+        self.suggestion = None
+        self.state = None
+        self.page_hashes = []
+        self.section_hashes = {}
+        self.changed_pages = []  # page indices that differ from the previous version
+        self.reused = []  # sections whose summary came from the previous version
+        self.pages_read = 0
+        self.pages_skipped = 0  # pages never read because early exit had found every target section
+
+    def fingerprint(self):
+        """
+        Page and section hashes plus the section summaries, stored with a
+        version so the next upload of the document can be diffed against it.
+        """
+        summaries = dict(self.summaries)
+        return {
+            'pages': self.page_hashes,
+            'sections': {name: {'hash': digest, 'summary': summaries[name], 'tier': self.tiers.get(name)}
+                         for name, digest in self.section_hashes.items() if name in summaries},
+        }
+
+    def render(self):
+        """Formats the result as the emoji-prefixed text shown to users."""
+        parts = []
+        if self.disease is not None:
+            parts.append(f"🩺 Identified Disease: {self.disease}\n" + "\n".join(self.relevant_sentences[:3]))
+        for section_name, summary in self.summaries:
+            parts.append(f"📝 {section_name.title()}:\n{summary}\n")
+        if self.suggestion:
+            parts.append(f"💡 Suggestion:\n{self.suggestion}")
+        if self.status:
+            parts.append(f"💡 Patient Status:\n{self.status}")
+        if self.state:
+            parts.append(f"\n📌 Patient State:\n{self.state}")
+        return "\n".join(parts)
+
+
+class CaseSheetPipeline:
+    """
+    Extraction, filtering, sectioning, summarization and analysis of case
+    sheet PDFs. One instance is meant to live for the whole process so the
+    summarizer model and summary cache stay warm.
+    """
+
+    def __init__(self, summarizer='extractive', ocr=True, analyses=('suggestion',), cache_size=256, ocr_backend=None,
+                 ocr_policy=None, page_dedupe=None, early_exit=None, text_backend=None, limits=None):
+        unknown = set(analyses) - set(ANALYSES)
+        if unknown:
+            raise ValueError(f"Unknown analyses: {', '.join(sorted(unknown))}")
+        self.summarizer = make_summarizer(summarizer)
+        self.ocr = ocr
+        self.ocr_backend = ocr_backend  # None: CASESHEET_OCR_BACKEND
+        self.text_backend = text_backend  # None: CASESHEET_TEXT_BACKEND
+        # An AdaptivePolicy for adaptive-resolution OCR; by default from CASESHEET_OCR_MODE
+        self.ocr_policy = ocr_policy if ocr_policy is not None else default_policy()
+        # A pages.DedupePolicy (False to OCR every page); by default from CASESHEET_PAGE_DEDUPE/_TEMPLATES
+        self.page_dedupe = page_dedupe if page_dedupe is not None else default_dedupe()
+        # A text.EarlyExit to stop reading pages once the summary sections are in (False
+        # to read every page); by default from CASESHEET_EARLY_EXIT
+        self.early_exit = early_exit if early_exit is not None else default_early_exit()
+        # Page, render, text and memory ceilings (limits.Limits); by default from the environment
+        self.limits = limits or default_limits()
+        self.analyses = tuple(analyses)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def warm(self):
+        """Loads the summarizer model up front instead of on the first request."""
+        if hasattr(self.summarizer, 'load'):
+            self.summarizer.load()
+
+    def clear_cache(self):
+        """Forgets cached summaries, so the next run of a document summarizes it again."""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def extract_text(self, source, progress=None, cancel=None):
+        """
+        Text layer first, OCR for scanned PDFs when enabled. source is a path
+        or the PDF bytes. progress(step, done, total) is called per page;
+        setting the cancel event stops the run before the next page.
+        """
+        return _join(self.extract_pages(source, progress, cancel))
+
+    def extract_pages(self, source, progress=None, cancel=None):
+        """
+        Like extract_text, but returns the text of every page read (empty ones
+        included). With early exit that may be only the first pages.
+        """
+        limits = self._document_limits()
+        pages = self._collect(iter_pdf_text(source, _step(progress, 'extract'), self.text_backend, limits), cancel,
+                              self._tracker())
+        if not _join(pages) and self.ocr:
+            pages = self._collect(iter_ocr_text(source, progress=_step(progress, 'ocr'), backend=self.ocr_backend,
+                                                adaptive=self.ocr_policy, dedupe=self.page_dedupe, limits=limits),
+                                  cancel,
+                                  self._tracker())
+        if not _join(pages).strip():
+            if not self.ocr:
+                raise ValueError("No selectable text found in the PDF. This file may be a scan.")
+            raise ValueError("No readable text found in the case sheet.")
+        return pages
+
+    def _document_limits(self):
+        # Early exit never reads past its own page budget, so longer documents are fine
+        if self.early_exit and self.early_exit.max_pages <= self.limits.max_pages:
+            return self.limits.replace(max_pages=None)
+        return self.limits
+
+    def _tracker(self):
+        return SectionTracker(self.early_exit) if self.early_exit else None
+
+    @staticmethod
+    def _collect(pages, cancel, tracker=None):
+        collected = []
+        for page_text in pages:
+            collected.append(page_text or "")
+            if cancel is not None and cancel.is_set():
+                pages.close()
+                raise Cancelled()
+            if tracker is not None:
+                tracker.feed(page_text)
+                if tracker.done:
+                    pages.close()
+                    break
+        return collected
+
+    def summarize(self, text, budget=None):
+        """Summarizes one block of text, reusing earlier results for identical input."""
+        return self.summarize_with_tier(text, budget)[0]
+
+    def summarize_with_tier(self, text, budget=None):
+        """
+        Returns (summary, tier name). With a SummaryRouter the tier is chosen
+        from the text length and budget (seconds); otherwise it is the
+        configured summarizer.
+        """
+        summarizer = self.summarizer
+        if hasattr(summarizer, 'route'):
+            summarizer = summarizer.route(text, budget)
+        key = hashlib.sha1(f"{summarizer.name}\0{text}".encode('utf-8')).hexdigest()
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key], summarizer.name
+        with stage('summarize', nbytes=len(text.encode('utf-8'))):
+            summary = summarizer.summarize(text)
+        if self.cache_size:
+            with self._cache_lock:
+                self._cache[key] = summary
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return summary, summarizer.name
+
+    def analyze(self, text, progress=None, cancel=None, deadline=None, previous=None):
+        """
+        Runs filtering, sectioning, summarization and the configured analyses
+        on extracted text. deadline (a time.perf_counter() value) is shared
+        out across the sections still to summarize. previous is the
+        fingerprint() of an earlier version of the document; sections whose
+        hash is unchanged keep their stored summary.
+        """
+        with stage('filter', nbytes=len(text.encode('utf-8'))):
+            text = filter_relevant_text(text)
+        with stage('sections', nbytes=len(text.encode('utf-8'))):
+            sections = extract_sections(text)
+        result = CaseSheetResult(text, sections)
+        result.section_hashes = {name: _digest(content) for name, content in sections.items()}
+        stored = (previous or {}).get('sections', {})
+
+        if 'disease' in self.analyses:
+            with stage('lsa', nbytes=len(text.encode('utf-8'))):
+                result.disease_keywords, result.relevant_sentences = analysis.lsa_disease_keywords(text)
+            result.disease = analysis.disease_summary(result.disease_keywords)
+
+        to_summarize = [name for name in SECTION_ORDER if sections.get(name)]
+        for done, section_name in enumerate(to_summarize, 1):
+            if cancel is not None and cancel.is_set():
+                raise Cancelled()
+            prior = stored.get(section_name)
+            if prior and prior['hash'] == result.section_hashes[section_name]:
+                summary, tier = prior['summary'], prior['tier']
+                result.reused.append(section_name)
+            else:
+                summary, tier = self.summarize_with_tier(sections[section_name],
+                                                         _share(deadline, len(to_summarize) - done + 1))
+            result.summaries.append((section_name, summary))
+            result.tiers[section_name] = tier
+            if progress:
+                progress('summarize', done, len(to_summarize))
+        if not result.summaries:
+            result.section_hashes['summary'] = _digest(text)
+            prior = stored.get('summary')
+            if prior and prior['hash'] == result.section_hashes['summary']:
+                summary, tier = prior['summary'], prior['tier']
+                result.reused.append('summary')
+            else:
+                summary, tier = self.summarize_with_tier(text, _share(deadline, 1))
+            result.summaries.append(('summary', summary))
+            result.tiers['summary'] = tier
+
+        needs_suggestion = 'suggestion' in self.analyses and not any(k in sections for k in PLAN_SECTIONS)
+        if 'status' in self.analyses or 'state' in self.analyses or needs_suggestion:
+            # State keywords and status polarity come from one pass over the token
+            # ids; the status only from the clinical sections when there are any
+            with stage('classify', nbytes=len(text.encode('utf-8'))):
+                result.classification = default_classifier().classify(text, spans=section_spans(text))
+            status = result.classification['status']
+            result.polarity = status.score
+            if 'status' in self.analyses:
+                result.status = analysis.STATUS_MESSAGES[status.label]
+            if needs_suggestion:
+                result.suggestion = analysis.SUGGESTION_MESSAGES[status.label]
+            if 'state' in self.analyses:
+                result.state = analysis.STATE_MESSAGES[result.classification['state'].label]
+        return result
+
+    def process(self, source, progress=None, cancel=None, budget=None, previous=None):
+        """
+        Runs the whole pipeline; budget is an optional latency budget in
+        seconds and previous an earlier version's fingerprint() to diff against.
+        """
+        deadline = time.perf_counter() + budget if budget is not None else None
+        pages = self.extract_pages(source, progress, cancel)
+        result = self.analyze(_join(pages), progress, cancel, deadline, previous)
+        result.page_hashes = [_digest(page) for page in pages]
+        old_pages = (previous or {}).get('pages', [])
+        result.changed_pages = [i for i, digest in enumerate(result.page_hashes)
+                                if i >= len(old_pages) or old_pages[i] != digest]
+        result.pages_read = len(pages)
+        if self.early_exit:
+            result.pages_skipped = page_count(source) - len(pages)
+        return result
+
+
+def _join(pages):
+    return "\n".join(page for page in pages if page).strip()
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _share(deadline, sections_left):
+    """Seconds each remaining section may spend before the deadline."""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.perf_counter()) / sections_left
+
+
+def _step(progress, step):
+    """Adapts a pipeline progress(step, done, total) callback to the per-page extractors."""
+    if progress is None:
+        return None
+    return lambda done, total: progress(step, done, total)
+
+
+def save_summary(file_path, summary):
+    """Writes the summary next to the PDF as <name>_summary.txt."""
+    save_path = os.path.splitext(file_path)[0] + "_summary.txt"
+    with open(save_path, 'w', encoding='utf-8') as f:
+        f.write(summary)
+    return save_path
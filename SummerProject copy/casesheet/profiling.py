@@ -0,0 +1,163 @@
+"""
+Opt-in profiles of single pipeline runs. While the profiled call runs,
+cProfile records it deterministically and a sampler thread snapshots its
+stack every few milliseconds. Both are saved under the request id:
+
+    <id>.pstats            python -m pstats, snakeviz, ...
+    <id>.speedscope.json   flame graph at https://www.speedscope.app
+
+Only the newest CASESHEET_PROFILE_KEEP profiles are kept. One call is
+profiled at a time (from Python 3.12 cProfile hooks the whole process);
+a call that arrives meanwhile runs unprofiled.
+"""
+
+import cProfile
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+PROFILE_DIR = os.environ.get('CASESHEET_PROFILE_DIR', 'profiles')
+PROFILE_KEEP = int(os.environ.get('CASESHEET_PROFILE_KEEP', '20'))
+# Value of the X-Casesheet-Profile header or ?profile= that turns profiling on; unset disables it over HTTP
+PROFILE_TOKEN = os.environ.get('CASESHEET_PROFILE_TOKEN')
+SAMPLE_INTERVAL = 0.005
+
+SUFFIXES = ('.pstats', '.speedscope.json')
+
+logger = logging.getLogger("casesheet.profiling")
+
+_active = threading.Lock()  # held while a call is being profiled
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = []  # speedscope frame dicts
+        self.frame_index = {}
+        self.samples = []  # frame indices, outermost first
+        self.weights = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _index(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self.frame_index.get(key)
+        if index is None:
+            index = self.frame_index[key] = len(self.frames)
+            self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return index
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._index(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+
+    def speedscope(self, name):
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'casesheet.profiling',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(self.weights),
+                'samples': self.samples,
+                'weights': self.weights,
+            }],
+        }
+
+
+def profile_call(profile_id, fn, *args, out_dir=None, keep=None, **kwargs):
+    """
+    Runs fn(*args, **kwargs) under both profilers in the calling thread and
+    saves the profiles as <out_dir>/<profile_id>.*; returns fn's result
+    even if saving fails. Older profiles beyond keep are deleted. When
+    another call is being profiled, or another tool (coverage, a debugger)
+    holds the profiling hook, fn just runs and no profile is written.
+    """
+    if not _active.acquire(blocking=False):
+        logger.warning("Profile %s skipped: another profiled run is in progress", profile_id)
+        return fn(*args, **kwargs)
+    try:
+        return _profile(profile_id, fn, args, kwargs, out_dir or PROFILE_DIR, keep)
+    finally:
+        _active.release()
+
+
+def _profile(profile_id, fn, args, kwargs, out_dir, keep):
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:  # Python 3.12+: "Another profiling tool is already active"
+        logger.warning("Profile %s skipped: %s", profile_id, e)
+        return fn(*args, **kwargs)
+    sampler = StackSampler(threading.get_ident()).start()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        sampler.stop()
+        try:
+            os.makedirs(out_dir, exist_ok=True)
+            base = os.path.join(out_dir, profile_id)
+            profiler.dump_stats(base + '.pstats')
+            with open(base + '.speedscope.json', 'w', encoding='utf-8') as f:
+                json.dump(sampler.speedscope(profile_id), f)
+            prune(out_dir, PROFILE_KEEP if keep is None else keep)
+        except OSError:
+            logger.exception("Could not save profile %s", profile_id)
+
+
+def prune(out_dir, keep):
+    """Deletes all but the newest keep profiles in out_dir."""
+    profiles = {}
+    for name in os.listdir(out_dir):
+        for suffix in SUFFIXES:
+            if name.endswith(suffix):
+                path = os.path.join(out_dir, name)
+                key = name[:-len(suffix)]
+                profiles[key] = max(profiles.get(key, 0), os.path.getmtime(path))
+    for key in sorted(profiles, key=profiles.get, reverse=True)[keep:]:
+        for suffix in SUFFIXES:
+            path = os.path.join(out_dir, key + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def requested(headers, args):
+    """True when the request carries the profiling token in X-Casesheet-Profile or ?profile=."""
+    if not PROFILE_TOKEN:
+        return False
+    # Compared as bytes: compare_digest refuses non-ASCII str, and an unknown token is just ignored
+    token = PROFILE_TOKEN.encode('utf-8')
+    return any(hmac.compare_digest(value.encode('utf-8'), token)
+               for value in (headers.get('X-Casesheet-Profile'), args.get('profile')) if value)
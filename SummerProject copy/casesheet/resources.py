@@ -0,0 +1,184 @@
+"""
+One core budget for everything that spins up threads: the processing
+workers, torch/ONNX Runtime inference, OpenMP/BLAS (sklearn's SVD, numpy)
+and Tesseract. Left alone, each library sizes its own pool to the whole
+machine in every worker and process, and they fight over the same cores.
+
+Every value can be pinned with an environment variable; the rest is derived
+from the machine's cores, split between the inference sidecar (when
+CASESHEET_INFERENCE_SOCKET is set) and the web worker processes:
+
+    CASESHEET_CORES             cores to plan for (default: the affinity mask, else os.cpu_count())
+    CASESHEET_PROCESSES         web worker processes sharing them (default: WEB_CONCURRENCY, else -w/--workers
+                                in GUNICORN_CMD_ARGS, else 1)
+    CASESHEET_SIDECAR_THREADS   inference threads of the sidecar (default: half the cores); the web processes
+                                share the rest
+    CASESHEET_WORKERS           concurrent pipeline jobs per process (default: half the process's cores, at least 1)
+    CASESHEET_INFERENCE_THREADS torch intra-op / ONNX Runtime threads (default: process cores per worker)
+    CASESHEET_BLAS_THREADS      BLAS threads (default: process cores per worker)
+    CASESHEET_OCR_THREADS       Tesseract's OpenMP threads per page (default: 1; pages run in parallel
+                                instead). Applied to the tesseract processes and around tesserocr calls only
+                                (see casesheet.ocr): OMP_THREAD_LIMIT in the process would cap torch and MKL too.
+
+Nothing here runs on import; entry points call apply() (or
+configure_environment() before numpy loads, when they can).
+"""
+
+import logging
+import os
+import shlex
+import sys
+
+logger = logging.getLogger("casesheet.resources")
+
+BLAS_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'BLIS_NUM_THREADS',
+                  'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def web_processes():
+    """How many web worker processes share the machine, as far as the environment tells."""
+    count = _env_int('CASESHEET_PROCESSES') or _env_int('WEB_CONCURRENCY')
+    if count:
+        return count
+    args = shlex.split(os.environ.get('GUNICORN_CMD_ARGS', ''))
+    for i, arg in enumerate(args):
+        if arg in ('-w', '--workers') and i + 1 < len(args):
+            return int(args[i + 1])
+        if arg.startswith('--workers='):
+            return int(arg.split('=', 1)[1])
+        if arg.startswith('-w') and arg[2:].isdigit():
+            return int(arg[2:])
+    return 1
+
+
+def sidecar_threads(cores):
+    return _env_int('CASESHEET_SIDECAR_THREADS') or max(1, cores // 2)
+
+
+class ResourceBudget:
+    """
+    Thread counts for one process. cores is the machine's budget; processes
+    of this role share it, so each plans with cores // processes.
+    """
+
+    def __init__(self, cores=None, workers=None, inference_threads=None, blas_threads=None, ocr_threads=None,
+                 processes=1, role='web'):
+        self.cores = max(1, cores or available_cores())
+        self.processes = max(1, processes)
+        self.role = role
+        self.process_cores = max(1, self.cores // self.processes)
+        self.workers = max(1, workers or self.process_cores // 2)
+        per_worker = max(1, self.process_cores // self.workers)
+        self.inference_threads = max(1, inference_threads or per_worker)
+        self.blas_threads = max(1, blas_threads or per_worker)
+        self.ocr_threads = max(1, ocr_threads or 1)
+
+    @classmethod
+    def from_env(cls, role='web'):
+        """
+        role 'web': a web worker process, one of web_processes(), sharing what
+        the sidecar leaves. role 'sidecar': the inference server, which runs no
+        upload workers and gives its whole share to the models.
+        """
+        cores = _env_int('CASESHEET_CORES') or available_cores()
+        if role == 'sidecar':
+            threads = sidecar_threads(cores)
+            return cls(threads, workers=1, blas_threads=_env_int('CASESHEET_BLAS_THREADS'), ocr_threads=1,
+                       role=role)
+        if role != 'web':
+            raise ValueError(f"Unknown resource role: {role}")
+        if os.environ.get('CASESHEET_INFERENCE_SOCKET'):
+            cores = max(1, cores - sidecar_threads(cores))
+        workers = _env_int('CASESHEET_WORKERS') or _env_int('CASESHEET_BULK_WORKERS')
+        return cls(cores, workers, _env_int('CASESHEET_INFERENCE_THREADS'), _env_int('CASESHEET_BLAS_THREADS'),
+                   _env_int('CASESHEET_OCR_THREADS'), processes=web_processes(), role=role)
+
+    def configure_environment(self):
+        """
+        Sets the thread variables OpenMP and the BLAS libraries read when they
+        load. Variables already set in the environment win. Only fully
+        effective before numpy/sklearn are imported; apply() adjusts what is
+        already loaded.
+        """
+        for name in BLAS_VARIABLES:
+            os.environ.setdefault(name, str(self.blas_threads))
+
+    def apply(self):
+        """Limits thread pools of libraries that are already imported (torch; BLAS through threadpoolctl)."""
+        self.configure_environment()
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            pass
+        else:
+            threadpool_limits(limits=self.blas_threads, user_api='blas')
+        if 'torch' in sys.modules:
+            configure_torch(self)
+        return self
+
+    def describe(self):
+        """The effective settings, as reported at startup."""
+        data = {'role': self.role, 'cores': self.cores, 'processes': self.processes,
+                'process_cores': self.process_cores, 'workers': self.workers,
+                'inference_threads': self.inference_threads, 'blas_threads': self.blas_threads,
+                'ocr_threads': self.ocr_threads}
+        data['env'] = {name: os.environ.get(name) for name in BLAS_VARIABLES}
+        torch = sys.modules.get('torch')
+        if torch is not None:
+            data['torch_threads'] = torch.get_num_threads()
+        return data
+
+    def report(self):
+        logger.info("Resource budget: %s", self.describe())
+
+
+def configure_torch(budget=None):
+    """Sizes torch's intra-op pool from the budget; called once a model backend imports torch."""
+    import torch
+    budget = budget or default_budget()
+    if torch.get_num_threads() != budget.inference_threads:
+        torch.set_num_threads(budget.inference_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # only allowed before the first parallel op
+
+
+def ort_session_options(budget=None):
+    """ONNX Runtime session options sized from the budget."""
+    import onnxruntime
+    budget = budget or default_budget()
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = budget.inference_threads
+    options.inter_op_num_threads = 1
+    return options
+
+
+_default = None
+
+
+def default_budget():
+    """The process-wide budget: the one set with set_default_budget(), else the web role's from the environment."""
+    global _default
+    if _default is None:
+        _default = ResourceBudget.from_env()
+    return _default
+
+
+def set_default_budget(budget):
+    """Makes budget the process-wide one (the sidecar's, say) and returns it."""
+    global _default
+    _default = budget
+    return budget
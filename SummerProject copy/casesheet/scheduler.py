@@ -0,0 +1,149 @@
+"""
+Priority lanes in front of the processing threads. Interactive jobs (a
+clinician waiting on /upload) always go before batch jobs (bulk backfills),
+batch work never holds the workers reserved for interactive jobs, each user
+has a cap on running jobs per lane, and a lane whose queue is full refuses
+new jobs with a retry hint instead of growing without bound.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from .metrics import REGISTRY, current_trace, use_trace
+
+LANES = ('interactive', 'batch')  # highest priority first
+
+
+class Overloaded(Exception):
+    """A lane's queue is full; retry_after is a rough wait in whole seconds."""
+
+    status = 429
+
+    def __init__(self, lane, retry_after, message=None, status=None):
+        super().__init__(message or f"The {lane} queue is full; retry in {retry_after} s.")
+        self.lane = lane
+        self.retry_after = retry_after
+        if status is not None:
+            self.status = status
+
+
+class Lane:
+    def __init__(self, name, max_queue, per_user):
+        self.name = name
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.queue = deque()  # (user, future, fn, args, kwargs, trace, queued at)
+        self.running = {}  # user -> running jobs
+        self.service_s = 1.0  # moving average of job run time, for Retry-After
+
+
+class Scheduler:
+    """
+    workers threads pull from the lanes in priority order; reserved of them
+    only ever run interactive jobs. max_queue and per_user map a lane name
+    to its queue limit and per-user concurrency cap.
+    """
+
+    def __init__(self, workers=4, reserved=1, max_queue=None, per_user=None):
+        if not 0 <= reserved < workers:
+            raise ValueError("reserved must leave at least one worker for batch jobs.")
+        max_queue = {'interactive': 16, 'batch': 200, **(max_queue or {})}
+        per_user = {'interactive': 2, 'batch': 2, **(per_user or {})}
+        self.workers = workers
+        self.reserved = reserved
+        self.lanes = {name: Lane(name, max_queue[name], per_user[name]) for name in LANES}
+        self._cond = threading.Condition()
+        self._busy = {name: 0 for name in LANES}
+        self._closed = False
+        self._threads = [threading.Thread(target=self._work, name=f'worker-{i}', daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, lane, user, fn, *args, **kwargs):
+        """
+        Queues fn(*args, **kwargs) on lane for user and returns a Future. The
+        submitting thread's request trace follows the job, so its stages are
+        recorded on that request. Raises Overloaded when the lane is full.
+        """
+        queue = self.lanes[lane]
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down.")
+            if len(queue.queue) >= queue.max_queue:
+                REGISTRY.inc("scheduler_rejected_total", {"lane": lane})
+                raise Overloaded(lane, self._retry_after(queue))
+            queue.queue.append((user, future, fn, args, kwargs, current_trace(), time.perf_counter()))
+            self._cond.notify_all()
+        return future
+
+    def check(self, lane, extra=1):
+        """Raises Overloaded if extra more jobs would not fit in lane's queue right now."""
+        queue = self.lanes[lane]
+        with self._cond:
+            if len(queue.queue) + extra > queue.max_queue:
+                REGISTRY.inc("scheduler_rejected_total", {"lane": lane})
+                raise Overloaded(lane, self._retry_after(queue))
+
+    def depth(self):
+        with self._cond:
+            return {name: len(lane.queue) for name, lane in self.lanes.items()}
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _retry_after(self, lane):
+        # Jobs ahead, spread over the workers the lane may use, at its usual run time
+        usable = self.workers - (self.reserved if lane.name != 'interactive' else 0)
+        return max(1, math.ceil(len(lane.queue) * lane.service_s / usable))
+
+    def _next(self):
+        """The next runnable job, in lane order, skipping users at their cap. Call with the lock held."""
+        for name in LANES:
+            lane = self.lanes[name]
+            if name != 'interactive' and self._busy[name] >= self.workers - self.reserved:
+                continue
+            for job in lane.queue:
+                user = job[0]
+                if lane.running.get(user, 0) < lane.per_user:
+                    lane.queue.remove(job)
+                    lane.running[user] = lane.running.get(user, 0) + 1
+                    self._busy[name] += 1
+                    return lane, job
+        return None, None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                lane, job = self._next()
+                while job is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                    lane, job = self._next()
+            user, future, fn, args, kwargs, trace, queued = job
+            REGISTRY.observe("scheduler_wait_seconds", time.perf_counter() - queued, {"lane": lane.name})
+            ran = future.set_running_or_notify_cancel()
+            start = time.perf_counter()
+            if ran:
+                try:
+                    with use_trace(trace):
+                        future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._cond:
+                if ran:
+                    lane.service_s = 0.8 * lane.service_s + 0.2 * (time.perf_counter() - start)
+                lane.running[user] -= 1
+                if not lane.running[user]:
+                    del lane.running[user]
+                self._busy[lane.name] -= 1
+                self._cond.notify_all()
@@ -0,0 +1,423 @@
+"""
+Similar-case retrieval over stored summaries. Each summary becomes a TF-IDF
+vector: words are hashed into a large feature space, weighted by the
+document frequencies seen so far, then folded into a few hundred dimensions
+with a signed hash (a count sketch, which keeps cosine similarities). Rows
+are appended as summaries are stored and live in memory-mapped files, so
+every worker process searches the same page-cache copy:
+
+    meta.json      dims, row count, capacity, documents seen
+    vectors.i8     capacity x dims, L2-normalized and stored as round(127 * x)
+    ids.i64        summary id of each row
+    users.i64      owner of each row
+    df.i32         document frequency of each hashed word
+
+Search is a brute-force matrix-vector product: int8 rows are cast to
+float32 a cache-sized block at a time, so a million rows at 128 dimensions
+read 128 MB instead of 512, and the blocks are split over the BLAS threads
+of the core budget. Quantizing unit vectors in steps of 1/127 moves cosines
+by about 0.002. With CASESHEET_SIMILAR_ANN=hnsw
+an hnswlib graph, built in each process from the memory-mapped rows,
+answers instead.
+
+    python -m casesheet.similar build summaries.db similar_index
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .classify import TOKEN_RE
+from .resources import default_budget
+from .store import STOP_WORDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in one process only
+    fcntl = None
+
+INDEX_DIR = os.environ.get('CASESHEET_SIMILAR_INDEX', 'similar_index')
+DIMS = int(os.environ.get('CASESHEET_SIMILAR_DIMS', '128'))
+# 'none' (brute force) or 'hnsw' (hnswlib, approximate)
+ANN = os.environ.get('CASESHEET_SIMILAR_ANN', 'none')
+
+HASH_FEATURES = 1 << 18
+INITIAL_CAPACITY = 1024
+SCALE = 127  # int8 steps per unit
+SCAN_BLOCK_BYTES = 1024 * 1024  # float32 rows cast per block; stays in L2
+MIN_ROWS_PER_THREAD = 50_000  # below this a thread costs more than it saves
+
+
+def hashed_terms(text):
+    """Term counts of text keyed by hashed feature; crc32 so every process hashes alike."""
+    counts = {}
+    for token in TOKEN_RE.findall(text.lower()):
+        if len(token) > 2 and token not in STOP_WORDS:
+            feature = zlib.crc32(token.encode('utf-8')) % HASH_FEATURES
+            counts[feature] = counts.get(feature, 0) + 1
+    return counts
+
+
+class SimilarIndex:
+    """Append-only vector index in directory path; see the module docstring for the files."""
+
+    def __init__(self, path, dims=None, ann=None, scan_threads=None):
+        self.path = path
+        self.ann = ann or ANN
+        # The scan is BLAS-style work done in the request's thread, so it gets the BLAS share of the budget
+        self.scan_threads = scan_threads or default_budget().blas_threads
+        self._pool = None
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._meta_path = os.path.join(path, 'meta.json')
+        with self._file_lock():
+            if not os.path.exists(self._meta_path):
+                self._write_meta({'dims': dims or DIMS, 'dtype': 'int8', 'count': 0, 'capacity': 0, 'documents': 0})
+            self.meta = self._read_meta()
+            if not os.path.exists(os.path.join(path, 'df.i32')):
+                self._resize_file('df.i32', HASH_FEATURES * 4)
+        if self.meta.get('dtype') != 'int8':
+            raise ValueError(f"{path} holds float32 vectors from an older version; rebuild it with "
+                             f"python -m casesheet.similar build.")
+        if dims and dims != self.meta['dims']:
+            raise ValueError(f"{path} holds {self.meta['dims']}-dimensional vectors, not {dims}.")
+        self.dims = self.meta['dims']
+        # Count sketch: each hashed feature lands in one dimension with a random sign
+        rng = np.random.default_rng(0)
+        self._bucket = rng.integers(0, self.dims, HASH_FEATURES)
+        self._sign = rng.choice(np.array([-1.0, 1.0], dtype=np.float32), HASH_FEATURES)
+        self._mapped = None  # capacity of the current mappings
+        self._ann_index = None
+        self._ann_count = 0
+
+    # -- files --
+
+    def _file_lock(self):
+        return _FileLock(os.path.join(self.path, '.lock'))
+
+    def _read_meta(self):
+        with open(self._meta_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self, meta):
+        tmp = self._meta_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path)
+
+    def _resize_file(self, name, nbytes):
+        with open(os.path.join(self.path, name), 'ab') as f:
+            f.truncate(nbytes)
+
+    def _map(self, capacity):
+        """(Re)maps the row files at capacity rows. Call with self._lock held."""
+        if capacity == self._mapped:
+            return
+        if capacity:
+            self.vectors = np.memmap(os.path.join(self.path, 'vectors.i8'), dtype=np.int8, mode='r+',
+                                     shape=(capacity, self.dims))
+            self.ids = np.memmap(os.path.join(self.path, 'ids.i64'), dtype=np.int64, mode='r+', shape=(capacity,))
+            self.users = np.memmap(os.path.join(self.path, 'users.i64'), dtype=np.int64, mode='r+',
+                                   shape=(capacity,))
+        self.df = np.memmap(os.path.join(self.path, 'df.i32'), dtype=np.int32, mode='r+', shape=(HASH_FEATURES,))
+        self._mapped = capacity
+
+    def _sync(self):
+        """Picks up rows other processes appended; returns the row count."""
+        with self._lock:
+            self.meta = self._read_meta()
+            self._map(self.meta['capacity'])
+            return self.meta['count']
+
+    # -- writing --
+
+    def vectorize(self, counts, documents, df):
+        """Normalized sketch of hashed term counts, weighted by smoothed IDF over documents."""
+        vector = np.zeros(self.dims, dtype=np.float32)
+        if not counts:
+            return vector
+        features = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        tf = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        idf = np.log((1 + documents) / (1 + df[features].astype(np.float32))) + 1
+        np.add.at(vector, self._bucket[features], self._sign[features] * tf * idf)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add(self, summary_id, user_id, text):
+        self.add_many([(summary_id, user_id, text)])
+
+    def add_many(self, rows, counted=False):
+        """
+        Appends (summary id, user id, text) rows. Their words count towards the
+        document frequencies first, unless count_terms() already saw them.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        with self._file_lock(), self._lock:
+            meta = self._read_meta()
+            self._map(meta['capacity'])
+            counts = [hashed_terms(text or '') for _, _, text in rows]
+            if not counted:
+                self._count(meta, counts)
+            vectors = np.stack([self.vectorize(c, meta['documents'], self.df) for c in counts])
+            self._append(meta, np.array([row[0] for row in rows], dtype=np.int64),
+                         np.array([row[1] for row in rows], dtype=np.int64), vectors)
+
+    def count_terms(self, texts):
+        """Adds texts to the document frequencies only, so a backfill weighs its first rows like its last."""
+        with self._file_lock(), self._lock:
+            meta = self._read_meta()
+            self._map(meta['capacity'])
+            self._count(meta, [hashed_terms(text or '') for text in texts])
+            self.df.flush()
+            self._write_meta(meta)
+            self.meta = meta
+
+    def _count(self, meta, counts):
+        for terms in counts:
+            self.df[np.fromiter(terms, dtype=np.int64, count=len(terms))] += 1
+        meta['documents'] += len(counts)
+
+    def add_vectors(self, ids, users, vectors):
+        """Appends precomputed normalized vectors (backfills from another encoder, benchmarks)."""
+        with self._file_lock(), self._lock:
+            meta = self._read_meta()
+            self._map(meta['capacity'])
+            self._append(meta, np.asarray(ids, dtype=np.int64), np.asarray(users, dtype=np.int64),
+                         np.asarray(vectors, dtype=np.float32))
+
+    def _append(self, meta, ids, users, vectors):
+        """Writes rows at the end, growing the files by doubling. Call with both locks held."""
+        count = meta['count']
+        needed = count + len(ids)
+        if needed > meta['capacity']:
+            capacity = max(INITIAL_CAPACITY, meta['capacity'])
+            while capacity < needed:
+                capacity *= 2
+            self._resize_file('vectors.i8', capacity * self.dims)
+            self._resize_file('ids.i64', capacity * 8)
+            self._resize_file('users.i64', capacity * 8)
+            meta['capacity'] = capacity
+            self._map(capacity)
+        self.vectors[count:needed] = np.clip(np.rint(vectors * SCALE), -SCALE, SCALE)
+        self.ids[count:needed] = ids
+        self.users[count:needed] = users
+        for array in (self.vectors, self.ids, self.users, self.df):
+            array.flush()
+        meta['count'] = needed
+        # Readers only look at rows below count, so the rows are complete before it moves
+        self._write_meta(meta)
+        self.meta = meta
+
+    # -- searching --
+
+    def __len__(self):
+        return self._sync()
+
+    def vector_for(self, summary_id, text=None):
+        """The stored vector of summary_id, else text's vector under the current frequencies, else None."""
+        count = self._sync()
+        if count:
+            ids = self.ids[:count]
+            # Rows are appended in commit order, so ids are sorted unless workers interleaved
+            row = np.searchsorted(ids, summary_id)
+            if row >= count or ids[row] != summary_id:
+                rows = np.flatnonzero(ids == summary_id)
+                row = rows[-1] if len(rows) else None
+            if row is not None:
+                vector = self.vectors[row].astype(np.float32)
+                norm = np.linalg.norm(vector)
+                return vector / norm if norm else vector
+        if text is None:
+            return None
+        return self.vectorize(hashed_terms(text), self.meta['documents'], self.df)
+
+    def search(self, query, k=10, user_id=None, exclude=()):
+        """
+        [(summary id, cosine similarity)] of the k rows nearest to query,
+        best first, optionally only user_id's rows and never ids in exclude.
+        """
+        count = self._sync()
+        if not count or not query.any():
+            return []
+        if self.ann == 'hnsw':
+            hits = self._search_ann(query, k, user_id, exclude, count)
+            if hits is not None:
+                return hits
+        rows = None
+        if user_id is not None:
+            # Score only the user's rows: a gather when they are few, a full pass otherwise
+            rows = np.flatnonzero(self.users[:count] == user_id)
+            if len(rows) == count:
+                rows = None
+        if rows is None:
+            scores = self._scan(count, query)
+        elif len(rows) * 4 < count:
+            scores = self.vectors[rows].astype(np.float32) @ (query / SCALE)
+        else:
+            scores = self._scan(count, query)[rows]
+        # Rank a few extra so excluded ids can be dropped afterwards; ids are only read for the winners
+        fetch = min(k + len(exclude), len(scores))
+        if not fetch:
+            return []
+        top = np.argpartition(scores, -fetch)[-fetch:]
+        top = top[np.argsort(scores[top])[::-1]]
+        ids = self.ids[top if rows is None else rows[top]]
+        hits = [(int(summary_id), float(scores[i])) for summary_id, i in zip(ids, top)
+                if scores[i] > 0 and summary_id not in exclude]
+        return hits[:k]
+
+    def _scan(self, count, query):
+        """
+        Cosines of query with the first count rows. Row ranges are split over
+        scan_threads threads; numpy drops the GIL for the cast and the dot.
+        """
+        query = query / SCALE
+        vectors = np.asarray(self.vectors)  # plain view: memmap slicing costs microseconds per block
+        scores = np.empty(count, dtype=np.float32)
+        threads = min(self.scan_threads, max(1, count // MIN_ROWS_PER_THREAD))
+        if threads == 1:
+            _scan_rows(vectors, query, scores, 0, count)
+            return scores
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.scan_threads, thread_name_prefix='similar-scan')
+        bounds = np.linspace(0, count, threads + 1).astype(int)
+        list(self._pool.map(lambda i: _scan_rows(vectors, query, scores, bounds[i], bounds[i + 1]),
+                            range(threads)))
+        return scores
+
+    def similar(self, summary_id, k=10, user_id=None, text=None):
+        """The summaries nearest to summary_id, itself left out."""
+        query = self.vector_for(summary_id, text)
+        if query is None:
+            return []
+        return self.search(query, k, user_id=user_id, exclude=(summary_id,))
+
+    def _search_ann(self, query, k, user_id, exclude, count):
+        """hnswlib results filtered after the fact; None when too few survive, to fall back to brute force."""
+        with self._lock:
+            index = self._ann_sync(count)
+            fetch = min(count, k * 10 + len(exclude))
+            labels, distances = index.knn_query(query, k=fetch)
+        hits = []
+        for row, distance in zip(labels[0], distances[0]):
+            summary_id = int(self.ids[row])
+            if (user_id is not None and self.users[row] != user_id) or summary_id in exclude:
+                continue
+            hits.append((summary_id, 1.0 - float(distance)))
+            if len(hits) == k:
+                return [hit for hit in hits if hit[1] > 0]
+        return None if fetch < count else [hit for hit in hits if hit[1] > 0]
+
+    def _ann_sync(self, count):
+        """The process's hnswlib graph with every row up to count added. Call with self._lock held."""
+        try:
+            import hnswlib
+        except ImportError:
+            raise ImportError("CASESHEET_SIMILAR_ANN=hnsw needs hnswlib: pip install hnswlib") from None
+        if self._ann_index is None:
+            self._ann_index = hnswlib.Index(space='ip', dim=self.dims)
+            self._ann_index.init_index(max_elements=max(count, INITIAL_CAPACITY), ef_construction=200, M=16)
+            self._ann_index.set_ef(64)
+            self._ann_count = 0
+        if count > self._ann_count:
+            if count > self._ann_index.get_max_elements():
+                self._ann_index.resize_index(max(count, 2 * self._ann_index.get_max_elements()))
+            self._ann_index.add_items(self.vectors[self._ann_count:count].astype(np.float32) / SCALE,
+                                      np.arange(self._ann_count, count))
+            self._ann_count = count
+        return self._ann_index
+
+
+def _scan_rows(vectors, query, scores, start, end):
+    """scores[start:end] = vectors[start:end] @ query, cast to float32 a cache-sized block at a time."""
+    block = max(1, SCAN_BLOCK_BYTES // (vectors.shape[1] * 4))
+    buffer = np.empty((block, vectors.shape[1]), dtype=np.float32)
+    for first in range(start, end, block):
+        last = min(first + block, end)
+        chunk = buffer[:last - first]
+        np.copyto(chunk, vectors[first:last], casting='unsafe')
+        np.dot(chunk, query, out=scores[first:last])
+
+
+class _FileLock:
+    """Exclusive flock on path, serializing writers across worker processes."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_index():
+    """The process-wide index at CASESHEET_SIMILAR_INDEX, or None when set to 'none'."""
+    global _default
+    if INDEX_DIR in ('', 'none'):
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = SimilarIndex(INDEX_DIR)
+        return _default
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the similar-case index.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="index every stored summary into a fresh index directory")
+    build.add_argument('db')
+    build.add_argument('index')
+    build.add_argument('--dims', type=int, default=DIMS)
+    build.add_argument('--chunk', type=int, default=5000)
+    query = sub.add_parser('query', help="print the summaries nearest to one")
+    query.add_argument('index')
+    query.add_argument('summary_id', type=int)
+    query.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == 'query':
+        for summary_id, score in SimilarIndex(args.index).similar(args.summary_id, args.k):
+            print(f"{summary_id}  {score:.3f}")
+        return
+
+    if os.path.exists(os.path.join(args.index, 'meta.json')):
+        parser.error(f"{args.index} already holds an index; build into a new directory.")
+    index = SimilarIndex(args.index, dims=args.dims)
+    # Two passes: document frequencies over every summary, then the vectors
+    with sqlite3.connect(args.db) as conn:
+        for counted in (False, True):
+            cursor = conn.execute("SELECT id, user_id, summary FROM summaries ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(args.chunk)
+                if not rows:
+                    break
+                if counted:
+                    index.add_many(rows, counted=True)
+                else:
+                    index.count_terms(row[2] for row in rows)
+    print(f"Indexed {len(index)} summaries into {args.index} ({index.dims} dimensions, "
+          f"{math.ceil(index.meta['capacity'] * index.dims / 1024 / 1024)} MB of vectors)")
+
+
+if __name__ == '__main__':
+    main()
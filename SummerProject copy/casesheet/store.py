@@ -0,0 +1,113 @@
+"""
+Normalized storage of a case sheet result next to its rendered text: one
+row per section and an indexed term table, so questions like "sheets with
+diagnosis X last month" are index lookups instead of scans of summaries.summary.
+"""
+
+from .classify import TOKEN_RE
+
+# Sections whose words are indexed under the 'diagnosis' term kind
+DIAGNOSIS_SECTIONS = ('diagnosis', 'assessment', 'problem summary')
+# 'disease': LSA keywords; 'diagnosis': words of DIAGNOSIS_SECTIONS;
+# 'medicine'/'checkup'/'normal': state keywords the classifier found
+TERM_KINDS = ('disease', 'diagnosis', 'medicine', 'checkup', 'normal')
+
+STOP_WORDS = frozenset("""
+    and are but for from has have her his into not of off our she that the their them then there these they
+    this was were which while who will with you your patient patients
+""".split())
+
+
+def init_schema(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS summary_sections
+                 (summary_id INTEGER NOT NULL,
+                  section TEXT NOT NULL,
+                  content TEXT,
+                  summary TEXT,
+                  tier TEXT,
+                  status TEXT,
+                  polarity REAL,
+                  PRIMARY KEY (summary_id, section),
+                  FOREIGN KEY (summary_id) REFERENCES summaries (id))''')
+    # The primary key doubles as the lookup index: kind, term -> summaries
+    c.execute('''CREATE TABLE IF NOT EXISTS summary_terms
+                 (kind TEXT NOT NULL,
+                  term TEXT NOT NULL,
+                  summary_id INTEGER NOT NULL,
+                  PRIMARY KEY (kind, term, summary_id),
+                  FOREIGN KEY (summary_id) REFERENCES summaries (id)) WITHOUT ROWID''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_summary_terms_summary ON summary_terms (summary_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_summaries_created ON summaries (created_at)")
+
+
+def diagnosis_terms(sections):
+    terms = set()
+    for name in DIAGNOSIS_SECTIONS:
+        for token in TOKEN_RE.findall(sections.get(name, '').lower()):
+            if len(token) > 2 and token not in STOP_WORDS:
+                terms.add(token)
+    return terms
+
+
+def result_terms(result):
+    """(kind, term) pairs to index for a CaseSheetResult."""
+    terms = {('disease', keyword.lower()) for keyword in result.disease_keywords}
+    terms.update(('diagnosis', term) for term in diagnosis_terms(result.sections))
+    terms.update((kind, phrase) for kind, phrase in result.classification.get('entities', []))
+    return sorted(terms)
+
+
+def store_structured(c, summary_id, result):
+    """Writes the sections and index terms of result for the summaries row summary_id."""
+    summaries = dict(result.summaries)
+    section_status = result.classification.get('sections', {})
+    rows = []
+    for name in list(result.sections) + [n for n in summaries if n not in result.sections]:
+        status = section_status.get(name)
+        rows.append((summary_id, name, result.sections.get(name), summaries.get(name), result.tiers.get(name),
+                     status.label if status else None, status.score if status else None))
+    c.executemany("INSERT OR REPLACE INTO summary_sections (summary_id, section, content, summary, tier, status, "
+                  "polarity) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    c.executemany("INSERT OR IGNORE INTO summary_terms (kind, term, summary_id) VALUES (?, ?, ?)",
+                  [(kind, term, summary_id) for kind, term in result_terms(result)])
+
+
+def find_summaries(conn, kind, term, user_id=None, since=None, until=None, limit=100):
+    """
+    Summaries indexed under (kind, term), newest first, as dicts. since and
+    until are ISO dates compared against created_at (until is exclusive).
+    """
+    if kind not in TERM_KINDS:
+        raise ValueError(f"Unknown term kind: {kind}")
+    query = ("SELECT s.id, s.filename, s.created_at, s.version, s.disease, s.status, s.state "
+             "FROM summary_terms t JOIN summaries s ON s.id = t.summary_id WHERE t.kind = ? AND t.term = ?")
+    params = [kind, term.lower()]
+    if user_id is not None:
+        query += " AND s.user_id = ?"
+        params.append(user_id)
+    if since:
+        query += " AND s.created_at >= ?"
+        params.append(since)
+    if until:
+        query += " AND s.created_at < ?"
+        params.append(until)
+    query += " ORDER BY s.created_at DESC LIMIT ?"
+    params.append(limit)
+    columns = ('id', 'filename', 'created_at', 'version', 'disease', 'status', 'state')
+    return [dict(zip(columns, row)) for row in conn.execute(query, params)]
+
+
+def summaries_by_id(conn, ids, user_id=None):
+    """The summaries with the given ids (optionally only user_id's) as dicts, in the order of ids."""
+    ids = list(ids)
+    if not ids:
+        return []
+    query = ("SELECT id, filename, created_at, version, disease, status, state FROM summaries "
+             f"WHERE id IN ({', '.join('?' * len(ids))})")
+    params = list(ids)
+    if user_id is not None:
+        query += " AND user_id = ?"
+        params.append(user_id)
+    columns = ('id', 'filename', 'created_at', 'version', 'disease', 'status', 'state')
+    rows = {row[0]: dict(zip(columns, row)) for row in conn.execute(query, params)}
+    return [rows[summary_id] for summary_id in ids if summary_id in rows]
@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+
+from .metrics import stage
+from .resources import configure_torch, ort_session_options
+from .text import split_sentences, summarize_text
+
+BART_MODEL = "facebook/bart-large-cnn"
+DISTILBART_MODEL = "sshleifer/distilbart-cnn-12-6"
+
+# transformers: the stock fp32 pipeline. quantized: the same weights with
+# int8 dynamic quantization of the Linear layers. onnx: a model exported with
+# `optimum-cli export onnx --model facebook/bart-large-cnn <dir>` and run by
+# ONNX Runtime. mmap: safetensors written by `python -m casesheet.weights
+# export`, mapped read-only so every worker process shares one copy.
+BACKENDS = ('transformers', 'quantized', 'onnx', 'mmap')
+
+
+class ExtractiveSummarizer:
+    """First few sentences of the section; no model to load."""
+
+    name = 'extractive'
+    model_version = 'extractive'
+
+    def __init__(self, sentence_count=5):
+        self.sentence_count = sentence_count
+
+    def summarize(self, text):
+        return summarize_text(text, self.sentence_count)
+
+    def summarize_batch(self, texts):
+        return [self.summarize(text) for text in texts]
+
+
+class BartSummarizer:
+    """Abstractive summaries from a transformers pipeline, loaded once and reused."""
+
+    def __init__(self, model=BART_MODEL, backend='transformers', onnx_path=None,
+                 max_input_length=512, max_length=100, min_length=30, max_sentences=3, name='bart'):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown summarizer backend: {backend}")
+        self.name = name
+        self.model = model
+        self.backend = backend
+        self.onnx_path = onnx_path
+        self.max_input_length = max_input_length  # BART's max input length
+        self.max_length = max_length
+        self.min_length = min_length
+        self.max_sentences = max_sentences
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._pipeline is None:
+            with self._lock:
+                if self._pipeline is None:
+                    with stage('model_load'):
+                        self._pipeline = load_summarization_pipeline(self.model, self.backend, self.onnx_path)
+        return self._pipeline
+
+    @property
+    def model_version(self):
+        return f"{self.onnx_path or self.model}@{self.backend}"
+
+    def summarize(self, text):
+        return self.summarize_batch([text])[0]
+
+    def summarize_batch(self, texts):
+        """Runs several inputs through the model as one padded batch."""
+        summarizer = self.load()
+        texts = [text[:self.max_input_length] for text in texts]
+        summaries = summarizer(texts, max_length=self.max_length, min_length=self.min_length, do_sample=False,
+                               batch_size=len(texts))
+        return ["\n".join(split_sentences(summary['summary_text'])[:self.max_sentences]) for summary in summaries]
+
+
+def load_summarization_pipeline(model, backend='transformers', onnx_path=None):
+    from transformers import pipeline
+
+    if backend != 'onnx':
+        configure_torch()
+    if backend == 'transformers':
+        return pipeline("summarization", model=model)
+
+    from transformers import AutoTokenizer
+    if backend == 'mmap':
+        from .weights import load_mmap_model
+        path = onnx_path or model
+        return pipeline("summarization", model=load_mmap_model(path), tokenizer=AutoTokenizer.from_pretrained(path))
+
+    if backend == 'quantized':
+        import torch
+        from transformers import AutoModelForSeq2SeqLM
+        seq2seq = AutoModelForSeq2SeqLM.from_pretrained(model)
+        seq2seq = torch.quantization.quantize_dynamic(seq2seq, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline("summarization", model=seq2seq, tokenizer=AutoTokenizer.from_pretrained(model))
+
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError:
+        raise ImportError("The onnx backend needs `pip install optimum[onnxruntime]`.")
+    path = onnx_path or model
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No exported ONNX model at {path}.")
+    ort_model = ORTModelForSeq2SeqLM.from_pretrained(path, session_options=ort_session_options())
+    return pipeline("summarization", model=ort_model, tokenizer=AutoTokenizer.from_pretrained(path))
+
+
+def distilbart_summarizer(**kwargs):
+    """The 12-encoder/6-decoder distilled BART tier: roughly half the decoder cost of full BART."""
+    return BartSummarizer(model=DISTILBART_MODEL, name='distilbart', **kwargs)
+
+
+class Tier:
+    """One summarizer in a SummaryRouter, with a running estimate of its per-call latency."""
+
+    def __init__(self, summarizer, expected_s, smoothing=0.2):
+        self.summarizer = summarizer
+        self.expected_s = expected_s
+        self.smoothing = smoothing
+
+    @property
+    def name(self):
+        return self.summarizer.name
+
+    @property
+    def model_version(self):
+        return getattr(self.summarizer, 'model_version', self.name)
+
+    def load(self):
+        if hasattr(self.summarizer, 'load'):
+            self.summarizer.load()
+
+    def summarize(self, text):
+        start = time.perf_counter()
+        summary = self.summarizer.summarize(text)
+        elapsed = time.perf_counter() - start
+        # Generation cost is dominated by the fixed number of decoder steps,
+        # so a per-call average tracks it better than a per-character rate
+        self.expected_s += self.smoothing * (elapsed - self.expected_s)
+        return summary
+
+
+# Starting latency estimates in seconds per call, refined as calls complete
+TIER_EXPECTED_S = {'bart': 3.0, 'distilbart': 1.5, 'extractive': 0.01}
+
+
+class SummaryRouter:
+    """
+    Picks a summarizer tier per section. Inputs shorter than short_input_chars
+    go to the cheapest tier; otherwise the best tier whose expected latency
+    fits the section's share of the latency budget wins.
+    """
+
+    name = 'router'
+
+    def __init__(self, tiers=None, short_input_chars=200):
+        # Best quality first, cheapest last
+        self.tiers = tiers or [
+            Tier(BartSummarizer(), TIER_EXPECTED_S['bart']),
+            Tier(distilbart_summarizer(), TIER_EXPECTED_S['distilbart']),
+            Tier(ExtractiveSummarizer(), TIER_EXPECTED_S['extractive']),
+        ]
+        self.short_input_chars = short_input_chars
+
+    @property
+    def model_version(self):
+        return "router(" + ",".join(tier.model_version for tier in self.tiers) + ")"
+
+    def load(self):
+        for tier in self.tiers:
+            tier.load()
+
+    def route(self, text, budget=None):
+        """Returns the tier for text given a budget in seconds (None for no limit)."""
+        if len(text) < self.short_input_chars:
+            return self.tiers[-1]
+        if budget is None:
+            return self.tiers[0]
+        for tier in self.tiers:
+            if tier.expected_s <= budget:
+                return tier
+        return self.tiers[-1]
+
+    def summarize(self, text, budget=None):
+        return self.route(text, budget).summarize(text)
+
+
+def build_summarizers(tiers, backend='transformers', onnx_path=None, distilbart_onnx_path=None):
+    """Summarizers for the named tiers, keyed by name."""
+    summarizers = {}
+    for name in tiers:
+        if name == 'bart':
+            summarizers[name] = BartSummarizer(backend=backend, onnx_path=onnx_path)
+        elif name == 'distilbart':
+            summarizers[name] = distilbart_summarizer(backend=backend, onnx_path=distilbart_onnx_path)
+        elif name == 'extractive':
+            summarizers[name] = ExtractiveSummarizer()
+        else:
+            raise ValueError(f"Unknown summary tier: {name}")
+    return summarizers
+
+
+SUMMARIZERS = {
+    'extractive': ExtractiveSummarizer,
+    'bart': BartSummarizer,
+    'distilbart': distilbart_summarizer,
+    'router': SummaryRouter,
+}
+
+
+def make_summarizer(spec):
+    """Accepts a summarizer instance or one of the names in SUMMARIZERS."""
+    if hasattr(spec, 'summarize'):
+        return spec
+    try:
+        return SUMMARIZERS[spec]()
+    except KeyError:
+        raise ValueError(f"Unknown summarizer: {spec}")
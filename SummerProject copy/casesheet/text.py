@@ -0,0 +1,181 @@
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+HEADINGS = [
+    'History', 'Chief Complaint', 'Presenting Complaint',
+    'Diagnosis', 'Assessment', 'Problem Summary',
+    'Treatment Plan', 'Plan', 'Suggestion', 'Advice'
+]
+
+# Order in which sections appear in the rendered summary
+SECTION_ORDER = [
+    'history', 'chief complaint', 'presenting complaint', 'problem summary',
+    'diagnosis', 'assessment', 'treatment plan', 'plan', 'suggestion', 'advice'
+]
+
+PLAN_SECTIONS = ['suggestion', 'advice', 'plan', 'treatment plan']
+
+# Early exit: sections a summary needs, one group per alternative set of headings
+TARGET_SECTIONS = (
+    ('history',),
+    ('chief complaint', 'presenting complaint'),
+    ('diagnosis', 'assessment', 'problem summary'),
+    ('treatment plan', 'plan', 'suggestion', 'advice'),
+)
+# Headings of the bulk that follows the summary pages; they close the open section
+BOUNDARY_HEADINGS = [
+    'Vitals', 'Vital Signs', 'Investigations', 'Lab Results', 'Laboratory Results',
+    'Nursing Notes', 'Medication Chart', 'Intake Output', 'Progress Notes'
+]
+
+BOILERPLATE_PHRASES = [
+    'hospital', 'patient card', 'registration', 'general hospital',
+    'medical records', 'department', 'address', 'phone', 'fax', 'email',
+    'date of surgery', 'date:', 'time:', 'patient id', 'record no',
+    'summary sheet department', 'emergency', 'insurance'
+]
+
+# Compiled once per process instead of on every call
+DIGIT_RE = re.compile(r'\d')
+BOILERPLATE_RE = re.compile("|".join(re.escape(p) for p in BOILERPLATE_PHRASES))
+HEADING_RE = re.compile(rf'(?im)^({"|".join([re.escape(h) for h in HEADINGS])})[:\-]?')
+ANY_HEADING_RE = re.compile(rf'(?im)^\s*({"|".join([re.escape(h) for h in HEADINGS + BOUNDARY_HEADINGS])})\b')
+
+
+def is_relevant_line(line):
+    """True for a stripped line that is neither mostly digits (IDs, phone numbers) nor boilerplate."""
+    if not line:
+        return False
+    if len(DIGIT_RE.findall(line)) > len(line) / 3:
+        return False
+    return BOILERPLATE_RE.search(line.lower()) is None
+
+
+def filter_relevant_text(text):
+    """Filters out boilerplate and irrelevant information from the extracted text."""
+    return "\n".join(line for line in (raw.strip() for raw in text.split('\n')) if is_relevant_line(line))
+
+
+def extract_sections(text):
+    """Identifies and extracts key sections like 'Diagnosis' and 'Treatment Plan'."""
+    sections = {}
+    # splits list format: [text_before_first_heading, heading1, content1, heading2, content2, ...]
+    splits = HEADING_RE.split(text)
+    found_headings = splits[1::2]
+
+    if found_headings:
+        for i, heading in enumerate(found_headings):
+            content_index = 2*i + 2
+            content = splits[content_index].strip() if content_index < len(splits) else ''
+            sections[heading.lower()] = content
+    else:
+        sections['full_text'] = text
+
+    return sections
+
+
+def section_spans(text):
+    """(start, end) of each section's content in text, keyed like extract_sections."""
+    matches = list(HEADING_RE.finditer(text))
+    spans = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        spans[match.group(1).lower()] = (match.end(), end)
+    return spans
+
+
+class EarlyExit:
+    """
+    Stop reading pages once every group in targets has a section that was
+    found and closed by a later heading, or after max_pages pages at most.
+    """
+
+    def __init__(self, targets=TARGET_SECTIONS, max_pages=30):
+        self.targets = tuple(tuple(name.lower() for name in group) for group in targets)
+        self.max_pages = max_pages
+
+    @classmethod
+    def from_env(cls):
+        spec = os.environ.get('CASESHEET_EARLY_EXIT_SECTIONS')
+        # 'history,chief complaint|presenting complaint,diagnosis|assessment'
+        targets = [group.split('|') for group in spec.split(',')] if spec else TARGET_SECTIONS
+        return cls(targets, int(os.environ.get('CASESHEET_EARLY_EXIT_MAX_PAGES', '30')))
+
+
+def default_early_exit():
+    """The EarlyExit from the environment when CASESHEET_EARLY_EXIT is on, else None (read every page)."""
+    if os.environ.get('CASESHEET_EARLY_EXIT', '0') in ('1', 'true', 'yes'):
+        return EarlyExit.from_env()
+    return None
+
+
+class SectionTracker:
+    """Follows headings page by page for an EarlyExit."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.pages = 0
+        self.closed = set()
+        self.open = None
+
+    def feed(self, page_text):
+        self.pages += 1
+        for match in ANY_HEADING_RE.finditer(page_text or ''):
+            if self.open is not None:
+                self.closed.add(self.open)
+            self.open = match.group(1).lower()
+
+    @property
+    def done(self):
+        if self.pages >= self.policy.max_pages:
+            return True
+        return all(any(name in self.closed for name in group) for group in self.policy.targets)
+
+
+# Sentence ends for when NLTK's punkt data is missing and cannot be downloaded
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9("\'])')
+_punkt_ready = None
+_punkt_lock = threading.Lock()
+
+
+def punkt_available():
+    """
+    Whether NLTK can split sentences. Missing punkt/punkt_tab data (newer
+    NLTK needs both) is downloaded the first time; the answer is then kept.
+    """
+    global _punkt_ready
+    with _punkt_lock:
+        if _punkt_ready is None:
+            import nltk
+            for name in ('punkt', 'punkt_tab'):
+                try:
+                    nltk.data.find(f'tokenizers/{name}')
+                except LookupError:
+                    nltk.download(name, quiet=True)
+            try:
+                nltk.sent_tokenize("Ready. Set.")
+                _punkt_ready = True
+            except LookupError:
+                logger.warning("NLTK punkt data is unavailable; splitting sentences on punctuation instead.")
+                _punkt_ready = False
+        return _punkt_ready
+
+
+def split_sentences(text):
+    """Sentences of text: NLTK's punkt tokenizer, or a punctuation split without its data."""
+    if punkt_available():
+        import nltk
+        return nltk.sent_tokenize(text)
+    return [sentence for sentence in SENTENCE_END_RE.split(text.strip()) if sentence]
+
+
+def summarize_text(text, sentence_count=5):
+    """Summarizes text by taking the first few sentences."""
+    sentences = split_sentences(text)
+    if not sentences:
+        return text[:500] + ('...' if len(text) > 500 else '')
+    return "\n".join(sentences[:sentence_count])
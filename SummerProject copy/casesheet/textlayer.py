@@ -0,0 +1,82 @@
+"""
+Text-layer extraction behind one interface. PyMuPDF reads the text layer in
+C and is the default; PyPDF2 is pure Python and kept as the fallback for
+files PyMuPDF cannot parse (and for comparison).
+"""
+
+import io
+import os
+
+BACKENDS = ('pymupdf', 'pypdf2')
+DEFAULT_BACKEND = os.environ.get('CASESHEET_TEXT_BACKEND', 'pymupdf')
+# Backend tried from the failing page on when the configured one raises; 'none' disables it
+FALLBACK_BACKEND = os.environ.get('CASESHEET_TEXT_FALLBACK', 'pypdf2')
+
+
+class TextDocument:
+    """
+    An open text layer: len() is the page count and text(index) a page's
+    text. Use it as a context manager so the backend's file is closed.
+    """
+
+    def __init__(self, count, page_text, close=None):
+        self.count = count
+        self.text = page_text
+        self._close = close
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PyMuPDFBackend:
+    name = 'pymupdf'
+
+    def open(self, source):
+        """Returns a TextDocument."""
+        import fitz
+        if isinstance(source, (bytes, bytearray)):
+            doc = fitz.open(stream=source, filetype='pdf')
+        else:
+            doc = fitz.open(source)
+        return TextDocument(len(doc), lambda index: doc.load_page(index).get_text(), doc.close)
+
+
+class PyPDF2Backend:
+    name = 'pypdf2'
+
+    def open(self, source):
+        import PyPDF2
+        if isinstance(source, (bytes, bytearray)):
+            reader = PyPDF2.PdfReader(io.BytesIO(source))
+        else:
+            reader = PyPDF2.PdfReader(source)  # reads the file into memory and closes it
+        return TextDocument(len(reader.pages), lambda index: reader.pages[index].extract_text() or "")
+
+
+_BACKENDS = {'pymupdf': PyMuPDFBackend, 'pypdf2': PyPDF2Backend}
+
+
+def get_backend(name=None):
+    name = name or DEFAULT_BACKEND
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown text-layer backend: {name}")
+    return _BACKENDS[name]()
+
+
+def fallback_for(name=None):
+    """The backend to fall back to from name, or None."""
+    name = name or DEFAULT_BACKEND
+    if FALLBACK_BACKEND in ('none', '', name):
+        return None
+    return get_backend(FALLBACK_BACKEND)
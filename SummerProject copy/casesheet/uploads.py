@@ -0,0 +1,176 @@
+import hashlib
+import io
+import os
+import tempfile
+import zipfile
+
+PDF_MAGIC = b'%PDF-'
+ZIP_MAGIC = b'PK\x03\x04'
+# The PDF header may be preceded by junk; readers accept it within the first 1 KiB
+MAGIC_WINDOW = 1024
+CHUNK_SIZE = 64 * 1024
+
+DEFAULT_MAX_BYTES = 25 * 1024 * 1024
+DEFAULT_MEMORY_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_MEMBERS = 50
+
+
+class UploadError(ValueError):
+    """An upload that was rejected before processing; status is the HTTP code to answer with."""
+
+    status = 400
+
+
+class UploadTooLarge(UploadError):
+    status = 413
+
+
+class NotAPdf(UploadError):
+    status = 415
+
+
+class NotAZip(UploadError):
+    status = 415
+
+
+class Upload:
+    """
+    A received PDF, held in memory when small enough and otherwise in a
+    uniquely named temp file. source is what the extractors accept.
+    """
+
+    def __init__(self, filename, sha256, size, data=None, path=None):
+        self.filename = filename
+        self.sha256 = sha256
+        self.size = size
+        self.data = data
+        self.path = path
+
+    @property
+    def source(self):
+        return self.data if self.data is not None else self.path
+
+    def cleanup(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+
+def receive_upload(stream, filename, upload_dir='uploads', max_bytes=DEFAULT_MAX_BYTES,
+                   memory_bytes=DEFAULT_MEMORY_BYTES, chunk_size=CHUNK_SIZE):
+    """
+    Copies an upload stream chunk by chunk. Rejects non-PDF content as soon
+    as the header is read and anything over max_bytes as soon as it is
+    exceeded. Spills to a temp file in upload_dir once memory_bytes is passed.
+    """
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    spill = None
+    size = 0
+    head = b''
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit.")
+            digest.update(chunk)
+            (spill or buffer).write(chunk)
+
+            if head is not None:
+                head += chunk[:MAGIC_WINDOW - len(head)]
+                if len(head) >= MAGIC_WINDOW:
+                    _check_magic(head)
+                    head = None
+            if spill is None and size > memory_bytes:
+                os.makedirs(upload_dir, exist_ok=True)
+                spill = tempfile.NamedTemporaryFile(dir=upload_dir, prefix='casesheet-', suffix='.pdf', delete=False)
+                spill.write(buffer.getvalue())
+                buffer = None
+
+        if head is not None:
+            _check_magic(head)
+    except Exception:
+        if spill is not None:
+            spill.close()
+            os.remove(spill.name)
+        raise
+
+    if spill is not None:
+        spill.close()
+        return Upload(filename, digest.hexdigest(), size, path=spill.name)
+    return Upload(filename, digest.hexdigest(), size, data=buffer.getvalue())
+
+
+def _check_magic(head):
+    if PDF_MAGIC not in head:
+        raise NotAPdf("The uploaded file is not a PDF.")
+
+
+def receive_archive(stream, upload_dir='uploads', max_bytes=DEFAULT_MAX_BYTES,
+                    memory_bytes=DEFAULT_MEMORY_BYTES, chunk_size=CHUNK_SIZE):
+    """
+    Spools a ZIP upload so its members can be read in place: in memory up to
+    memory_bytes, then in an anonymous temp file in upload_dir that goes away
+    when the returned file is closed.
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    spool = tempfile.SpooledTemporaryFile(max_size=memory_bytes, dir=upload_dir)
+    try:
+        size = 0
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Archive exceeds the {max_bytes // (1024 * 1024)} MB upload limit.")
+            spool.write(chunk)
+        spool.seek(0)
+        if spool.read(len(ZIP_MAGIC)) != ZIP_MAGIC:
+            raise NotAZip("The uploaded file is not a ZIP archive.")
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    return spool
+
+
+def iter_archive_uploads(archive, upload_dir='uploads', max_bytes=DEFAULT_MAX_BYTES,
+                         memory_bytes=DEFAULT_MEMORY_BYTES, max_members=DEFAULT_MAX_MEMBERS):
+    """
+    Yields (filename, Upload or UploadError) for each PDF in a ZIP archive.
+    Members are decompressed one at a time straight into receive_upload, so
+    the size limit applies to the inflated bytes and nothing is extracted.
+    """
+    try:
+        zf = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile as e:
+        raise NotAZip(f"The uploaded archive cannot be read: {e}")
+    with zf:
+        members = [info for info in zf.infolist()
+                   if not info.is_dir() and info.filename.lower().endswith('.pdf')
+                   and not info.filename.startswith('__MACOSX/')]
+        if len(members) > max_members:
+            raise UploadError(f"Archive holds {len(members)} PDFs; the limit is {max_members}.")
+        for info in members:
+            filename = os.path.basename(info.filename)
+            if info.file_size > max_bytes:
+                yield filename, UploadTooLarge(f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit.")
+                continue
+            try:
+                with zf.open(info) as member:
+                    yield filename, receive_upload(member, filename, upload_dir, max_bytes, memory_bytes)
+            except UploadError as e:
+                yield filename, e
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                # Corrupt, encrypted or unsupported-compression members
+                yield filename, UploadError(f"Cannot read {filename} from the archive: {e}")
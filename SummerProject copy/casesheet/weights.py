@@ -0,0 +1,134 @@
+"""
+Memory-mapped model weights. A model exported once to safetensors is loaded
+as tensor views over a private file mapping, so every worker process reads
+the same page-cache pages instead of holding its own copy of the weights.
+
+    python -m casesheet.weights export facebook/bart-large-cnn ./bart-mmap
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import struct
+
+# safetensors dtype codes to torch dtype names
+_DTYPES = {
+    'F64': 'float64', 'F32': 'float32', 'F16': 'float16', 'BF16': 'bfloat16',
+    'I64': 'int64', 'I32': 'int32', 'I16': 'int16', 'I8': 'int8', 'U8': 'uint8', 'BOOL': 'bool',
+}
+
+
+def read_safetensors_header(path):
+    """Returns (tensor metadata, offset of the data section) of a safetensors file."""
+    with open(path, 'rb') as f:
+        prefix = f.read(8)
+        if len(prefix) != 8:
+            raise ValueError(f"{path} is not a safetensors file.")
+        (header_size,) = struct.unpack('<Q', prefix)
+        header = json.loads(f.read(header_size))
+    header.pop('__metadata__', None)
+    return header, 8 + header_size
+
+
+def mmap_state_dict(path):
+    """
+    Tensors of a safetensors file as views over one copy-on-write mapping of
+    it. Pages are only read when touched and stay shared until written.
+    """
+    import torch
+
+    header, data_start = read_safetensors_header(path)
+    size = os.path.getsize(path)
+    # shared=False maps MAP_PRIVATE: read-only use never copies a page
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=size)
+    state = {}
+    for name, info in header.items():
+        dtype = getattr(torch, _DTYPES[info['dtype']])
+        begin, end = info['data_offsets']
+        offset = data_start + begin
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        if offset % itemsize:
+            # Unaligned tensors cannot be viewed in place; copy just this one
+            flat = torch.frombuffer(bytearray(storage[offset:data_start + end]), dtype=dtype)
+            state[name] = flat.reshape(info['shape'])
+            continue
+        tensor = torch.empty(0, dtype=dtype)
+        tensor.set_(storage, offset // itemsize, info['shape'])
+        state[name] = tensor
+    return state
+
+
+def export_weights(model, out_dir):
+    """Saves a seq2seq model and its tokenizer as one unsharded safetensors file plus config."""
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    seq2seq = AutoModelForSeq2SeqLM.from_pretrained(model)
+    seq2seq.save_pretrained(out_dir, safe_serialization=True, max_shard_size='100GB')
+    AutoTokenizer.from_pretrained(model).save_pretrained(out_dir)
+    return out_dir
+
+
+@contextlib.contextmanager
+def _parameters_on_meta():
+    """
+    Modules built inside get their parameters on the meta device, while their
+    buffers (position ids, rotary caches) are computed for real by their own
+    __init__, as saved checkpoints leave the non-persistent ones out.
+    """
+    import torch
+
+    register = torch.nn.Module.register_parameter
+
+    def register_on_meta(module, name, param):
+        if param is not None:
+            param = torch.nn.Parameter(param.to('meta'), requires_grad=param.requires_grad)
+        register(module, name, param)
+
+    torch.nn.Module.register_parameter = register_on_meta
+    try:
+        yield
+    finally:
+        torch.nn.Module.register_parameter = register
+
+
+def load_mmap_model(path):
+    """Builds the model skeleton without allocating weights, then points it at the mapped tensors."""
+    from transformers import AutoConfig, AutoModelForSeq2SeqLM
+
+    files = sorted(glob.glob(os.path.join(path, '*.safetensors')))
+    if not files:
+        raise FileNotFoundError(f"No safetensors weights in {path}; export them with "
+                                f"`python -m casesheet.weights export <model> {path}`.")
+    state = {}
+    for file in files:
+        state.update(mmap_state_dict(file))
+
+    config = AutoConfig.from_pretrained(path)
+    with _parameters_on_meta():
+        seq2seq = AutoModelForSeq2SeqLM.from_config(config)
+    _, unexpected = seq2seq.load_state_dict(state, strict=False, assign=True)
+    # Tied embeddings are saved once; tie_weights points the rest at them
+    seq2seq.tie_weights()
+    still_meta = [name for name, t in [*seq2seq.named_parameters(), *seq2seq.named_buffers()] if t.is_meta]
+    if still_meta or unexpected:
+        raise RuntimeError(f"Weights in {path} do not match {config.model_type}: "
+                           f"missing {still_meta[:5]}, unexpected {unexpected[:5]}")
+    return seq2seq.eval()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a summarization model for the mmap backend.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help="save a model as memory-mappable safetensors")
+    export.add_argument('model')
+    export.add_argument('out_dir')
+    args = parser.parse_args()
+
+    export_weights(args.model, args.out_dir)
+    print(f"Exported {args.model} to {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,19 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from pdf2image import convert_from_path
 import pytesseract
 from gensim.summarization import summarize
-import os
+
+from casesheet import CaseSheetPipeline
 
 # If Tesseract is not in PATH, set it manually here (use your actual installed path)
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
-# Text extraction using OCR from image-based PDF
+case_pipeline = CaseSheetPipeline(summarizer='extractive')
+
+# Text layer first, OCR for image-based PDFs
 def extract_text_from_pdf(file_path):
     try:
-        images = convert_from_path(file_path)
-        full_text = ""
-        for img in images:
-            text = pytesseract.image_to_string(img)
-            full_text += text + "\n"
-        return full_text
+        return case_pipeline.extract_text(file_path)
     except Exception as e:
         messagebox.showerror("Error", f"Failed to extract text: {e}")
         return ""
@@ -1,29 +1,58 @@
-from flask import Flask, request, render_template, jsonify, redirect, url_for, flash
+from flask import Flask, request, render_template, jsonify, redirect, url_for, flash, Response, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-import PyPDF2
-import pytesseract
-from PIL import Image, ImageEnhance
-import fitz  # PyMuPDF
-import io
-import re
-from textblob import TextBlob
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import TruncatedSVD
-import numpy as np
 import sqlite3
 import os
+import logging
 from datetime import datetime
-from transformers import pipeline
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import nltk
-nltk.download('punkt')
+import json
+import functools
+from casesheet import (CaseSheetPipeline, ExtractiveSummarizer, REGISTRY, SummaryRouter, Tier, build_summarizers,
+                       default_budget, request_trace, stage)
+from casesheet.export import FORMATS, MIMETYPES, iter_export, iter_summary_chunks
+from casesheet.inference import RemoteSummarizer
+from casesheet.limits import LimitExceeded, MemoryWatchdog, default_limits
+from casesheet.metrics import configure_logging
+from casesheet import profiling
+from casesheet.scheduler import Overloaded, Scheduler
+from casesheet.similar import default_index
+from casesheet.store import TERM_KINDS, find_summaries, init_schema, store_structured, summaries_by_id
+from casesheet.summarize import TIER_EXPECTED_S
+from casesheet.uploads import UploadError, iter_archive_uploads, receive_archive, receive_upload
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Replace with a secure key
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
+# Request trace lines (casesheet.metrics) must reach stderr under gunicorn too, where __main__ never runs
+configure_logging()
+
+# Upload limits; Werkzeug refuses bodies over MAX_CONTENT_LENGTH before reading them
+UPLOAD_DIR = os.environ.get('CASESHEET_UPLOAD_DIR', 'uploads')
+MAX_UPLOAD_BYTES = int(os.environ.get('CASESHEET_MAX_UPLOAD_MB', '25')) * 1024 * 1024
+MEMORY_UPLOAD_BYTES = int(os.environ.get('CASESHEET_MEMORY_UPLOAD_MB', '8')) * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 64 * 1024  # room for the multipart envelope
+# /upload/bulk: total request size and PDFs per request
+MAX_BULK_BYTES = int(os.environ.get('CASESHEET_MAX_BULK_MB', '200')) * 1024 * 1024
+MAX_BULK_FILES = int(os.environ.get('CASESHEET_MAX_BULK_FILES', '50'))
+# Processing threads shared by /upload (interactive lane) and /upload/bulk (batch lane)
+# (as many as the core budget allows, see casesheet.resources); full queues answer 429 with Retry-After
+resources = default_budget().apply()
+resources.report()
+scheduler = Scheduler(
+    workers=resources.workers,
+    reserved=min(int(os.environ.get('CASESHEET_INTERACTIVE_RESERVED', '1')), resources.workers - 1),
+    max_queue={'interactive': int(os.environ.get('CASESHEET_MAX_INTERACTIVE_QUEUE', '16')),
+               'batch': int(os.environ.get('CASESHEET_MAX_BATCH_QUEUE', '200'))},
+    per_user={'interactive': int(os.environ.get('CASESHEET_USER_INTERACTIVE_LIMIT', '2')),
+              'batch': int(os.environ.get('CASESHEET_USER_BATCH_LIMIT', '2'))})
+# Page, render and text ceilings per document; with CASESHEET_MAX_RSS_MB set, a worker
+# whose RSS stays over it is recycled (see casesheet.limits)
+limits = default_limits()
+watchdog = MemoryWatchdog(limits.max_rss_bytes).start() if limits.max_rss_bytes else None
+# Memory-mapped vectors of stored summaries behind /similar/<id> (see casesheet.similar); None when disabled
+similar_index = default_index()
 
 # Database setup
 def init_db():
@@ -39,7 +68,31 @@ def init_db():
                       filename TEXT, 
                       summary TEXT, 
                       created_at TIMESTAMP, 
+                      summary_tiers TEXT,
+                      version INTEGER DEFAULT 1,
+                      parent_id INTEGER,
+                      fingerprint TEXT,
+                      disease TEXT,
+                      status TEXT,
+                      status_confidence REAL,
+                      polarity REAL,
+                      state TEXT,
+                      model_version TEXT,
+                      timings TEXT,
                       FOREIGN KEY (user_id) REFERENCES users (id))''')
+        columns = [row[1] for row in c.execute("PRAGMA table_info(summaries)")]
+        for column, kind in (('summary_tiers', 'TEXT'), ('version', 'INTEGER DEFAULT 1'),
+                             ('parent_id', 'INTEGER'), ('fingerprint', 'TEXT'), ('disease', 'TEXT'),
+                             ('status', 'TEXT'), ('status_confidence', 'REAL'), ('polarity', 'REAL'),
+                             ('state', 'TEXT'), ('model_version', 'TEXT'), ('timings', 'TEXT')):
+            if column not in columns:
+                c.execute(f"ALTER TABLE summaries ADD COLUMN {column} {kind}")
+        # Re-uploads look up the latest version of the same file for the same user
+        c.execute("CREATE INDEX IF NOT EXISTS idx_summaries_user_file ON summaries (user_id, filename, id)")
+        # Exports filter by user and date range
+        c.execute("CREATE INDEX IF NOT EXISTS idx_summaries_user_created ON summaries (user_id, created_at)")
+        # Sections and indexed terms of each summary (casesheet.store)
+        init_schema(c)
         conn.commit()
 
 init_db()
@@ -60,119 +113,68 @@ def load_user(user_id):
             return User(user_data[0], user_data[1])
         return None
 
-def extract_text_from_pdf(file_path):
-    text = ""
-    try:
-        with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-    except Exception as e:
-        raise RuntimeError(f"Error reading PDF: {str(e)}")
-    return text.strip()
-
-def extract_text_with_ocr(pdf_path):
-    try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap(dpi=300)
-            img_data = pix.tobytes("png")
-            image = Image.open(io.BytesIO(img_data))
-            image = image.convert('L')
-            image = image.point(lambda x: 0 if x < 140 else 255)
-            image = ImageEnhance.Contrast(image).enhance(2.5)
-            image = ImageEnhance.Sharpness(image).enhance(2.0)
-            ocr_result = pytesseract.image_to_string(image, lang='eng', config='--oem 3 --psm 4')
-            text += ocr_result + "\n"
-        return text.strip()
-    except Exception as e:
-        raise RuntimeError(f"OCR failed: {str(e)}")
-
-def filter_relevant_text(text):
-    lines = text.split('\n')
-    filtered_lines = []
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        if len(re.findall(r'\d', line)) > len(line) / 3:
-            continue
-        boilerplate_phrases = [
-            'hospital', 'patient card', 'registration', 'general hospital',
-            'medical records', 'department', 'address', 'phone', 'fax', 'email',
-            'date of surgery', 'date:', 'time:', 'patient id', 'record no',
-            'summary sheet department', 'emergency', 'insurance'
-        ]
-        if any(phrase in line.lower() for phrase in boilerplate_phrases):
-            continue
-        filtered_lines.append(line)
-    return "\n".join(filtered_lines)
-
-def extract_disease_lsa(text, n_components=2):
-    sentences = text.split('\n')
-    if not sentences:
-        return "No disease identified", []
-
-    vectorizer = TfidfVectorizer(stop_words='english')
-    try:
-        X = vectorizer.fit_transform(sentences)
-    except ValueError:
-        return "No disease identified", []
-
-    svd = TruncatedSVD(n_components=n_components)
-    lsa_matrix = svd.fit_transform(X)
-    terms = vectorizer.get_feature_names_out()
-    components = svd.components_
-
-    disease_keywords = []
-    for component in components:
-        top_term_indices = component.argsort()[-5:][::-1]
-        disease_keywords.extend([terms[i] for i in top_term_indices])
-
-    relevant_sentences = [s for s in sentences if any(kw in s.lower() for kw in disease_keywords)]
-    disease_summary = " ".join(disease_keywords[:3]) if disease_keywords else "No disease identified"
-    return disease_summary, relevant_sentences
-
-def bert_summarize(text, max_sentences=3):
-    summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-    max_input_length = 512  # BART's max input length
-    text = text[:max_input_length]
-    summary = summarizer(text, max_length=100, min_length=30, do_sample=False)
-    sentences = nltk.sent_tokenize(summary[0]['summary_text'])
-    return "\n".join(sentences[:max_sentences])
-
-def analyze_patient_status(text):
-    blob = TextBlob(text)
-    polarity = blob.sentiment.polarity
-    if polarity > 0.2:
-        return "Stable: Patient condition appears positive."
-    elif polarity < -0.2:
-        return "Critical: Patient may require urgent attention."
-    return "Monitor: Patient condition needs regular observation."
-
-def extract_sections(text):
-    sections = {}
-    headings = [
-        'History', 'Chief Complaint', 'Presenting Complaint',
-        'Diagnosis', 'Assessment', 'Problem Summary',
-        'Treatment Plan', 'Plan', 'Suggestion', 'Advice'
-    ]
-    pattern = rf'(?im)^({"|".join([re.escape(h) for h in headings])})[:\-]?'
-    splits = re.split(pattern, text)
-    found_headings = re.findall(pattern, text)
-
-    if found_headings:
-        for i, heading in enumerate(found_headings):
-            content_index = 2*i + 2
-            content = splits[content_index].strip() if content_index < len(splits) else ''
-            sections[heading.lower()] = content
-    else:
-        sections['full_text'] = text
-    return sections
+# Summarizer backend for the model tiers: transformers (default), quantized or onnx
+SUMMARIZER_BACKEND = os.environ.get('CASESHEET_SUMMARIZER_BACKEND', 'transformers')
+SUMMARY_TIERS = os.environ.get('CASESHEET_SUMMARY_TIERS', 'bart,distilbart,extractive').split(',')
+# With a sidecar (python -m casesheet.inference) the models live there, batched across workers
+INFERENCE_SOCKET = os.environ.get('CASESHEET_INFERENCE_SOCKET')
+
+if INFERENCE_SOCKET:
+    tier_summarizers = {name: ExtractiveSummarizer() if name == 'extractive' else RemoteSummarizer(name, INFERENCE_SOCKET)
+                        for name in SUMMARY_TIERS}
+else:
+    tier_summarizers = build_summarizers(SUMMARY_TIERS, SUMMARIZER_BACKEND,
+                                         os.environ.get('CASESHEET_ONNX_MODEL_PATH'),
+                                         os.environ.get('CASESHEET_DISTILBART_ONNX_MODEL_PATH'))
+
+# Best tier first; sections get the best one that fits their share of the budget
+summarizer = SummaryRouter([Tier(tier_summarizers[name], TIER_EXPECTED_S[name]) for name in SUMMARY_TIERS])
+case_pipeline = CaseSheetPipeline(summarizer=summarizer, analyses=('disease', 'status'))
+
+def env_seconds(name):
+    return float(os.environ[name]) if os.environ.get(name) else None
+
+# Latency budget in seconds per endpoint (per file for bulk); unset means best quality regardless of time
+LATENCY_BUDGETS = {
+    'upload': env_seconds('CASESHEET_UPLOAD_BUDGET_S'),
+    'bulk': env_seconds('CASESHEET_BULK_BUDGET_S'),
+}
+
+def latest_version(user_id, filename):
+    """(id, version, fingerprint) of the user's most recent summary of filename, or None."""
+    with sqlite3.connect('summaries.db') as conn:
+        row = conn.execute("SELECT id, version, fingerprint FROM summaries WHERE user_id = ? AND filename = ? "
+                           "ORDER BY id DESC LIMIT 1", (user_id, filename)).fetchone()
+    if row is None:
+        return None
+    return row[0], row[1] or 1, json.loads(row[2]) if row[2] else None
+
+def overloaded(e, trace):
+    """The 429 response for an Overloaded scheduler lane."""
+    trace.status = 'rejected'
+    response = jsonify({'error': str(e), 'retry_after': e.retry_after, 'request_id': trace.request_id})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, e.status
+
+def admit(lane):
+    """Raises Overloaded when lane's queue is full or this worker is draining before a recycle."""
+    if watchdog is not None and watchdog.draining.is_set():
+        raise Overloaded(lane, 5, "This worker is restarting to free memory; retry shortly.", status=503)
+    scheduler.check(lane)
+
+def limit_exceeded(e, trace):
+    """The structured error response for a document or worker past one of its limits."""
+    trace.status = 'rejected'
+    trace.fields['limit'] = e.code
+    return jsonify(dict(e.as_dict(), request_id=trace.request_id)), e.status
+
+def request_budget(endpoint):
+    """The endpoint's budget, tightened by a ?budget=<seconds> query parameter."""
+    budget = LATENCY_BUDGETS.get(endpoint)
+    requested = request.args.get('budget', type=float)
+    if requested is not None and requested > 0:
+        budget = requested if budget is None else min(budget, requested)
+    return budget
 
 @app.route('/')
 @login_required
@@ -222,59 +224,269 @@ def logout():
 @app.route('/upload', methods=['POST'])
 @login_required
 def upload_file():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file uploaded'})
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'})
-    
-    if file and file.filename.endswith('.pdf'):
+    with request_trace('upload', user_id=current_user.id) as trace:
         try:
-            file_path = os.path.join('uploads', file.filename)
-            os.makedirs('uploads', exist_ok=True)
-            file.save(file_path)
-
-            text = extract_text_from_pdf(file_path)
-            if not text:
-                text = extract_text_with_ocr(file_path)
-            if not text.strip():
-                raise ValueError("No readable text found in the case sheet.")
-
-            text = filter_relevant_text(text)
-            sections = extract_sections(text)
+            # Refuse before reading the body when the interactive queue is already full
+            admit('interactive')
+        except Overloaded as e:
+            return overloaded(e, trace)
+        # A raw application/pdf body is read straight off the socket; multipart
+        # uploads go through Werkzeug's form parser first
+        if request.mimetype == 'application/pdf':
+            filename = request.args.get('filename', 'upload.pdf')
+            stream = request.stream
+        else:
+            file = request.files.get('file')
+            if file is None or file.filename == '':
+                trace.status = 'rejected'
+                return jsonify({'error': 'No file uploaded' if file is None else 'No file selected'})
+            filename = file.filename
+            stream = file.stream
+        trace.fields['filename'] = filename
+        if not filename.lower().endswith('.pdf'):
+            trace.status = 'rejected'
+            return jsonify({'error': 'Invalid file format'})
 
-            disease, relevant_sentences = extract_disease_lsa(text)
-            disease_summary = f"🩺 Identified Disease: {disease}\n" + "\n".join(relevant_sentences[:3])
-
-            summary_parts = []
-            for section_name in ['history', 'chief complaint', 'presenting complaint', 'problem summary', 'diagnosis', 'assessment', 'treatment plan', 'plan', 'suggestion', 'advice']:
-                content = sections.get(section_name)
-                if content:
-                    content = filter_relevant_text(content)
-                    summary = bert_summarize(content)
-                    summary_parts.append(f"📝 {section_name.title()}:\n{summary}\n")
-
-            if not summary_parts:
-                summary_parts.append("📝 Summary:\n" + bert_summarize(text))
-
-            status = analyze_patient_status(text)
-            summary_parts.append(f"💡 Patient Status:\n{status}")
-
-            full_summary = "\n".join([disease_summary] + summary_parts)
-
-            with sqlite3.connect('summaries.db') as conn:
-                c = conn.cursor()
-                c.execute("INSERT INTO summaries (user_id, filename, summary, created_at) VALUES (?, ?, ?, ?)",
-                          (current_user.id, file.filename, full_summary, datetime.utcnow()))
+        try:
+            with stage('receive') as rec:
+                upload = receive_upload(stream, filename, UPLOAD_DIR, MAX_UPLOAD_BYTES, MEMORY_UPLOAD_BYTES)
+                rec.nbytes = upload.size
+        except UploadError as e:
+            trace.status = 'rejected'
+            return jsonify({'error': str(e), 'request_id': trace.request_id}), e.status
+        try:
+            # A re-upload of the same file is diffed against its latest version
+            previous = latest_version(current_user.id, filename)
+            # With the profiling token (see casesheet.profiling) the run is saved as profiles/<request id>.*
+            job = case_pipeline.process
+            if profiling.requested(request.headers, request.args):
+                job = functools.partial(profiling.profile_call, trace.request_id, case_pipeline.process)
+                trace.fields['profile'] = trace.request_id
+            with upload:
+                result = scheduler.submit('interactive', current_user.id, job, upload.source,
+                                          budget=request_budget('upload'),
+                                          previous=previous[2] if previous else None).result()
+            full_summary = result.render()
+            trace.fields['tiers'] = result.tiers
+            trace.fields['reused_sections'] = result.reused
+            trace.fields['changed_pages'] = len(result.changed_pages)
+            trace.fields['pages_skipped'] = result.pages_skipped
+
+            with stage('db_insert'), sqlite3.connect('summaries.db') as conn:
+                summary_id, version = insert_summary(conn.cursor(), current_user.id, filename, result,
+                                                     full_summary, previous, trace.stage_totals())
                 conn.commit()
+            with stage('similar_index'):
+                index_similar([(summary_id, current_user.id, full_summary)])
+
+            return jsonify({'summary': full_summary, 'tiers': result.tiers, 'version': version,
+                            'reused_sections': result.reused, 'changed_pages': result.changed_pages,
+                            'pages_read': result.pages_read, 'pages_skipped': result.pages_skipped,
+                            'request_id': trace.request_id})
+        except Overloaded as e:
+            return overloaded(e, trace)
+        except LimitExceeded as e:
+            return limit_exceeded(e, trace)
+        except Exception as e:
+            trace.status = 'error'
+            return jsonify({'error': str(e), 'request_id': trace.request_id})
+
+def insert_summary(c, user_id, filename, result, full_summary, previous, timings):
+    """
+    Stores result as the next version after previous (see latest_version),
+    with its sections and index terms; returns (summary id, version number).
+    """
+    parent_id, version = (previous[0], previous[1]) if previous else (None, 0)
+    status = result.classification.get('status')
+    state = result.classification.get('state')
+    c.execute("INSERT INTO summaries (user_id, filename, summary, created_at, summary_tiers, version, parent_id, "
+              "fingerprint, disease, status, status_confidence, polarity, state, model_version, timings) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+              (user_id, filename, full_summary, datetime.utcnow(), json.dumps(result.tiers), version + 1, parent_id,
+               json.dumps(result.fingerprint()), result.disease, status.label if status else None,
+               status.confidence if status else None, result.polarity, state.label if state else None,
+               summarizer.model_version, json.dumps(timings)))
+    summary_id = c.lastrowid
+    store_structured(c, summary_id, result)
+    return summary_id, version + 1
+
+def index_similar(rows):
+    """Appends committed (summary id, user id, summary) rows to the similar-case index; a failure there is logged, not raised."""
+    if similar_index is None or not rows:
+        return
+    try:
+        similar_index.add_many(rows)
+    except Exception:  # the summary is already committed; the upload still succeeds
+        logging.getLogger(__name__).exception("Could not add %d summaries to the similar-case index", len(rows))
+
+def bulk_item(upload, previous, budget, batch_id):
+    """Runs in the scheduler's batch lane: processes one file of a bulk upload under its own trace; returns (result, timings)."""
+    with request_trace('upload_bulk_file', batch_id=batch_id, filename=upload.filename) as trace:
+        with upload:
+            result = case_pipeline.process(upload.source, budget=budget, previous=previous[2] if previous else None)
+        trace.fields['tiers'] = result.tiers
+        return result, trace.stage_totals()
+
+def iter_bulk_uploads():
+    """Yields (filename, Upload or UploadError) for every PDF in the request, ZIP members included."""
+    if request.mimetype in ('application/zip', 'application/x-zip-compressed'):
+        sources = [(request.args.get('filename', 'upload.zip'), request.stream)]
+    else:
+        sources = [(f.filename, f.stream) for f in request.files.getlist('files') + request.files.getlist('file')
+                   if f.filename]
+    for filename, stream in sources:
+        if filename.lower().endswith('.zip'):
+            with stage('receive_archive'):
+                archive = receive_archive(stream, UPLOAD_DIR, MAX_BULK_BYTES, MEMORY_UPLOAD_BYTES)
+            with archive:
+                yield from iter_archive_uploads(archive, UPLOAD_DIR, MAX_UPLOAD_BYTES, MEMORY_UPLOAD_BYTES,
+                                                MAX_BULK_FILES)
+        elif filename.lower().endswith('.pdf'):
+            try:
+                yield filename, receive_upload(stream, filename, UPLOAD_DIR, MAX_UPLOAD_BYTES, MEMORY_UPLOAD_BYTES)
+            except UploadError as e:
+                yield filename, e
+        else:
+            yield filename, UploadError('Invalid file format')
+
+@app.route('/upload/bulk', methods=['POST'])
+@login_required
+def upload_bulk():
+    """
+    Several PDFs and/or ZIP archives in one request (multipart 'files', or a
+    raw application/zip body). Files are queued in the scheduler's batch lane
+    as they are read; all summaries are stored in one transaction at the end.
+    """
+    request.max_content_length = MAX_BULK_BYTES + 64 * 1024
+    with request_trace('upload_bulk', user_id=current_user.id) as trace:
+        try:
+            admit('batch')
+        except Overloaded as e:
+            return overloaded(e, trace)
+        budget = request_budget('bulk')
+        items = []  # (filename, Upload, previous version, future) or (filename, None, None, error)
+        accepted = 0  # rejected files do not count against MAX_BULK_FILES
+        try:
+            with stage('receive'):
+                for filename, upload in iter_bulk_uploads():
+                    if isinstance(upload, UploadError):
+                        items.append((filename, None, None, str(upload)))
+                    elif accepted >= MAX_BULK_FILES:
+                        upload.cleanup()
+                        items.append((filename, None, None, f"More than {MAX_BULK_FILES} files in one request."))
+                    else:
+                        previous = latest_version(current_user.id, filename)
+                        try:
+                            future = scheduler.submit('batch', current_user.id, bulk_item, upload, previous, budget,
+                                                      trace.request_id)
+                        except Overloaded:
+                            upload.cleanup()
+                            raise
+                        items.append((filename, upload, previous, future))
+                        accepted += 1
+        except (UploadError, Overloaded) as e:
+            for _, upload, _, future in items:
+                if upload is not None and future.cancel():
+                    upload.cleanup()
+            if isinstance(e, Overloaded):
+                return overloaded(e, trace)
+            trace.status = 'rejected'
+            return jsonify({'error': str(e), 'request_id': trace.request_id}), e.status
+
+        results = []
+        stored = []
+        for filename, upload, previous, outcome in items:
+            if upload is None:
+                results.append({'filename': filename, 'error': outcome})
+                continue
+            try:
+                result, timings = outcome.result()
+            except LimitExceeded as e:
+                results.append(dict(e.as_dict(), filename=filename))
+                continue
+            except Exception as e:
+                results.append({'filename': filename, 'error': str(e)})
+                continue
+            entry = {'filename': filename, 'summary': result.render(), 'tiers': result.tiers,
+                     'reused_sections': result.reused, 'pages_skipped': result.pages_skipped}
+            results.append(entry)
+            stored.append((entry, result, previous, timings))
+
+        with stage('db_insert'), sqlite3.connect('summaries.db') as conn:
+            c = conn.cursor()
+            chains = {}  # a filename repeated in the batch chains onto its own earlier copy
+            indexed = []
+            for entry, result, previous, timings in stored:
+                previous = chains.get(entry['filename'], previous)
+                summary_id, entry['version'] = insert_summary(c, current_user.id, entry['filename'], result,
+                                                              entry['summary'], previous, timings)
+                chains[entry['filename']] = (summary_id, entry['version'], None)
+                indexed.append((summary_id, current_user.id, entry['summary']))
+            conn.commit()
+        with stage('similar_index'):
+            index_similar(indexed)
+
+        trace.fields['files'] = len(results)
+        trace.fields['failed'] = len(results) - len(stored)
+        return jsonify({'results': results, 'request_id': trace.request_id})
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    """Werkzeug's refusal of a body over the request's max_content_length, named after that limit."""
+    if request.endpoint == 'upload_bulk':
+        message = f"Request exceeds the {MAX_BULK_BYTES // (1024 * 1024)} MB bulk upload limit."
+    else:
+        message = f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit."
+    return jsonify({'error': message}), 413
 
-            os.remove(file_path)
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
-            return jsonify({'summary': full_summary})
-        except Exception as e:
-            return jsonify({'error': str(e)})
-    return jsonify({'error': 'Invalid file format'})
+@app.route('/export')
+@login_required
+def export():
+    """Streams the user's summaries as JSONL or Parquet; ?since= and ?until= take ISO dates."""
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"Unknown format: {fmt}"}), 400
+    chunks = iter_summary_chunks('summaries.db', user_id=current_user.id,
+                                 since=request.args.get('since'), until=request.args.get('until'))
+    return Response(stream_with_context(iter_export(fmt, chunks)), mimetype=MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename=summaries.{fmt}'})
+
+@app.route('/summaries/search')
+@login_required
+def search_summaries():
+    """The user's summaries indexed under ?kind=&term=, optionally within ?since=&until=."""
+    kind = request.args.get('kind', 'diagnosis')
+    term = request.args.get('term', '').strip()
+    if kind not in TERM_KINDS or not term:
+        return jsonify({'error': f"Give a term and a kind among: {', '.join(TERM_KINDS)}"}), 400
+    with sqlite3.connect('summaries.db') as conn:
+        rows = find_summaries(conn, kind, term, user_id=current_user.id,
+                              since=request.args.get('since'), until=request.args.get('until'))
+    return jsonify({'results': rows})
+
+@app.route('/similar/<int:summary_id>')
+@login_required
+def similar_summaries(summary_id):
+    """The user's summaries closest to summary_id by TF-IDF cosine, best first; ?k= sets how many (at most 100)."""
+    if similar_index is None:
+        return jsonify({'error': 'The similar-case index is disabled.'}), 404
+    k = min(max(request.args.get('k', 10, type=int), 1), 100)
+    with sqlite3.connect('summaries.db') as conn:
+        row = conn.execute("SELECT summary FROM summaries WHERE id = ? AND user_id = ?",
+                           (summary_id, current_user.id)).fetchone()
+        if row is None:
+            return jsonify({'error': 'Summary not found'}), 404
+        # Summaries stored before the index existed are vectorized on the fly
+        hits = similar_index.similar(summary_id, k, user_id=current_user.id, text=row[0])
+        scores = dict(hits)
+        rows = summaries_by_id(conn, [hit[0] for hit in hits], user_id=current_user.id)
+    for entry in rows:
+        entry['score'] = round(scores[entry['id']], 4)
+    return jsonify({'id': summary_id, 'results': rows})
 
 @app.route('/history')
 @login_required
@@ -287,4 +499,7 @@ def history():
     return render_template('history.html', summaries=summaries)
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger(__name__).info("Summarizer: %s", summarizer.model_version)
+    case_pipeline.warm()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,32 @@
+import importlib
+import os
+import sys
+import uuid
+
+import pytest
+
+# The app directory, so the tests import casesheet wherever pytest is run from
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """summer3 imported in a scratch directory (its database and uploads live in the cwd)."""
+    workdir = tmp_path_factory.mktemp('app')
+    cwd = os.getcwd()
+    os.environ.setdefault('CASESHEET_SUMMARY_TIERS', 'extractive')
+    os.environ.setdefault('CASESHEET_SIMILAR_INDEX', 'none')
+    os.chdir(workdir)
+    try:
+        yield importlib.import_module('summer3')
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app_module):
+    client = app_module.app.test_client()
+    credentials = {'username': f'user-{uuid.uuid4().hex}', 'password': 'secret'}
+    client.post('/register', data=credentials)
+    client.post('/login', data=credentials)
+    return client
@@ -0,0 +1,35 @@
+import pytest
+
+from casesheet.classify import CaseSheetClassifier, TOKEN_RE
+
+
+@pytest.fixture
+def classifier():
+    return CaseSheetClassifier(lexicon={'good': 0.7, 'well': 0.5})
+
+
+def test_contractions_split_off_the_negation():
+    assert TOKEN_RE.findall("patient doesn't have fever") == ['patient', 'does', "n't", 'have', 'fever']
+    assert TOKEN_RE.findall("isn't") == ['is', "n't"]
+
+
+def test_negated_contraction_flips_polarity(classifier):
+    assert classifier.classify("Patient is well.")['status'].score > 0
+    assert classifier.classify("Patient isn't well.")['status'].score < 0
+
+
+def test_patient_doesnt_have_fever_still_finds_the_keyword(classifier):
+    ids = classifier.tokenize("patient doesn't have fever")
+    assert classifier.vocab["n't"] in ids
+    assert ('checkup', 'fever') in classifier.classify("patient doesn't have fever")['entities']
+
+
+def test_keywords_match_their_plurals(classifier):
+    entities = classifier.classify("Continue medications and tablets as before.")['entities']
+    assert ('medicine', 'medication') in entities
+    assert ('medicine', 'tablet') in entities
+
+
+def test_keywords_match_whole_words_only(classifier):
+    # Substring search used to find "dose" in "overdose"
+    assert classifier.classify("Overdose ruled out.")['entities'] == []
@@ -0,0 +1,95 @@
+import fitz
+import numpy as np
+import pytest
+from PIL import Image
+
+from casesheet.pages import DedupePolicy, PageDeduper, TemplateStore, default_dedupe, fingerprint_image, fingerprint_page
+
+
+def form_page(doc, pulse=72, name='John Smith'):
+    """A progress-note form with its filled-in values."""
+    page = doc.new_page(width=595, height=842)
+    for row in range(25):
+        page.insert_text((60, 72 + 22 * row), f"Progress note field {row}: ____________________", fontsize=10)
+    page.insert_text((60, 700), f"Patient: {name}   Pulse {pulse}   BP 120/80", fontsize=11)
+    return page
+
+
+def render(page):
+    pix = page.get_pixmap(dpi=150, colorspace=fitz.csGRAY, alpha=False)
+    return np.frombuffer(pix.samples, np.uint8).reshape(pix.height, pix.width).copy()
+
+
+@pytest.fixture
+def deduper():
+    return PageDeduper(DedupePolicy())
+
+
+def test_dedupe_is_opt_in(monkeypatch):
+    monkeypatch.delenv('CASESHEET_PAGE_DEDUPE', raising=False)
+    monkeypatch.delenv('CASESHEET_PAGE_TEMPLATES', raising=False)
+    assert default_dedupe() is None
+    monkeypatch.setenv('CASESHEET_PAGE_DEDUPE', '1')
+    assert default_dedupe().duplicates
+
+
+def test_blank_page_is_skipped(deduper):
+    doc = fitz.open()
+    assert deduper.lookup(fingerprint_page(doc.new_page())) == ('blank', '')
+
+
+def test_exact_duplicate_reuses_text(deduper):
+    doc = fitz.open()
+    deduper.remember(fingerprint_page(form_page(doc)), 'first page')
+    assert deduper.lookup(fingerprint_page(form_page(doc))) == ('duplicate', 'first page')
+
+
+def test_noisy_copy_reuses_text(deduper):
+    doc = fitz.open()
+    page = form_page(doc)
+    deduper.remember(fingerprint_page(page), 'first page')
+    image = render(page)
+    noise = np.random.default_rng(0).random(image.shape) < 0.001
+    image[noise] = 255 - image[noise]
+    assert deduper.lookup(fingerprint_image(Image.fromarray(image))) == ('duplicate', 'first page')
+
+
+@pytest.mark.parametrize('changed', [{'pulse': 78}, {'name': 'Jane Smith'}])
+def test_value_changed_page_is_ocrd(deduper, changed):
+    doc = fitz.open()
+    deduper.remember(fingerprint_page(form_page(doc)), 'first page')
+    assert deduper.lookup(fingerprint_page(form_page(doc, **changed))) is None
+
+
+def test_same_template_page_comes_from_the_store(tmp_path):
+    doc = fitz.open()
+    letterhead = doc.new_page(width=595, height=842)
+    letterhead.insert_text((60, 80), "City Hospital - Department of Medicine", fontsize=16)
+    store = TemplateStore(str(tmp_path / 'templates.db'))
+    store.add(fingerprint_page(letterhead), 'City Hospital', name='letterhead')
+    deduper = PageDeduper(DedupePolicy(skip_blank=False, duplicates=False, templates=store))
+    assert deduper.lookup(fingerprint_page(letterhead)) == ('template', 'City Hospital')
+    assert deduper.lookup(fingerprint_page(form_page(doc))) is None
+
+
+def test_comparisons_per_page_are_capped(deduper):
+    doc = fitz.open()
+    calls = []
+    same = deduper.policy.same
+    deduper.policy.same = lambda a, b: calls.append(1) or same(a, b)
+    for i in range(15):
+        calls.clear()
+        fp = fingerprint_page(form_page(doc, pulse=60 + i))
+        assert deduper.lookup(fp) is None
+        assert len(calls) <= deduper.policy.max_candidates
+        deduper.remember(fp, f'page {i}')
+    # A repeat of an early page is still found among many pages of the same form
+    assert deduper.lookup(fingerprint_page(form_page(doc, pulse=62))) == ('duplicate', 'page 2')
+
+
+def test_thumbnail_is_kept_packed():
+    doc = fitz.open()
+    fp = fingerprint_page(form_page(doc))
+    thumb = render(doc[0]) < 128
+    assert np.array_equal(fp.thumb, thumb)
+    assert len(fp.packed) < thumb.size // 100
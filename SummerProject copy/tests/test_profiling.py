@@ -0,0 +1,30 @@
+import threading
+
+from casesheet import profiling
+
+
+def test_profile_is_saved(tmp_path):
+    assert profiling.profile_call('one', sum, [1, 2], out_dir=str(tmp_path)) == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['one.pstats', 'one.speedscope.json']
+
+
+def test_overlapping_call_runs_unprofiled(tmp_path):
+    inside, release = threading.Event(), threading.Event()
+
+    def slow():
+        inside.set()
+        assert release.wait(5)
+        return 'slow'
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(
+        profiling.profile_call('slow', slow, out_dir=str(tmp_path))))
+    thread.start()
+    assert inside.wait(5)
+    try:
+        assert profiling.profile_call('fast', lambda: 'fast', out_dir=str(tmp_path)) == 'fast'
+    finally:
+        release.set()
+        thread.join(5)
+    assert results == ['slow']
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['slow.pstats', 'slow.speedscope.json']
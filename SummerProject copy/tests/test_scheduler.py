@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+from casesheet.scheduler import Overloaded, Scheduler
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def release():
+    """Set at teardown so blocked jobs finish and the scheduler can shut down."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+@pytest.fixture
+def make_scheduler(release):
+    schedulers = []
+
+    def make(**kwargs):
+        scheduler = Scheduler(**kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    release.set()
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+
+def blocking(name, started, release):
+    """A job that records its start, then waits for release."""
+    def job():
+        started.append(name)
+        assert release.wait(TIMEOUT)
+        return name
+    return job
+
+
+def wait_until(predicate):
+    deadline = time.monotonic() + TIMEOUT
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_interactive_goes_before_queued_batch(make_scheduler, release):
+    scheduler = make_scheduler(workers=1, reserved=0)
+    started = []
+    first = scheduler.submit('batch', 'a', blocking('first', started, release))
+    wait_until(lambda: started == ['first'])
+    batch = scheduler.submit('batch', 'b', started.append, 'batch')
+    interactive = scheduler.submit('interactive', 'c', started.append, 'interactive')
+    release.set()
+    for future in (first, batch, interactive):
+        future.result(TIMEOUT)
+    assert started == ['first', 'interactive', 'batch']
+
+
+def test_batch_backlog_never_takes_the_reserved_worker(make_scheduler, release):
+    scheduler = make_scheduler(workers=2, reserved=1, per_user={'batch': 10})
+    started = []
+    batch = [scheduler.submit('batch', 'a', blocking(f'batch-{i}', started, release)) for i in range(3)]
+    wait_until(lambda: started)
+    # The second worker stays free for interactive jobs while batch work piles up
+    assert scheduler.submit('interactive', 'b', lambda: 'done').result(TIMEOUT) == 'done'
+    assert started == ['batch-0']
+    assert scheduler.depth() == {'interactive': 0, 'batch': 2}
+    release.set()
+    assert [future.result(TIMEOUT) for future in batch] == ['batch-0', 'batch-1', 'batch-2']
+
+
+def test_user_at_cap_waits_while_others_run(make_scheduler, release):
+    scheduler = make_scheduler(workers=3, reserved=0, per_user={'interactive': 1})
+    started = []
+    futures = [scheduler.submit('interactive', 'a', blocking('a-1', started, release)),
+               scheduler.submit('interactive', 'a', blocking('a-2', started, release)),
+               scheduler.submit('interactive', 'b', blocking('b-1', started, release))]
+    wait_until(lambda: len(started) == 2)
+    assert sorted(started) == ['a-1', 'b-1']
+    assert scheduler.depth()['interactive'] == 1
+    release.set()
+    assert [future.result(TIMEOUT) for future in futures] == ['a-1', 'a-2', 'b-1']
+    assert started[-1] == 'a-2'
+
+
+def test_full_lane_raises_overloaded(make_scheduler, release):
+    scheduler = make_scheduler(workers=1, reserved=0, max_queue={'batch': 1})
+    started = []
+    scheduler.submit('batch', 'a', blocking('running', started, release))
+    wait_until(lambda: started)
+    scheduler.submit('batch', 'a', lambda: None)
+    with pytest.raises(Overloaded) as error:
+        scheduler.submit('batch', 'b', lambda: None)
+    assert error.value.lane == 'batch'
+    assert error.value.status == 429
+    assert error.value.retry_after >= 1
+    with pytest.raises(Overloaded):
+        scheduler.check('batch')
+    # Only the full lane refuses work
+    scheduler.check('interactive')
+    scheduler.submit('interactive', 'b', lambda: None)
+
+
+def test_reserved_must_leave_a_batch_worker():
+    with pytest.raises(ValueError):
+        Scheduler(workers=2, reserved=2)
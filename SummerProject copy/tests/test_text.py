@@ -0,0 +1,12 @@
+from casesheet import text
+
+
+def test_sentences_split_without_punkt_data(monkeypatch):
+    monkeypatch.setattr(text, '_punkt_ready', False)
+    assert text.split_sentences("Fever for 3 days. No cough! Plan: rest.") == \
+        ["Fever for 3 days.", "No cough!", "Plan: rest."]
+
+
+def test_summarize_text_keeps_the_first_sentences(monkeypatch):
+    monkeypatch.setattr(text, '_punkt_ready', False)
+    assert text.summarize_text("One. Two. Three.", sentence_count=2) == "One.\nTwo."
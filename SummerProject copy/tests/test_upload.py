@@ -0,0 +1,62 @@
+import io
+
+import fitz
+import pytest
+
+from casesheet.scheduler import Scheduler
+
+
+@pytest.fixture
+def full_queue(app_module, monkeypatch):
+    """Lanes that take no more jobs."""
+    scheduler = Scheduler(workers=1, reserved=0, max_queue={'interactive': 0, 'batch': 0})
+    monkeypatch.setattr(app_module, 'scheduler', scheduler)
+    yield scheduler
+    scheduler.shutdown()
+
+
+MULTIPART = (b'--frontier\r\nContent-Disposition: form-data; name="file"; filename="a.pdf"\r\n'
+             b'Content-Type: application/pdf\r\n\r\n%PDF-1.4\n' + b'0' * 4096 + b'\r\n--frontier--\r\n')
+
+
+@pytest.mark.parametrize('url, content_type, body', [
+    ('/upload', 'multipart/form-data; boundary=frontier', MULTIPART),
+    ('/upload', 'application/pdf', b'%PDF-1.4\n' + b'0' * 4096),
+    ('/upload/bulk', 'multipart/form-data; boundary=frontier', MULTIPART.replace(b'name="file"', b'name="files"')),
+], ids=['multipart', 'raw', 'bulk'])
+def test_full_queue_refuses_upload_before_reading_the_body(client, full_queue, url, content_type, body):
+    stream = io.BytesIO(body)
+    response = client.post(url, input_stream=stream, content_type=content_type,
+                           headers={'Content-Length': str(len(body))})
+    assert response.status_code == 429
+    assert response.headers['Retry-After']
+    assert stream.tell() == 0  # the body was never read
+
+
+def test_upload_summarizes_a_text_pdf(client):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Diagnosis: typhoid fever. Patient is stable. Plan: rest and fluids.")
+    response = client.post('/upload', data={'file': (io.BytesIO(doc.tobytes()), 'note.pdf')},
+                           content_type='multipart/form-data')
+    payload = response.get_json()
+    assert 'error' not in payload
+    assert 'typhoid' in payload['summary'].lower()
+
+
+def note_pdf(text):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text)
+    return io.BytesIO(doc.tobytes())
+
+
+def test_bulk_limit_counts_only_accepted_files(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'MAX_BULK_FILES', 2)
+    files = [(io.BytesIO(b'not a pdf'), 'a.txt'), (io.BytesIO(b'not a pdf'), 'b.doc'),
+             (note_pdf("Diagnosis: typhoid fever."), 'c.pdf'), (note_pdf("Diagnosis: malaria."), 'd.pdf'),
+             (note_pdf("Diagnosis: dengue."), 'e.pdf')]
+    response = client.post('/upload/bulk', data={'files': files}, content_type='multipart/form-data')
+    results = {r['filename']: r for r in response.get_json()['results']}
+    assert results['a.txt']['error'] == results['b.doc']['error'] == 'Invalid file format'
+    assert 'typhoid' in results['c.pdf']['summary'].lower()
+    assert 'malaria' in results['d.pdf']['summary'].lower()
+    assert results['e.pdf']['error'] == "More than 2 files in one request."